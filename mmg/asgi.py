@@ -5,6 +5,11 @@ It exposes the ASGI callable as a module-level variable named ``application``.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/3.1/howto/deployment/asgi/
+
+Serve the site through this (e.g. uvicorn or daphne) rather than wsgi.py when running a Results Party: every connected
+party page holds open a resultspartyevents/ stream, and under WSGI each of those ties up a worker. The party state,
+increment and presence endpoints are async views (see movies/party_async.py), which only get the benefit here; compare
+the two with manage.py run_party_benchmark.
 """
 
 import os
@@ -78,6 +78,8 @@ INSTALLED_APPS = [
 CRISPY_TEMPLATE_PACK = 'bootstrap4'
 
 MIDDLEWARE = [
+    # first, so its timings cover the rest of the middleware too
+    'movies.middleware.ServerTimingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -185,6 +187,8 @@ STATICFILES_FINDERS = [
 
 MEDIA_URL = "/media/"
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+# the media manifest (see movies/media_manifest.py); keep it out of MEDIA_ROOT, which is publicly served
+MEDIA_MANIFEST_PATH = os.path.join(BASE_DIR, 'media_manifest.json')
 
 
 # My settings
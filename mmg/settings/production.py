@@ -12,6 +12,8 @@ https://docs.djangoproject.com/en/3.1/ref/settings/
 import os
 from pathlib import Path
 
+import django
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent.parent
 
@@ -50,6 +52,8 @@ INSTALLED_APPS = [
 CRISPY_TEMPLATE_PACK = 'bootstrap4'
 
 MIDDLEWARE = [
+    # first, so its timings cover the rest of the middleware too
+    'movies.middleware.ServerTimingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -83,9 +87,11 @@ WSGI_APPLICATION = 'mmg.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/3.1/ref/settings/#databases
 
+# DATABASE_POOL=1 switches to the pooled MySQL backend, which reuses connections between requests instead of opening a
+# new one for every request (see movies/backends/mysql_pool/base.py). MAX_LIFETIME is kept under MySQL's wait_timeout.
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.mysql',
+        'ENGINE': 'movies.backends.mysql_pool' if os.getenv('DATABASE_POOL') else 'django.db.backends.mysql',
         'NAME': 'mholloway$movie_club',
         'OPTIONS': {
             'init_command': "SET sql_mode='STRICT_TRANS_TABLES'",
@@ -94,10 +100,48 @@ DATABASES = {
         'USER': os.getenv('DATABASE_USER'),
         'PASSWORD': os.getenv('DATABASE_PASSWORD'),
         'HOST': os.getenv('DATABASE_HOST'),
+        'CONN_MAX_AGE': 0,
+        'POOL': {
+            'MIN_SIZE': int(os.getenv('DATABASE_POOL_MIN_SIZE', 1)),
+            'MAX_SIZE': int(os.getenv('DATABASE_POOL_MAX_SIZE', 10)),
+            'MAX_LIFETIME': 250,
+            'TIMEOUT': 10,
+            'LOG_EVERY': int(os.getenv('DATABASE_POOL_LOG_EVERY', 0)),
+        },
+    }
+}
+
+
+# Cache
+# the party state, party presence and the cached rounds / rosters / pages must be the same for every worker process,
+# so this can't be the default per-process LocMem cache. It can't be the database cache either: the party pages read
+# and write the cache several times a second per client (presence pings, the 0.25 second stream / long-poll ticks), and
+# each of those would be a few SQL statements. So production needs a memcached server (deploy requirement), at
+# MEMCACHED_LOCATION. Django 3.2 and up talk to it with pymemcache; older ones with python-memcached.
+CACHES = {
+    'default': {
+        'BACKEND': ('django.core.cache.backends.memcached.PyMemcacheCache' if django.VERSION >= (3, 2)
+                    else 'django.core.cache.backends.memcached.MemcachedCache'),
+        'LOCATION': os.getenv('MEMCACHED_LOCATION', '127.0.0.1:11211'),
     }
 }
 
 
+# Logging
+# the app's own INFO messages (per-request timings from movies.middleware, poster variants...) go to the console,
+# where the process manager collects them; set MMG_LOG_LEVEL=WARNING to quieten them
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'movies': {'handlers': ['console'], 'level': os.getenv('MMG_LOG_LEVEL', 'INFO'), 'propagate': False},
+    },
+}
+
+
 # Password validation
 # https://docs.djangoproject.com/en/3.1/ref/settings/#auth-password-validators
 
@@ -144,6 +188,14 @@ STATICFILES_FINDERS = [
 
 MEDIA_URL = "/media/"
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+# the media manifest (see movies/media_manifest.py); keep it out of MEDIA_ROOT, which is publicly served
+MEDIA_MANIFEST_PATH = os.path.join(BASE_DIR, 'media_manifest.json')
+
+# hand media files over to the front proxy rather than sending them from a worker (see movies/media_serving.py):
+# None, 'x-accel-redirect' (nginx; needs an internal location at MEDIA_ACCEL_REDIRECT_PREFIX aliased to MEDIA_ROOT)
+# or 'x-sendfile' (Apache mod_xsendfile)
+MEDIA_SENDFILE = os.getenv('MEDIA_SENDFILE') or None
+MEDIA_ACCEL_REDIRECT_PREFIX = '/protected-media/'
 
 # My settings
 LOGIN_URL = 'login'   # used by django to redirect to login when @login_required gets unauthorized access
@@ -0,0 +1,94 @@
+"""
+The MySQL backend, with pooled connections (see movies/db_pool.py): set ENGINE to 'movies.backends.mysql_pool'.
+
+Everything is the stock django.db.backends.mysql except where connections come from and go: a new connection is checked
+out of the process's pool for the database (pinged first), and closing it -- which Django does at the end of every
+request, with CONN_MAX_AGE at 0 -- checks it back in, after rolling back anything left open. Leave CONN_MAX_AGE at 0;
+with it set, a thread would keep its connection between requests and the pool would have nothing to share.
+
+Pool settings go in the database's POOL entry (all optional):
+
+    'POOL': {
+        'MIN_SIZE': 0,          # connections opened as soon as the pool is first used
+        'MAX_SIZE': 10,         # no more than this many, per process
+        'MAX_LIFETIME': 3600,   # seconds; older connections are closed instead of reused
+        'TIMEOUT': 10,          # seconds a request waits for a free connection before giving up
+        'LOG_EVERY': 0,         # print the pool stats every this many checkouts (0: never)
+    }
+"""
+import threading
+
+from django.db.backends.mysql import base as mysql
+
+from movies.db_pool import ConnectionPool
+
+
+POOL_DEFAULTS = {'MIN_SIZE': 0, 'MAX_SIZE': 10, 'MAX_LIFETIME': 3600, 'TIMEOUT': 10, 'LOG_EVERY': 0}
+
+# (alias, database, host, port, user) -> ConnectionPool; keyed on the database too, since the test runner points the
+# same alias at the test database
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def _ping(connection):
+    connection.ping()
+
+
+def get_pool_stats():
+    """stats() of every pool in this process, by database alias / name"""
+    with _pools_lock:
+        pools = list(_pools.values())
+    return {pool.name: pool.stats() for pool in pools}
+
+
+class DatabaseWrapper(mysql.DatabaseWrapper):
+
+    def get_pool(self):
+        settings_dict = self.settings_dict
+        key = (self.alias, settings_dict['NAME'], settings_dict['HOST'], settings_dict['PORT'], settings_dict['USER'])
+
+        with _pools_lock:
+            pool = _pools.get(key)
+            created = pool is None
+            if created:
+                options = dict(POOL_DEFAULTS, **settings_dict.get('POOL', {}))
+                conn_params = self.get_connection_params()
+                pool = _pools[key] = ConnectionPool(
+                    lambda: mysql.DatabaseWrapper.get_new_connection(self, conn_params),
+                    min_size=options['MIN_SIZE'],
+                    max_size=options['MAX_SIZE'],
+                    max_lifetime=options['MAX_LIFETIME'],
+                    timeout=options['TIMEOUT'],
+                    health_check=_ping,
+                    name='{}/{}'.format(self.alias, settings_dict['NAME']),
+                    log_every=options['LOG_EVERY'],
+                )
+
+        if created:
+            pool.fill()
+        return pool
+
+    def get_new_connection(self, conn_params):
+        # (conn_params are the pool's to use when it needs a new connection; they're the same for every checkout)
+        return self.get_pool().checkout()
+
+    def _close(self):
+        if self.connection is None:
+            return
+
+        pool = self.get_pool()
+        if self.in_atomic_block:
+            # closed inside atomic(): Django keeps hold of the connection until the block exits, so it can't go back in
+            # the pool for another thread to pick up. Close it, as the stock backend would
+            pool.discard(self.connection)
+            return
+
+        try:
+            # don't hand on an open transaction
+            if not self.autocommit:
+                self.connection.rollback()
+        except Exception:
+            pool.discard(self.connection)
+        else:
+            pool.checkin(self.connection)
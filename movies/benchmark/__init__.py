@@ -0,0 +1,12 @@
+"""
+Benchmarks for the pages that slow down as rounds pile up.
+
+ - seed.py makes a large synthetic history: rounds, members, movies, UMDs, URDs and PointsEarned, at the ratios a real
+   club produces them (manage.py seed_benchmark_data)
+ - harness.py requests each page through the test client and records its wall time, query count and peak Python memory,
+   saves the results as a JSON baseline and compares later runs against it (manage.py run_benchmarks)
+ - concurrency.py puts a crowd of simulated party pages on the party state endpoint, served WSGI-style and ASGI-style,
+   and compares how many of them keep up with the reveal (manage.py run_party_benchmark)
+
+Run them against a scratch database, never the real one: seeding adds a lot of rows.
+"""
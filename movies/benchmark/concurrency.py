@@ -0,0 +1,187 @@
+"""
+Party-night concurrency benchmark: how many party pages can keep up with the reveal, served the WSGI way and the ASGI
+way.
+
+Every simulated client does what a party page does when it polls: request resultspartystate.json, sending back the
+version it already has (a long-poll, see party_async.py), over and over. Meanwhile the admin moves the party on every
+`interval` seconds. For each change, the benchmark notes how long each client took to hear about it.
+
+ - wsgi: each client runs in its own thread, but only `workers` requests are served at once (a BoundedSemaphore standing
+   in for a fixed pool of WSGI workers / threads); the async view is run to completion on the worker holding it, as
+   under a WSGI server
+ - asgi: every client is a task on one event loop, going through Django's async request path (AsyncClient); a
+   long-polling request waits with no thread held
+
+Both run in this one process, against the configured database and cache, so the numbers only mean something next to
+each other. Run it with the production MIDDLEWARE: one sync-only middleware (e.g. the debug toolbar) is enough to put
+every async request back on a thread. Reported per mode: requests served, how long clients took to see each change (median / 95th percentile /
+worst), changes missed outright, and how many clients kept up (95th percentile lag under one interval).
+"""
+import asyncio
+import logging
+import statistics
+import threading
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.test import AsyncClient, Client
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .. import middleware
+from ..models import UserProfile
+from ..party import set_party_index
+from .seed import BENCHMARK_USERNAME
+
+
+class Recorder:
+    """the changes the admin made (version -> when) and what each client saw, shared by every client"""
+
+    def __init__(self, clients):
+        self.published = {}
+        self.order = []
+        self.lags = [[] for _ in range(clients)]
+        self.requests = 0
+        self.lock = threading.Lock()
+
+    def publish(self, idx):
+        # as ResultsPartyStateIncrement does it
+        version = set_party_index(idx, timezone.now())['version']
+        with self.lock:
+            self.published[version] = time.perf_counter()
+            self.order.append(version)
+
+    def answered(self, client, version, changed):
+        now = time.perf_counter()
+        with self.lock:
+            self.requests += 1
+            published = self.published.get(version)
+            if changed and published is not None:
+                self.lags[client].append(now - published)
+
+    def results(self, interval):
+        """the numbers for this mode; changes a client never saw the version of count as missed"""
+        all_lags = sorted(lag for lags in self.lags for lag in lags)
+        changes = len(self.order)
+        seen = sum(len(lags) for lags in self.lags)
+
+        def percentile(values, fraction):
+            return values[min(int(len(values) * fraction), len(values) - 1)] if values else None
+
+        kept_up = sum(1 for lags in self.lags
+                      if len(lags) >= changes - 1 and lags and percentile(sorted(lags), 0.95) < interval)
+
+        def ms(seconds):
+            return round(seconds * 1000, 1) if seconds is not None else None
+
+        return {
+            'clients': len(self.lags),
+            'changes': changes,
+            'requests': self.requests,
+            'lag_p50_ms': ms(statistics.median(all_lags)) if all_lags else None,
+            'lag_p95_ms': ms(percentile(all_lags, 0.95)),
+            'lag_max_ms': ms(all_lags[-1] if all_lags else None),
+            'missed': changes * len(self.lags) - seen,
+            'kept_up': kept_up,
+        }
+
+
+def _state_url():
+    return reverse('movies:resultspartystate')
+
+
+def _run_wsgi(cookies, clients, workers, seconds, interval):
+    recorder = Recorder(clients)
+    worker_pool = threading.BoundedSemaphore(workers)
+    stop = time.perf_counter() + seconds
+    url = _state_url()
+
+    def poll(number):
+        client = Client()
+        client.cookies = cookies
+        version = None
+        while time.perf_counter() < stop:
+            with worker_pool:
+                response = client.get(url, {'version': version} if version else {})
+            data = response.json()
+            recorder.answered(number, data['version'], changed=data['version'] != version)
+            version = data['version']
+
+    threads = [threading.Thread(target=poll, args=(number,), daemon=True) for number in range(clients)]
+    for thread in threads:
+        thread.start()
+
+    idx = 0
+    while time.perf_counter() + interval < stop:
+        time.sleep(interval)
+        idx += 1
+        recorder.publish(idx)
+
+    for thread in threads:
+        thread.join()
+    return recorder.results(interval)
+
+
+def _run_asgi(cookies, clients, seconds, interval):
+    recorder = Recorder(clients)
+    stop = time.perf_counter() + seconds
+    url = _state_url()
+
+    async def poll(number):
+        client = AsyncClient()
+        client.cookies = cookies
+        version = None
+        while time.perf_counter() < stop:
+            response = await client.get(url, {'version': version} if version else {})
+            data = response.json()
+            recorder.answered(number, data['version'], changed=data['version'] != version)
+            version = data['version']
+
+    async def admin():
+        idx = 0
+        while time.perf_counter() + interval < stop:
+            await asyncio.sleep(interval)
+            idx += 1
+            await sync_to_async(recorder.publish)(idx)
+
+    async def main():
+        await asyncio.gather(admin(), *(poll(number) for number in range(clients)))
+
+    asyncio.run(main())
+    return recorder.results(interval)
+
+
+def sync_only_middleware():
+    """the MIDDLEWARE entries that can't run async; with any of these, Django runs async views on a thread too"""
+    return [path for path in settings.MIDDLEWARE if not getattr(import_string(path), 'async_capable', False)]
+
+
+def run_party_concurrency(clients=50, workers=4, seconds=10, interval=1.0, log=print):
+    """run both modes one after the other; returns {'wsgi': results, 'asgi': results}"""
+    for path in sync_only_middleware():
+        log('warning: {} is sync-only, so the asgi numbers will look like wsgi ones'.format(path))
+
+    client = Client()
+    client.force_login(UserProfile.objects.get(user__username=BENCHMARK_USERNAME.format(0)).user)
+    cookies = client.cookies
+
+    # a line per request would drown everything else
+    timing_level = middleware.logger.level
+    middleware.logger.setLevel(logging.WARNING)
+    try:
+        results = {}
+        for mode in ('wsgi', 'asgi'):
+            # start each mode from a known state
+            Recorder(0).publish(0)
+
+            log('{}: {} clients for {}s...'.format(mode, clients, seconds))
+            if mode == 'wsgi':
+                results[mode] = _run_wsgi(cookies, clients, workers, seconds, interval)
+            else:
+                results[mode] = _run_asgi(cookies, clients, seconds, interval)
+    finally:
+        middleware.logger.setLevel(timing_level)
+
+    return results
@@ -0,0 +1,135 @@
+"""
+Page benchmarks: wall time, query count and peak memory for the pages that grow with the club's history.
+
+Each page is requested through the test client, logged in as the first benchmark member (an admin, so every page is
+allowed). The cache is cleared before the first request, so 'cold' is a page view with nothing cached; the page is then
+requested `repeat` more times and 'warm' is the median of those. Query counts are taken on the cold and the last warm
+request, and peak memory (tracemalloc, Python allocations only) on a separate warm request, since tracing slows
+everything down.
+
+Results are a dict of page name -> metrics; save_results() / load_results() read and write them as JSON, and
+compare_results() lines a run up against a saved baseline.
+"""
+import json
+import statistics
+import time
+import tracemalloc
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..models import GameRound, Movie, UserProfile
+from .seed import BENCHMARK_USERNAME
+
+
+# a metric counts as a regression if it's this much worse than the baseline (times are noisy; query counts are not)
+TIME_TOLERANCE = 0.10
+MEMORY_TOLERANCE = 0.10
+
+METRICS = ('cold_ms', 'warm_ms', 'cold_queries', 'warm_queries', 'peak_kb')
+
+
+def benchmark_pages():
+    """page name -> URL, for every page the benchmark covers"""
+    active_round = GameRound.objects.filter(active_lock=True).first()
+    last_completed = GameRound.objects.filter(round_completed=True).order_by('round_number').last()
+    if active_round is None or last_completed is None:
+        raise ValueError('no benchmark data: run manage.py seed_benchmark_data first')
+
+    movie = Movie.objects.filter(game_round=last_completed).first()
+    profile = UserProfile.objects.get(user__username=BENCHMARK_USERNAME.format(1))
+
+    pages = {'overview_{}'.format(sort_by): reverse('movies:overview', kwargs={'sort_by': sort_by})
+             for sort_by in ('round', 'movie', 'user', 'rating')}
+    pages.update({
+        'results': reverse('movies:results'),
+        'resultsparty': reverse('movies:resultspartyarchive', kwargs={'pk': last_completed.round_number}),
+        'members': reverse('movies:members'),
+        'user_profile': reverse('movies:user_profile', kwargs={'pk': profile.pk}),
+        'movie_detail': reverse('movies:movie', kwargs={'pk': movie.pk, 'slug': movie.slug}),
+        'conclude_round': reverse('movies:conclude_round', kwargs={'pk': active_round.pk}),
+    })
+    return pages
+
+
+def _request(client, url):
+    started = time.perf_counter()
+    with CaptureQueriesContext(connection) as queries:
+        response = client.get(url)
+    elapsed = (time.perf_counter() - started) * 1000
+
+    if response.status_code != 200:
+        raise RuntimeError('{} returned {}'.format(url, response.status_code))
+    return elapsed, len(queries)
+
+
+def measure_page(client, url, repeat=5):
+    cache.clear()
+    cold_ms, cold_queries = _request(client, url)
+
+    warm = [_request(client, url) for _ in range(repeat)]
+
+    tracemalloc.start()
+    try:
+        client.get(url)
+        current, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        'url': url,
+        'cold_ms': round(cold_ms, 2),
+        'warm_ms': round(statistics.median(elapsed for elapsed, count in warm), 2),
+        'cold_queries': cold_queries,
+        'warm_queries': warm[-1][1],
+        'peak_kb': round(peak / 1024, 1),
+    }
+
+
+def run_benchmarks(repeat=5, only=None, log=print):
+    """measure every benchmark page (or just the ones named in only); returns page name -> metrics"""
+    client = Client()
+    client.force_login(UserProfile.objects.get(user__username=BENCHMARK_USERNAME.format(0)).user)
+
+    results = {}
+    for name, url in benchmark_pages().items():
+        if only and name not in only:
+            continue
+        results[name] = measure_page(client, url, repeat)
+        log('{:<16} {cold_ms:>9.1f} ms cold {warm_ms:>9.1f} ms warm {cold_queries:>5} / {warm_queries:<5} queries {peak_kb:>9.1f} KB peak'.format(
+            name, **results[name]))
+    return results
+
+
+def save_results(results, path):
+    with open(path, 'w') as results_file:
+        json.dump(results, results_file, indent=2, sort_keys=True)
+
+
+def load_results(path):
+    with open(path) as results_file:
+        return json.load(results_file)
+
+
+def _is_regression(metric, old, new):
+    if metric.endswith('_queries'):
+        return new > old
+    tolerance = MEMORY_TOLERANCE if metric == 'peak_kb' else TIME_TOLERANCE
+    return new > old * (1 + tolerance)
+
+
+def compare_results(baseline, results):
+    """
+    A list of (page, metric, baseline value, new value, change in percent, is it a regression) for every metric of
+    every page in both runs.
+    """
+    rows = []
+    for name in sorted(set(baseline) & set(results)):
+        for metric in METRICS:
+            old, new = baseline[name][metric], results[name][metric]
+            change = ((new - old) / old * 100) if old else 0.0
+            rows.append((name, metric, old, new, change, _is_regression(metric, old, new)))
+    return rows
@@ -0,0 +1,136 @@
+"""
+Synthetic club history for the benchmarks.
+
+seed_history() adds `rounds` rounds to the database, played by (a random selection of) `members` members. Every round
+goes the way a real one does: each participant brings one movie, everyone submits details for every movie, and the
+round is scored and concluded through the same code the Conclude Round page uses (so each round gets its URDs,
+PointsEarned, party payload, standings, rating aggregates and progress row). The last round is left active, with every
+detail submitted but not yet concluded, so the in-progress pages and Conclude Round have something to show.
+
+The same seed always produces the same history.
+"""
+import random
+from datetime import date, timedelta
+
+from django.contrib.auth.models import User
+from django.db.models import Max
+from django.utils import timezone
+
+from ..models import GameRound, Movie, UserMovieDetail, UserRoundDetail, UserProfile, RoundRank, RoundProgress, PartyState
+from ..party_payload import refresh_party_payload
+from ..round_commit import commit_round_result
+from ..round_state import invalidate_round_state
+from ..standings import refresh_standings
+from ..scoring import score_round
+from ..utility_functions import create_ranks
+
+
+BENCHMARK_USERNAME = 'bench_member_{}'
+
+# how often members give each star rating, and how often they've seen / heard of the movie before
+STAR_WEIGHTS = (1, 2, 3, 3, 2)
+SEEN_PREVIOUSLY_CHANCE = 0.25
+HEARD_OF_CHANCE = 0.5
+
+# about how long a round lasts
+ROUND_LENGTH_DAYS = 28
+
+
+def benchmark_members(count):
+    """the benchmark's members (created if needed); the first is an admin"""
+    users = [User.objects.get_or_create(username=BENCHMARK_USERNAME.format(index))[0] for index in range(count)]
+    UserProfile.objects.filter(user=users[0]).update(is_mmg_admin=True)
+    return users
+
+
+def _seed_round(rng, round_number, participants, started, active):
+    game_round = GameRound.objects.create(round_number=round_number, active_round=active, date_started=started,
+        date_finished=None)
+
+    UserRoundDetail.objects.bulk_create([UserRoundDetail(user=user, game_round=game_round) for user in participants])
+
+    # one movie per participant, watched a few days apart
+    movies = []
+    for index, user in enumerate(participants):
+        movie = Movie.objects.create(name='Benchmark Movie {}-{}'.format(round_number, index + 1),
+            year=rng.randint(1950, 2020), game_round=game_round, watched=True,
+            date_watched=started + timedelta(days=index * ROUND_LENGTH_DAYS // len(participants)))
+        movies.append((movie, user))
+
+    umds = []
+    for movie, chooser in movies:
+        for user in participants:
+            if user == chooser:
+                umds.append(UserMovieDetail(user=user, movie=movie, is_user_movie=True, seen_previously=True,
+                    heard_of=True, star_rating=rng.choices(range(1, 6), STAR_WEIGHTS)[0], comments='My pick.'))
+            else:
+                umds.append(UserMovieDetail(user=user, movie=movie, is_user_movie=False,
+                    user_guess=rng.choice([other for other in participants if other != user]),
+                    seen_previously=rng.random() < SEEN_PREVIOUSLY_CHANCE, heard_of=rng.random() < HEARD_OF_CHANCE,
+                    star_rating=rng.choices(range(1, 6), STAR_WEIGHTS)[0],
+                    comments='Benchmark comment {} on {}.'.format(user.username, movie.name)))
+
+    # bulk_create skips the UMD signals, so do what they would have done
+    UserMovieDetail.objects.bulk_create(umds)
+    for movie, chooser in movies:
+        movie.update_rating_aggregates()
+    RoundProgress.objects.rebuild(game_round.id)
+
+    return game_round, movies
+
+
+def _conclude_round(game_round, movies):
+    """conclude the round the way ConcludeRoundView does"""
+    round_result = score_round(game_round)
+    commit_round_result(round_result)
+
+    game_round.round_completed = True
+    game_round.date_finished = game_round.date_started + timedelta(days=ROUND_LENGTH_DAYS)
+    game_round.winner_id = round_result.winner.user_id
+    game_round.save()
+
+    for movie, chooser in movies:
+        movie.chosen_by = chooser
+    Movie.objects.bulk_update([movie for movie, chooser in movies], fields=['chosen_by'])
+
+    refresh_party_payload(game_round)
+    refresh_standings(game_round)
+
+
+def seed_history(rounds=30, members=8, seed=1, log=print):
+    """add `rounds` rounds of history, the last one left in progress; returns the active GameRound"""
+    if members < 3:
+        raise ValueError('a round needs at least three members')
+
+    rng = random.Random(seed)
+
+    if not RoundRank.objects.exists():
+        create_ranks()
+
+    users = benchmark_members(members)
+
+    # the new rounds go after any that already exist, and the last of them becomes the active one
+    first_round_number = (GameRound.objects.aggregate(Max('round_number'))['round_number__max'] or 0) + 1
+    GameRound.objects.filter(active_lock=True).update(active_round=False, active_lock=None)
+    invalidate_round_state()
+
+    started = date.today() - timedelta(days=ROUND_LENGTH_DAYS * rounds)
+    game_round = None
+    for index in range(rounds):
+        active = index == rounds - 1
+        participants = rng.sample(users, rng.randint(max(3, members - 3), members))
+
+        game_round, movies = _seed_round(rng, first_round_number + index, participants, started, active)
+        if not active:
+            _conclude_round(game_round, movies)
+
+        started += timedelta(days=ROUND_LENGTH_DAYS)
+        log('Seeded round {} ({} participants)'.format(game_round.round_number, len(participants)))
+
+    UserProfile.objects.rebuild_all_totals()
+
+    # every party has been had: pages shouldn't redirect to the Results Party
+    PartyState.objects.all().delete()
+    PartyState.objects.create(idx=members + 1, next_time=timezone.now())
+
+    return game_round
@@ -0,0 +1,70 @@
+"""
+Conditional GET (ETag / Last-Modified) for the archive pages: Old Round results, Old Movie details and the historical
+Results Party pages.
+
+These pages don't change once their round is done, but a browser used to get the whole page again on every visit. Now
+they're sent with validators worked out from the round's data_version / data_modified (see GameRound), and the browser
+is told to check back every time (Cache-Control: no-cache). When it does, with If-None-Match / If-Modified-Since, and
+nothing has changed, it gets an empty 304: the view answers that from one small query, before any of the page is
+worked out or rendered.
+
+The pages also show the member's own name (and details, and the admin link), so the ETag covers who is asking too, and
+they're only ever cached privately. CONDITIONAL_GET_SALT is in every ETag as well: change it when a deploy changes these
+pages' templates, so browsers don't keep showing the old layout.
+
+(The party payload JSON has ETags of its own; see ResultsPartyPayloadView.)
+"""
+import hashlib
+
+from django.conf import settings
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+
+
+CONDITIONAL_GET_SALT = getattr(settings, 'CONDITIONAL_GET_SALT', '')
+
+CONDITIONAL_CACHE_CONTROL = 'private, no-cache'
+
+
+def make_etag(request, *parts):
+    """an ETag for parts (the versions the page is built from), the member asking and CONDITIONAL_GET_SALT"""
+    user = request.user
+    viewer = '{}:{}:{}:{}'.format(user.pk, user.username, user.userprofile.is_mmg_admin, CONDITIONAL_GET_SALT)
+    digest = hashlib.md5(viewer.encode()).hexdigest()[:12]
+    return '"{}-{}"'.format('-'.join(str(part) for part in parts), digest)
+
+
+def set_validators(response, etag, last_modified=None):
+    response['ETag'] = etag
+    if last_modified is not None:
+        response['Last-Modified'] = http_date(last_modified.timestamp())
+    response['Cache-Control'] = CONDITIONAL_CACHE_CONTROL
+    return response
+
+
+class ConditionalGetMixin:
+    """
+    For views whose page only changes when some version does. get_validators() returns (etag, last modified datetime
+    or None), or None for a page that shouldn't be conditional; it's called before anything else in get(), so it should
+    be cheap. Put this after LoginRequiredMixin, so anonymous requests are still sent to log in.
+    """
+
+    def get_validators(self):
+        return None
+
+    def get(self, request, *args, **kwargs):
+        validators = self.get_validators()
+        if validators is None:
+            return super().get(request, *args, **kwargs)
+
+        etag, last_modified = validators
+        not_modified = get_conditional_response(request, etag=etag,
+            last_modified=int(last_modified.timestamp()) if last_modified else None)
+        if not_modified is not None:
+            not_modified['Cache-Control'] = CONDITIONAL_CACHE_CONTROL
+            return not_modified
+
+        response = super().get(request, *args, **kwargs)
+        if response.status_code == 200:
+            set_validators(response, etag, last_modified)
+        return response
@@ -0,0 +1,177 @@
+"""
+A connection pool for the database backend in movies/backends/mysql_pool.
+
+With the stock MySQL backend and no CONN_MAX_AGE, every request opened a new connection to MySQL (TCP connect, handshake,
+authentication, the init_command) and closed it again at the end; during a Results Party, with everyone polling, setting
+up connections took longer than the queries themselves. A pooled connection is handed back to the pool at the end of the
+request instead, and the next request (in any thread of the same process) picks it up again.
+
+ConnectionPool knows nothing about MySQL or Django: it's given a connect() function, and keeps what that returns.
+
+ - min_size connections are opened up front (fill()), max_size is the most there will ever be; a checkout with all
+   max_size in use waits up to timeout seconds for one to be checked in, then raises PoolTimeout
+ - every checkout runs health_check(connection) (for MySQL, a ping) on the connection it's about to hand out; one that
+   fails is closed and replaced, so a connection MySQL dropped while it sat in the pool (wait_timeout) is never used
+ - connections older than max_lifetime seconds are closed instead of reused, so none outlives a server-side timeout
+ - stats() counts checkouts, waits (checkouts that had to wait), creates, discards (failed health checks, expired) and
+   timeouts, which are also printed every log_every checkouts
+
+Checking a connection in doesn't clean it up; the backend rolls back anything left open first (see base.py).
+"""
+import threading
+import time
+
+
+class PoolTimeout(Exception):
+    """no connection came free in time"""
+
+
+class ConnectionPool:
+
+    def __init__(self, connect, min_size=0, max_size=10, max_lifetime=3600, timeout=10, health_check=None,
+                 name='pool', log_every=0, clock=time.monotonic):
+        if max_size < 1 or min_size > max_size:
+            raise ValueError('need 0 <= min_size <= max_size and max_size >= 1, got {} / {}'.format(min_size, max_size))
+
+        self.connect = connect
+        self.min_size = min_size
+        self.max_size = max_size
+        self.max_lifetime = max_lifetime
+        self.timeout = timeout
+        self.health_check = health_check
+        self.name = name
+        self.log_every = log_every
+        self.clock = clock
+
+        self._lock = threading.Condition()
+        self._idle = []         # (connection, created at), the most recently checked in last
+        self._created = {}      # id(connection) -> created at, for every open connection, idle or checked out
+        self._size = 0          # open connections, counting ones being opened right now
+
+        self._stats = {'checkouts': 0, 'waits': 0, 'creates': 0, 'discards': 0, 'timeouts': 0}
+
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats, size=self._size, idle=len(self._idle), in_use=self._size - len(self._idle))
+
+
+    def fill(self):
+        """open connections until there are min_size of them"""
+        while True:
+            with self._lock:
+                if self._size >= self.min_size:
+                    return
+                self._size += 1
+            connection = self._open()
+            self._checkin_idle(connection)
+
+
+    def checkout(self):
+        with self._lock:
+            self._stats['checkouts'] += 1
+
+        deadline = None
+        while True:
+            with self._lock:
+                while not self._idle and self._size >= self.max_size:
+                    if deadline is None:
+                        self._stats['waits'] += 1
+                        deadline = self.clock() + self.timeout
+                    remaining = deadline - self.clock()
+                    if remaining <= 0:
+                        self._stats['timeouts'] += 1
+                        raise PoolTimeout('no free connection in {} after {}s ({} in use)'.format(
+                            self.name, self.timeout, self._size))
+                    self._lock.wait(remaining)
+
+                if self._idle:
+                    # the most recently used connection first: it's the least likely to have been dropped
+                    connection, created = self._idle.pop()
+                else:
+                    self._size += 1
+                    connection = None
+
+            if connection is None:
+                connection = self._open()
+            elif self._expired(created) or not self._healthy(connection):
+                self._discard(connection)
+                continue
+
+            self._maybe_log()
+            return connection
+
+
+    def checkin(self, connection):
+        """give back a connection from checkout(); expired ones are closed instead of kept"""
+        with self._lock:
+            created = self._created.get(id(connection))
+        if created is None or self._expired(created):
+            self._discard(connection)
+        else:
+            self._checkin_idle(connection)
+
+
+    def discard(self, connection):
+        """close a checked out connection instead of giving it back (e.g. it's broken)"""
+        self._discard(connection)
+
+
+    def close_all(self):
+        """close every idle connection (checked out ones are closed when they're checked in)"""
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for connection, created in idle:
+            self._discard(connection)
+
+
+    def _open(self):
+        try:
+            connection = self.connect()
+        except Exception:
+            with self._lock:
+                self._size -= 1
+                self._lock.notify()
+            raise
+        with self._lock:
+            self._created[id(connection)] = self.clock()
+            self._stats['creates'] += 1
+        return connection
+
+
+    def _checkin_idle(self, connection):
+        with self._lock:
+            self._idle.append((connection, self._created[id(connection)]))
+            self._lock.notify()
+
+
+    def _discard(self, connection):
+        with self._lock:
+            if self._created.pop(id(connection), None) is not None:
+                self._size -= 1
+                self._stats['discards'] += 1
+            self._lock.notify()
+        try:
+            connection.close()
+        except Exception:
+            pass    # it's going anyway
+
+
+    def _expired(self, created):
+        return self.max_lifetime is not None and self.clock() - created >= self.max_lifetime
+
+
+    def _healthy(self, connection):
+        if self.health_check is None:
+            return True
+        try:
+            self.health_check(connection)
+        except Exception:
+            return False
+        return True
+
+
+    def _maybe_log(self):
+        if self.log_every and self._stats['checkouts'] % self.log_every == 0:
+            stats = self.stats()
+            print('[db-pool] {} '.format(self.name) + ' '.join('{}={}'.format(key, value) for key, value in stats.items()))
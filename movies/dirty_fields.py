@@ -0,0 +1,143 @@
+"""
+Dirty-field tracking for models: save() writes only the fields that changed since the instance was loaded, and doesn't
+write at all when nothing did.
+
+A plain Model.save() rewrites every column of the row, whatever changed. Some of ours were doing that in hot paths for
+no reason: Movie re-slugified and rewrote itself for every assign_user() at round conclusion, update_average_rating()
+rewrote a whole UserRoundDetail to change one field, and every User save (every login's last_login too) re-saved the
+user's UserProfile untouched.
+
+DirtyFieldsMixin keeps a snapshot of the concrete field values as loaded from the database (from_db(), and
+refresh_from_db(), which also covers deferred fields being loaded), and again after each save. save() on an existing row
+then works out the changed fields and turns into save(update_fields=<them>); with none, it's skipped -- no query, and no
+pre_save / post_save signals, as with Django's own update_fields=[]. A save() given update_fields is left as it is.
+New rows, force_insert and saves given positional arguments are written in full, as before.
+
+Values are compared as the field would store them (field.to_python), so e.g. 3.5 assigned to a DecimalField holding
+Decimal('3.5') isn't a change. The snapshot is a shallow copy: don't use this on a model with mutable values (JSONField)
+that are changed in place.
+
+Every save is counted per model (see write_stats()): inserts, updates, full (forced / positional saves), skipped (writes
+avoided) and columns_skipped (columns left out of the UPDATEs). They're printed every DIRTY_FIELDS_LOG_EVERY saves, if
+that's set, and report_write_stats() prints them all at once (e.g. after seed_benchmark_data) if DIRTY_FIELDS_REPORT
+is on. Both are off by default.
+"""
+import threading
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+
+
+DIRTY_FIELDS_LOG_EVERY = getattr(settings, 'DIRTY_FIELDS_LOG_EVERY', 0)
+DIRTY_FIELDS_REPORT = getattr(settings, 'DIRTY_FIELDS_REPORT', False)
+
+_write_counts = defaultdict(Counter)
+_write_counts_lock = threading.Lock()
+
+
+def _count(model, **counts):
+    label = model._meta.label
+    with _write_counts_lock:
+        model_counts = _write_counts[label]
+        model_counts.update(counts)
+        total = model_counts['inserts'] + model_counts['updates'] + model_counts['full'] + model_counts['skipped']
+        log = DIRTY_FIELDS_LOG_EVERY and total % DIRTY_FIELDS_LOG_EVERY == 0
+        stats = dict(model_counts)
+    if log:
+        print('[dirty-fields] {} '.format(label) + ' '.join('{}={}'.format(key, value) for key, value in sorted(stats.items())))
+
+
+def write_stats():
+    """model label -> {'inserts', 'updates', 'full', 'skipped', 'columns_skipped'}, for this process"""
+    with _write_counts_lock:
+        return {label: {key: counts[key] for key in ('inserts', 'updates', 'full', 'skipped', 'columns_skipped')}
+                for label, counts in _write_counts.items()}
+
+
+def report_write_stats(log=print):
+    """log write_stats(), one line per model, if DIRTY_FIELDS_REPORT is on"""
+    if not DIRTY_FIELDS_REPORT:
+        return
+    for label, counts in sorted(write_stats().items()):
+        log('[dirty-fields] {} '.format(label) + ' '.join('{}={}'.format(key, value) for key, value in counts.items()))
+
+
+def reset_write_stats():
+    with _write_counts_lock:
+        _write_counts.clear()
+
+
+_DEFERRED = object()
+
+
+def _same(field, old, new):
+    if old == new:
+        return True
+    try:
+        return field.to_python(new) == field.to_python(old)
+    except (TypeError, ValueError, ValidationError):
+        return False
+
+
+class DirtyFieldsMixin:
+    """put before models.Model in the bases; see the module docstring"""
+
+    @classmethod
+    def _tracked_fields(cls):
+        return [field for field in cls._meta.concrete_fields if not field.primary_key]
+
+    def _take_snapshot(self, field_names=None):
+        # a new dict each time, so a copy.copy() of the instance doesn't share it
+        snapshot = dict(self.__dict__.get('_dirty_fields_snapshot', {}))
+        for field in self._tracked_fields():
+            if field_names is not None and field.name not in field_names and field.attname not in field_names:
+                continue
+            value = self.__dict__.get(field.attname, _DEFERRED)
+            if value is _DEFERRED or hasattr(value, 'resolve_expression'):
+                # deferred, or an F() waiting to be saved: unknown, so it counts as changed until it's loaded
+                snapshot.pop(field.attname, None)
+            else:
+                snapshot[field.attname] = value
+        self._dirty_fields_snapshot = snapshot
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._take_snapshot()
+        return instance
+
+    def refresh_from_db(self, using=None, fields=None, **kwargs):
+        super().refresh_from_db(using=using, fields=fields, **kwargs)
+        self._take_snapshot(fields)
+
+    def get_dirty_fields(self):
+        """names of the fields changed since this instance was loaded or last saved (every field, for a new one)"""
+        snapshot = self.__dict__.get('_dirty_fields_snapshot', {})
+        dirty = []
+        for field in self._tracked_fields():
+            if field.attname not in self.__dict__:
+                continue    # deferred and never set
+            if self._state.adding or field.attname not in snapshot or not _same(field, snapshot[field.attname], self.__dict__[field.attname]):
+                dirty.append(field.name)
+        return dirty
+
+    def is_dirty(self):
+        return bool(self.get_dirty_fields())
+
+    def save(self, *args, **kwargs):
+        if self._state.adding:
+            _count(type(self), inserts=1)
+        elif args or kwargs.get('force_insert') or kwargs.get('force_update'):
+            _count(type(self), full=1)
+        else:
+            if kwargs.get('update_fields') is None:
+                kwargs['update_fields'] = self.get_dirty_fields()
+            update_fields = set(kwargs['update_fields'])
+            if not update_fields:
+                _count(type(self), skipped=1)
+                return
+            _count(type(self), updates=1, columns_skipped=len(self._tracked_fields()) - len(update_fields))
+
+        super().save(*args, **kwargs)
+        self._take_snapshot(kwargs.get('update_fields'))
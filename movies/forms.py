@@ -2,6 +2,8 @@ from django import forms
 from django.contrib.auth.models import User
 
 from .models import Movie, UserMovieDetail, GameRound
+from .round_state import get_round_state
+from .roster import get_roster
 
 # currently, this form isn't really necessary; you could have the CreateView aut-create the form, since you
 # don't have any deviations from the default behavior in the form definition.
@@ -35,9 +37,13 @@ class UserMovieDetailForm(forms.ModelForm):
     def __init__(self, *args, **kwargs):
         current_user = kwargs.pop('current_user')  # we put this here in the view, in get_form_kwargs
         super().__init__(*args, **kwargs)
-        # need this for grabbing the queryset assigned below
-        current_round = GameRound.objects.filter(active_round=True).last()
-        self.fields['user_guess'].queryset = User.objects.filter(related_game_rounds=current_round).exclude(username=current_user.username)
+        # need this for grabbing the queryset assigned below (cached snapshot, see round_state.py)
+        current_round_id = get_round_state().active_round_id
+        self.fields['user_guess'].queryset = User.objects.filter(related_game_rounds=current_round_id).exclude(username=current_user.username)
+        # a submitted guess is checked against that queryset, i.e. the database; the drop-down is only for display, so
+        # it's drawn from the cached roster (see roster.py) and showing the form doesn't query at all
+        roster = [member for member in get_roster(current_round_id) if member.id != current_user.id]
+        self.fields['user_guess'].choices = [('', self.fields['user_guess'].empty_label)] + [(member.id, member.username) for member in roster]
 
 
 
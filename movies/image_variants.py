@@ -0,0 +1,141 @@
+"""
+Resized poster variants, made when a poster is uploaded.
+
+EditRoundImagesView saves posters exactly as uploaded, which is often several megabytes for an image shown 170 pixels
+wide, and the party page shows every poster in the round at once. make_poster_variants() resizes the uploaded poster to
+each width in media_manifest.POSTER_VARIANTS (thumb / grid / hero), saves each one as a JPEG and a WebP, and records them
+in the media manifest. Templates get them through media_manifest.poster_images(), as srcset / image-set() values.
+
+Variant files are named after a hash of their contents (movie/variants/12-grid-3fa9c2d17e0b.jpg), so a new upload gets
+new URLs and the old ones can be cached by browsers forever.
+
+A new upload's variants replace the old ones in the manifest, but the old files stay where they are for now: a page
+rendered a moment ago (or by a worker that hasn't seen the new manifest yet) may still point at them. They're deleted by
+sweep_poster_variants() (manage.py sweep_poster_variants) once they've been out of the manifest for
+POSTER_VARIANT_GRACE_SECONDS.
+
+Pillow is needed to make the variants. Without it uploads still work; the posters are just served as uploaded.
+"""
+import hashlib
+import io
+import logging
+import os
+import time
+
+from django.conf import settings
+
+from .media_manifest import (POSTER_VARIANTS, POSTER_VARIANT_FOLDER, POSTER_VARIANT_PATTERN, check_manifest, file_entry,
+                             get_manifest, update_manifest)
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:
+    Image = None
+
+
+JPEG_QUALITY = 82
+WEBP_QUALITY = 80
+
+# how long a variant that's no longer in the manifest is kept before sweep_poster_variants() deletes it
+POSTER_VARIANT_GRACE_SECONDS = getattr(settings, 'POSTER_VARIANT_GRACE_SECONDS', 24 * 60 * 60)
+
+logger = logging.getLogger(__name__)
+
+
+def _encode(image, image_format):
+    output = io.BytesIO()
+    if image_format == 'webp':
+        image.save(output, 'WEBP', quality=WEBP_QUALITY, method=6)
+    else:
+        image.save(output, 'JPEG', quality=JPEG_QUALITY, optimize=True, progressive=True)
+    return output.getvalue()
+
+
+def make_poster_variants(movie_id):
+    """
+    Make (or remake) the resized variants of movie_id's uploaded poster, and record them in the manifest. Returns the
+    poster's variants ({variant name: {format: relative path}}), or None if there's nothing to do it with.
+    """
+    if Image is None:
+        logger.warning('Pillow is not installed; not making resized variants of poster %s', movie_id)
+        return None
+
+    poster_path = 'movie/{}.jpg'.format(movie_id)
+    try:
+        source = Image.open(os.path.join(settings.MEDIA_ROOT, poster_path))
+        source = ImageOps.exif_transpose(source).convert('RGB')     # phone photos can be stored rotated
+    except (OSError, ValueError) as error:
+        logger.warning('Could not read poster %s: %s', poster_path, error)
+        return None
+
+    variants_path = os.path.join(settings.MEDIA_ROOT, POSTER_VARIANT_FOLDER)
+    os.makedirs(variants_path, exist_ok=True)
+
+    entries = {}
+    variants = {}
+    for name, width in POSTER_VARIANTS.items():
+        image = source
+        if source.width > width:    # never scale up
+            image = source.resize((width, round(source.height * width / source.width)), Image.LANCZOS)
+
+        for image_format in ('jpg', 'webp'):
+            data = _encode(image, image_format)
+            content_hash = hashlib.sha256(data).hexdigest()[:12]
+            relative_path = '{}/{}-{}-{}.{}'.format(POSTER_VARIANT_FOLDER, movie_id, name, content_hash, image_format)
+
+            full_path = os.path.join(settings.MEDIA_ROOT, relative_path)
+            with open(full_path, 'wb') as variant_file:
+                variant_file.write(data)
+            logger.info("Writing out %s", full_path)
+
+            entries[relative_path] = {'size': len(data), 'mtime': int(os.path.getmtime(full_path)), 'hash': content_hash,
+                'width': image.width, 'height': image.height}
+            variants.setdefault(name, {})[image_format] = relative_path
+
+    # the variants of whatever poster this one replaced drop out of the manifest (picked under its lock, so an upload
+    # recorded by another process in the meantime counts); the files are left for sweep_poster_variants()
+    def is_stale(relative_path):
+        if not relative_path.startswith(POSTER_VARIANT_FOLDER + '/'):
+            return False
+        match = POSTER_VARIANT_PATTERN.match(os.path.basename(relative_path))
+        return match is not None and match.group('movie_id') == str(movie_id)
+
+    poster = file_entry(os.path.join(settings.MEDIA_ROOT, poster_path))
+    poster['variants'] = variants
+    entries[poster_path] = poster
+    update_manifest(entries, remove_if=is_stale)
+
+    return variants
+
+
+def sweep_poster_variants(grace_seconds=None):
+    """
+    delete the variant files that aren't in the manifest and haven't been for grace_seconds (POSTER_VARIANT_GRACE_SECONDS
+    by default). A file's mtime is when it was written or, once replaced, when it was dropped from the manifest; either
+    way, one that's too recent may still be in use, or about to be recorded. Returns the relative paths deleted
+    """
+    if grace_seconds is None:
+        grace_seconds = POSTER_VARIANT_GRACE_SECONDS
+    variants_path = os.path.join(settings.MEDIA_ROOT, POSTER_VARIANT_FOLDER)
+    if not os.path.isdir(variants_path):
+        return []
+
+    check_manifest()
+    manifest = get_manifest()
+    cutoff = time.time() - grace_seconds
+
+    deleted = []
+    for filename in sorted(os.listdir(variants_path)):
+        relative_path = '{}/{}'.format(POSTER_VARIANT_FOLDER, filename)
+        full_path = os.path.join(variants_path, filename)
+        if relative_path in manifest or not POSTER_VARIANT_PATTERN.match(filename):
+            continue
+        try:
+            if os.path.getmtime(full_path) < cutoff:
+                os.remove(full_path)
+                deleted.append(relative_path)
+                logger.info('Deleted unused poster variant %s', full_path)
+        except OSError:
+            pass
+
+    return deleted
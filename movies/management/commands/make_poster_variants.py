@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from movies.image_variants import make_poster_variants
+from movies.media_manifest import get_manifest
+
+
+class Command(BaseCommand):
+    help = 'Make the resized (thumb / grid / hero, JPEG and WebP) variants of every uploaded poster'
+
+    def handle(self, *args, **options):
+        # new uploads get their variants straight away; this is for the posters uploaded before that was the case.
+        # run rebuild_media_manifest first if the manifest doesn't know about them yet.
+        count = 0
+        for relative_path in list(get_manifest()):
+            folder, _, filename = relative_path.rpartition('/')
+            if folder == 'movie' and filename.endswith('.jpg'):
+                if make_poster_variants(filename[:-len('.jpg')]) is not None:
+                    count += 1
+
+        self.stdout.write(self.style.SUCCESS('Made variants for {} posters.'.format(count)))
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from movies.media_manifest import rebuild_manifest
+
+
+class Command(BaseCommand):
+    help = 'Scan the uploaded posters and avatars in MEDIA_ROOT and write the media manifest from scratch'
+
+    def handle(self, *args, **options):
+        # needed once for files uploaded before the manifest existed, and any time files are copied into MEDIA_ROOT by hand
+        manifest = rebuild_manifest()
+
+        self.stdout.write(self.style.SUCCESS('Wrote media manifest with {} files.'.format(len(manifest))))
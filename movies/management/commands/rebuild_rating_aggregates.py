@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from movies.models import Movie
+
+
+class Command(BaseCommand):
+    help = 'Recalculate the stored rating aggregates (sum, count, average, star histogram) for every Movie'
+
+    def handle(self, *args, **options):
+        # needed once after the rating fields were added, and any time the stored values are suspected to have drifted
+        # (e.g. UMDs edited through a bulk update, which skips the signals that normally keep them current)
+        count = 0
+        for movie in Movie.objects.only('pk'):
+            movie.update_rating_aggregates()
+            count += 1
+
+        self.stdout.write(self.style.SUCCESS('Rebuilt rating aggregates for {} movies.'.format(count)))
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from movies.models import GameRound, RoundProgress
+
+
+class Command(BaseCommand):
+    help = "Recalculate every GameRound's stored submission progress (which members have submitted details for which movies)"
+
+    def handle(self, *args, **options):
+        # the Results page builds a missing row on its own; this is for rows suspected to have drifted (e.g. UMDs
+        # created or deleted through a bulk operation, which skips the signals that normally keep them current)
+        count = 0
+        for game_round_id in GameRound.objects.values_list('pk', flat=True):
+            RoundProgress.objects.rebuild(game_round_id)
+            count += 1
+
+        self.stdout.write(self.style.SUCCESS('Rebuilt submission progress for {} rounds.'.format(count)))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from movies.standings import rebuild_all_standings
+
+
+class Command(BaseCommand):
+    help = 'Recalculate the stored all-time standings (AllTimeScore) after every completed round'
+
+    def handle(self, *args, **options):
+        # needed once, for the rounds concluded before the standings were stored; after that, concluding a round keeps
+        # them current
+        count = rebuild_all_standings()
+
+        self.stdout.write(self.style.SUCCESS('Rebuilt the standings after {} rounds.'.format(count)))
@@ -0,0 +1,49 @@
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import setup_test_environment
+
+from movies.benchmark.harness import run_benchmarks, save_results, load_results, compare_results
+
+
+class Command(BaseCommand):
+    help = 'Time the pages that grow with the club history, and compare the results with a saved baseline'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--baseline', default=os.path.join(settings.BASE_DIR, 'benchmark_baseline.json'),
+            help='baseline file to compare against (and write, with --save)')
+        parser.add_argument('--save', action='store_true', help='save this run as the new baseline')
+        parser.add_argument('--repeat', type=int, default=5, help='warm requests per page')
+        parser.add_argument('--page', action='append', dest='pages', help='only this page (can be given more than once)')
+
+    def handle(self, *args, **options):
+        # lets the test client through ALLOWED_HOSTS
+        setup_test_environment()
+
+        try:
+            results = run_benchmarks(options['repeat'], options['pages'], log=self.stdout.write)
+        except (ValueError, RuntimeError) as error:
+            raise CommandError(error)
+
+        if options['save']:
+            save_results(results, options['baseline'])
+            self.stdout.write(self.style.SUCCESS('Saved baseline to {}'.format(options['baseline'])))
+            return
+
+        if not os.path.exists(options['baseline']):
+            self.stdout.write('No baseline at {}; run again with --save to make one.'.format(options['baseline']))
+            return
+
+        regressions = 0
+        self.stdout.write('\n{:<16} {:<13} {:>10} {:>10} {:>8}'.format('page', 'metric', 'baseline', 'now', 'change'))
+        for name, metric, old, new, change, regression in compare_results(load_results(options['baseline']), results):
+            line = '{:<16} {:<13} {:>10} {:>10} {:>+7.1f}%'.format(name, metric, old, new, change)
+            if regression:
+                regressions += 1
+                line = self.style.ERROR(line + '  REGRESSION')
+            self.stdout.write(line)
+
+        if regressions:
+            raise CommandError('{} metrics regressed against {}'.format(regressions, options['baseline']))
+        self.stdout.write(self.style.SUCCESS('No regressions against {}'.format(options['baseline'])))
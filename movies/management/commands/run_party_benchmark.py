@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import setup_test_environment
+
+from movies.benchmark.concurrency import run_party_concurrency
+from movies.models import UserProfile
+
+
+class Command(BaseCommand):
+    help = 'Compare how many Results Party clients can keep up with the reveal under WSGI-style and ASGI-style serving'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--clients', type=int, default=50, help='simulated party pages')
+        parser.add_argument('--workers', type=int, default=4, help='requests the WSGI side serves at once')
+        parser.add_argument('--seconds', type=float, default=10, help='how long each mode runs')
+        parser.add_argument('--interval', type=float, default=1.0, help='seconds between party index changes')
+
+    def handle(self, *args, **options):
+        # lets the test client through ALLOWED_HOSTS
+        setup_test_environment()
+
+        try:
+            results = run_party_concurrency(options['clients'], options['workers'], options['seconds'], options['interval'],
+                log=self.stdout.write)
+        except UserProfile.DoesNotExist:
+            raise CommandError('no benchmark data: run manage.py seed_benchmark_data first')
+
+        metrics = ('clients', 'changes', 'requests', 'lag_p50_ms', 'lag_p95_ms', 'lag_max_ms', 'missed', 'kept_up')
+        self.stdout.write('\n{:<12} {:>10} {:>10}'.format('', 'wsgi', 'asgi'))
+        for metric in metrics:
+            self.stdout.write('{:<12} {:>10} {:>10}'.format(metric, str(results['wsgi'][metric]), str(results['asgi'][metric])))
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from movies.benchmark.seed import seed_history
+from movies.dirty_fields import report_write_stats
+
+
+class Command(BaseCommand):
+    help = 'Fill the database with a synthetic club history for the benchmarks (use a scratch database!)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rounds', type=int, default=30, help='number of rounds to add (the last is left in progress)')
+        parser.add_argument('--members', type=int, default=8, help='number of members taking part')
+        parser.add_argument('--seed', type=int, default=1, help='random seed; the same seed gives the same history')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            active_round = seed_history(options['rounds'], options['members'], options['seed'], log=self.stdout.write)
+
+        # saves that dirty-field tracking narrowed or skipped along the way, with DIRTY_FIELDS_REPORT on (see movies/dirty_fields.py)
+        report_write_stats(log=self.stdout.write)
+
+        self.stdout.write(self.style.SUCCESS('Seeded {} rounds; round {} is active.'.format(options['rounds'], active_round.round_number)))
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from movies.image_variants import POSTER_VARIANT_GRACE_SECONDS, sweep_poster_variants
+
+
+class Command(BaseCommand):
+    help = 'Delete the resized poster variants that are no longer in the media manifest (after a grace period)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--grace-seconds', type=int, default=POSTER_VARIANT_GRACE_SECONDS,
+                            help='only delete variants that have been unused for at least this long')
+
+    def handle(self, *args, **options):
+        # a re-uploaded poster's old variants are left in place, since pages rendered before the upload still point at
+        # them; run this now and then (e.g. daily, from cron) to clear them out
+        deleted = sweep_poster_variants(options['grace_seconds'])
+
+        self.stdout.write(self.style.SUCCESS('Deleted {} unused poster variants.'.format(len(deleted))))
@@ -0,0 +1,287 @@
+"""
+Media manifest: an index of the posters and avatars that have been uploaded to MEDIA_ROOT.
+
+Pages used to decide between a poster in /media/movie/ and the old /static/img/movie/ fallback with an os.path.isfile()
+per movie, on every render. The media volume is network-backed, so every one of those stats was slow. Now the answer
+comes from the manifest, which is kept in memory: no filesystem calls on a page view.
+
+The manifest maps each file's path (relative to MEDIA_ROOT, e.g. 'movie/12.jpg' or 'user/3') to its size, mtime and a
+hash of its contents. A poster's entry also lists its resized variants, if any were made (see image_variants.py). It's
+saved to MEDIA_MANIFEST_PATH (BASE_DIR/media_manifest.json by default -- not under MEDIA_ROOT, which is served to
+anyone), and updated by record_asset() whenever one of the upload views writes a file. manage.py rebuild_media_manifest
+scans the media folders and writes it from scratch (needed once, for the files uploaded before the manifest existed).
+
+Each process keeps its own copy of the manifest in memory, along with a stamp (the manifest file's path, inode and mtime) saying which
+version it is. Every write puts the new stamp in the cache. A process compares its stamp with the cached one once per
+request (and every MEDIA_MANIFEST_CHECK_SECONDS outside of requests), and only re-reads the file when they differ: a
+page that shows fifty posters does one small cache.get(), not fifty copies of the whole manifest out of the cache.
+Another worker process sees a new upload on its next request if CACHES points at a shared cache; otherwise once the
+stamp has expired from its own cache, after MEDIA_MANIFEST_CACHE_SECONDS.
+"""
+import hashlib
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.cache import cache
+
+try:
+    import fcntl
+except ImportError:     # Windows
+    fcntl = None
+
+
+MEDIA_MANIFEST_STAMP_KEY = 'media:manifest:stamp'
+MEDIA_MANIFEST_CACHE_SECONDS = getattr(settings, 'MEDIA_MANIFEST_CACHE_SECONDS', 60)
+# outside of a request (management commands, the benchmark), how often the stamp is checked
+MEDIA_MANIFEST_CHECK_SECONDS = getattr(settings, 'MEDIA_MANIFEST_CHECK_SECONDS', 5)
+# where the manifest was saved before MEDIA_MANIFEST_PATH; rebuild_manifest() removes it
+MEDIA_MANIFEST_FILENAME = 'manifest.json'
+
+# the folders (under MEDIA_ROOT) that the manifest covers
+MEDIA_MANIFEST_FOLDERS = ('movie', 'user')
+
+# update_manifest() is a read-modify-write of the whole file: two uploads recorded at once (threads, or worker
+# processes) would each save their own copy, and one of the two entries would be lost. So writers take this lock, and
+# an flock() on a lock file next to the manifest for other processes (where there is flock(), i.e. not on Windows)
+_manifest_lock = threading.Lock()
+
+# this process's copy: (stamp, manifest). Replaced whole, never changed in place, so readers on other threads always
+# see a matching pair
+_loaded = (None, {})
+# whether the stamp needs checking before the in-memory copy is used again, and when it was last checked
+_check_due = True
+_checked_at = 0.0
+
+# (Fallback path to static movies) posters from before uploads went to MEDIA_ROOT
+STATIC_MOVIE_PATH = '/static/img/movie/'
+
+# resized copies of uploaded posters (see image_variants.py): movie/variants/<movie id>-<variant>-<content hash>.<format>
+POSTER_VARIANT_FOLDER = 'movie/variants'
+# variant name -> width in pixels. Posters are shown about 170 CSS pixels wide, so 'grid' covers ordinary screens and
+# 'hero' high-density ones
+POSTER_VARIANTS = getattr(settings, 'POSTER_VARIANTS', {'thumb': 128, 'grid': 256, 'hero': 512})
+POSTER_VARIANT_PATTERN = re.compile(r'^(?P<movie_id>\d+)-(?P<variant>[a-z]+)-(?P<hash>[0-9a-f]+)\.(?P<format>jpg|webp)$')
+
+
+def _manifest_file():
+    return getattr(settings, 'MEDIA_MANIFEST_PATH', os.path.join(settings.BASE_DIR, 'media_manifest.json'))
+
+
+@contextmanager
+def _locked_manifest():
+    """hold the manifest's write lock: in this process, and across processes where flock() is available"""
+    with _manifest_lock:
+        if fcntl is None:
+            yield
+            return
+        os.makedirs(os.path.dirname(_manifest_file()), exist_ok=True)
+        with open(_manifest_file() + '.lock', 'w') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def _read_manifest():
+    try:
+        with open(_manifest_file()) as manifest_file:
+            return json.load(manifest_file)
+    except (OSError, ValueError):
+        return {}
+
+
+def _write_manifest(manifest):
+    """save manifest; only call this holding _locked_manifest()"""
+    folder = os.path.dirname(_manifest_file())
+    os.makedirs(folder, exist_ok=True)
+
+    # write to a temporary file of our own and rename it over the old one, so a reader never sees half a manifest
+    temp_file = tempfile.NamedTemporaryFile('w', dir=folder, prefix='.manifest-', suffix='.tmp', delete=False)
+    try:
+        with temp_file:
+            json.dump(manifest, temp_file, indent=1, sort_keys=True)
+        os.replace(temp_file.name, _manifest_file())
+    except BaseException:
+        os.unlink(temp_file.name)
+        raise
+
+    _remember(manifest, _file_stamp())
+
+
+def _file_stamp():
+    # os.replace() puts a new file (a new inode) in place on every write, so this changes even if two writes land
+    # within the same mtime tick
+    try:
+        stat = os.stat(_manifest_file())
+    except OSError:
+        return '{}:missing'.format(_manifest_file())
+    return '{}:{}:{}'.format(_manifest_file(), stat.st_ino, stat.st_mtime_ns)
+
+
+def _remember(manifest, stamp):
+    global _loaded
+    _loaded = (stamp, manifest)
+    cache.set(MEDIA_MANIFEST_STAMP_KEY, stamp, MEDIA_MANIFEST_CACHE_SECONDS)
+
+
+def check_manifest(**kwargs):
+    """have the next get_manifest() check that this process's copy is current; connected to request_started"""
+    global _check_due
+    _check_due = True
+
+
+def get_manifest():
+    """the whole manifest, as a dict of relative path -> {'size', 'mtime', 'hash'}. Don't change it in place"""
+    global _check_due, _checked_at
+    stamp, manifest = _loaded
+
+    if _check_due or time.monotonic() - _checked_at > MEDIA_MANIFEST_CHECK_SECONDS:
+        _check_due = False
+        _checked_at = time.monotonic()
+
+        current_stamp = cache.get(MEDIA_MANIFEST_STAMP_KEY)
+        if current_stamp is None:
+            # not in the cache (expired, or nobody has loaded the manifest yet): the file itself says
+            current_stamp = _file_stamp()
+            cache.set(MEDIA_MANIFEST_STAMP_KEY, current_stamp, MEDIA_MANIFEST_CACHE_SECONDS)
+        if current_stamp != stamp:
+            manifest = _read_manifest()
+            _remember(manifest, current_stamp)
+
+    return manifest
+
+
+def get_asset(relative_path):
+    """the manifest entry for one file, or None if it isn't there"""
+    return get_manifest().get(relative_path)
+
+
+def file_entry(path):
+    """size, mtime and content hash of the file at path"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as media_file:
+        for chunk in iter(lambda: media_file.read(64 * 1024), b''):
+            digest.update(chunk)
+
+    stat = os.stat(path)
+    return {'size': stat.st_size, 'mtime': int(stat.st_mtime), 'hash': digest.hexdigest()[:16]}
+
+
+def update_manifest(entries, remove=(), remove_if=None):
+    """
+    add / replace several manifest entries (relative path -> entry dict), and drop the paths in remove, in one write.
+    remove_if(relative_path), if given, picks more paths to drop, from the manifest as it is when the write lock is held
+    (not from this process's copy, which may be behind). Files dropped from the manifest aren't deleted, just touched:
+    their mtime then says when they stopped being used (see image_variants.sweep_poster_variants())
+    """
+    # start from the saved copy rather than the cached one, in case another process has recorded an upload since; and
+    # hold the lock from the read to the write, so nobody else's update lands in between and gets overwritten
+    with _locked_manifest():
+        manifest = _read_manifest()
+        remove = set(remove)
+        if remove_if is not None:
+            remove.update(relative_path for relative_path in manifest if relative_path not in entries and remove_if(relative_path))
+        for relative_path in remove:
+            if manifest.pop(relative_path, None) is not None:
+                try:
+                    os.utime(os.path.join(settings.MEDIA_ROOT, relative_path))
+                except OSError:
+                    pass
+        manifest.update(entries)
+        _write_manifest(manifest)
+
+    return manifest
+
+
+def record_asset(relative_path):
+    """call after writing a file under MEDIA_ROOT, to add it to (or update it in) the manifest"""
+    entry = file_entry(os.path.join(settings.MEDIA_ROOT, relative_path))
+    update_manifest({relative_path: entry})
+
+    return entry
+
+
+def rebuild_manifest():
+    """scan the media folders and write the manifest from scratch; returns it"""
+    manifest = {}
+    for folder in MEDIA_MANIFEST_FOLDERS:
+        folder_path = os.path.join(settings.MEDIA_ROOT, folder)
+        if not os.path.isdir(folder_path):
+            continue
+        for filename in sorted(os.listdir(folder_path)):
+            path = os.path.join(folder_path, filename)
+            if os.path.isfile(path):
+                manifest['{}/{}'.format(folder, filename)] = file_entry(path)
+
+    # resized poster variants live in their own folder; hook them back up to the posters they were made from
+    variants_path = os.path.join(settings.MEDIA_ROOT, POSTER_VARIANT_FOLDER)
+    if os.path.isdir(variants_path):
+        for filename in sorted(os.listdir(variants_path)):
+            match = POSTER_VARIANT_PATTERN.match(filename)
+            poster = match and manifest.get('movie/{}.jpg'.format(match.group('movie_id')))
+            if poster:
+                relative_path = '{}/{}'.format(POSTER_VARIANT_FOLDER, filename)
+                manifest[relative_path] = file_entry(os.path.join(variants_path, filename))
+                poster.setdefault('variants', {}).setdefault(match.group('variant'), {})[match.group('format')] = relative_path
+
+    with _locked_manifest():
+        _write_manifest(manifest)
+
+    # the manifest used to be saved in MEDIA_ROOT, where anyone could download it
+    try:
+        os.remove(os.path.join(settings.MEDIA_ROOT, MEDIA_MANIFEST_FILENAME))
+    except FileNotFoundError:
+        pass
+
+    return manifest
+
+
+def movie_poster_path(movie_id):
+    """the folder URL to load movie_id's poster ('<id>.jpg') from: /media/movie/ if it was uploaded, else the old static one"""
+    if get_asset('movie/{}.jpg'.format(movie_id)):
+        return settings.MEDIA_URL + 'movie/'
+    return STATIC_MOVIE_PATH
+
+
+def media_url(relative_path):
+    return settings.MEDIA_URL + relative_path
+
+
+def poster_images(movie_id, default='grid'):
+    """
+    What a template needs to show movie_id's poster, as a dict:
+     - src: URL of the 'default' variant as a JPEG (or of the poster as uploaded / the old static one, if it has none)
+     - srcset / webp_srcset: every variant, for <img srcset> and <source type="image/webp" srcset> ('' without variants)
+     - background_css: CSS background-image declaration(s) for posters shown as a background; browsers that understand
+       image-set() get the WebP / high-density variants, everything else gets src
+    """
+    poster = get_asset('movie/{}.jpg'.format(movie_id))
+    variants = poster.get('variants', {}) if poster else {}
+
+    if not variants:
+        src = movie_poster_path(movie_id) + '{}.jpg'.format(movie_id)
+        return {'src': src, 'srcset': '', 'webp_srcset': '', 'background_css': "background-image: url('{}');".format(src)}
+
+    def srcset(image_format):
+        return ', '.join('{} {}w'.format(media_url(variants[name][image_format]), width)
+                         for name, width in POSTER_VARIANTS.items() if image_format in variants.get(name, {}))
+
+    src = media_url(variants.get(default, next(iter(variants.values())))['jpg'])
+    background_css = "background-image: url('{}');".format(src)
+
+    image_set = []
+    for image_format, mime_type in (('webp', 'image/webp'), ('jpg', 'image/jpeg')):
+        for name, density in ((default, '1x'), ('hero', '2x')):
+            if image_format in variants.get(name, {}):
+                image_set.append("url('{}') type('{}') {}".format(media_url(variants[name][image_format]), mime_type, density))
+    if image_set:
+        background_css += " background-image: image-set({});".format(', '.join(image_set))
+
+    return {'src': src, 'srcset': srcset('jpg'), 'webp_srcset': srcset('webp'), 'background_css': background_css}
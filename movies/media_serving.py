@@ -0,0 +1,149 @@
+"""
+Serving uploaded media (posters and avatars) in production.
+
+These used to go through django.views.static.serve: a Python worker read out every image, every time, with no caching
+headers to speak of, and on party night that's a lot of workers busy sending images. serve_media() replaces it:
+
+ - answers If-None-Match / If-Modified-Since with a 304, using the hash and mtime from the media manifest
+   (see media_manifest.py), so an image the browser already has costs no disk access at all
+ - marks content-hashed files (the poster variants) and versioned URLs (?v=<hash>, as used for avatars) as immutable,
+   so browsers don't ask again at all
+ - supports single byte ranges (Range / If-Range)
+ - with MEDIA_SENDFILE set, hands the file over to the front proxy instead of sending it from Python:
+   'x-accel-redirect' for nginx (an internal location MEDIA_ACCEL_REDIRECT_PREFIX aliased to MEDIA_ROOT is needed),
+   or 'x-sendfile' for Apache mod_xsendfile / lighttpd. The proxy then deals with ranges itself.
+"""
+import mimetypes
+import os
+import re
+from stat import S_ISREG
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, Http404, HttpResponse
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+
+from .media_manifest import POSTER_VARIANT_FOLDER, get_asset
+
+
+MEDIA_SENDFILE = getattr(settings, 'MEDIA_SENDFILE', None)      # None, 'x-accel-redirect' or 'x-sendfile'
+MEDIA_ACCEL_REDIRECT_PREFIX = getattr(settings, 'MEDIA_ACCEL_REDIRECT_PREFIX', '/protected-media/')
+
+# how long a browser may keep media whose URL doesn't change when the file does (e.g. /media/user/3) before checking
+MEDIA_MAX_AGE_SECONDS = getattr(settings, 'MEDIA_MAX_AGE_SECONDS', 60)
+
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+
+RANGE_PATTERN = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+def _is_immutable(request, relative_path, entry):
+    if relative_path.startswith(POSTER_VARIANT_FOLDER + '/'):
+        return True     # content-hashed name: a new upload gets a new name
+    return request.GET.get('v') == entry['hash']
+
+
+def _byte_range(request, etag, last_modified, size):
+    """the (start, end) of the single byte range asked for, None for the whole file, or 'invalid' for a 416"""
+    range_header = request.headers.get('Range')
+    if not range_header or request.method != 'GET':
+        return None
+
+    # If-Range: only send the range if the client's copy is still current, otherwise send everything
+    if_range = request.headers.get('If-Range')
+    if if_range and if_range != etag and if_range != last_modified:
+        return None
+
+    match = RANGE_PATTERN.match(range_header.strip())
+    if not match or match.groups() == ('', ''):
+        return None     # multiple ranges or something else we don't do; just send the whole file
+
+    first, last = match.groups()
+    if first == '':
+        # suffix range: the last N bytes
+        start, end = max(size - int(last), 0), size - 1
+    else:
+        start, end = int(first), min(int(last), size - 1) if last else size - 1
+
+    if start >= size or start > end:
+        return 'invalid'
+    return start, end
+
+
+def serve_media(request, path):
+    try:
+        full_path = safe_join(settings.MEDIA_ROOT, path)
+    except SuspiciousFileOperation:
+        raise Http404
+
+    relative_path = path.lstrip('/')
+
+    # the manifest already knows the file's size, mtime and hash; only stat files it doesn't know about
+    entry = get_asset(relative_path)
+    if entry is None:
+        try:
+            stat = os.stat(full_path)
+        except OSError:
+            raise Http404
+        if not S_ISREG(stat.st_mode):
+            raise Http404
+        # not worth hashing the whole file on every request; its mtime and size will do as a version
+        entry = {'size': stat.st_size, 'mtime': int(stat.st_mtime), 'hash': '{:x}-{:x}'.format(int(stat.st_mtime), stat.st_size)}
+
+    etag = '"{}"'.format(entry['hash'])
+    last_modified = http_date(entry['mtime'])
+
+    cache_control = IMMUTABLE_CACHE_CONTROL if _is_immutable(request, relative_path, entry) else \
+        'public, max-age={}'.format(MEDIA_MAX_AGE_SECONDS)
+
+    not_modified = get_conditional_response(request, etag=etag, last_modified=entry['mtime'])
+    if not_modified is not None:
+        not_modified['Cache-Control'] = cache_control
+        return not_modified
+
+    content_type, encoding = mimetypes.guess_type(full_path)
+    content_type = content_type or 'application/octet-stream'
+
+    if MEDIA_SENDFILE:
+        # let the front proxy send the bytes (and handle Range); we only decide whether and with which headers
+        response = HttpResponse(content_type=content_type)
+        if MEDIA_SENDFILE == 'x-accel-redirect':
+            response['X-Accel-Redirect'] = MEDIA_ACCEL_REDIRECT_PREFIX + relative_path
+        else:
+            response['X-Sendfile'] = full_path
+    else:
+        try:
+            media_file = open(full_path, 'rb')
+        except OSError:
+            raise Http404
+
+        # the size from the open file, not the manifest: the file may have been replaced since the manifest was cached
+        size = os.fstat(media_file.fileno()).st_size
+
+        byte_range = _byte_range(request, etag, last_modified, size)
+        if byte_range == 'invalid':
+            media_file.close()
+            response = HttpResponse(status=416)
+            response['Content-Range'] = 'bytes */{}'.format(size)
+            return response
+
+        if byte_range is None:
+            response = FileResponse(media_file, content_type=content_type)
+        else:
+            start, end = byte_range
+            with media_file:
+                media_file.seek(start)
+                response = HttpResponse(media_file.read(end - start + 1), content_type=content_type, status=206)
+            response['Content-Range'] = 'bytes {}-{}/{}'.format(start, end, size)
+
+        response['Accept-Ranges'] = 'bytes'
+
+    if encoding:
+        response['Content-Encoding'] = encoding
+    response['ETag'] = etag
+    response['Last-Modified'] = last_modified
+    response['Cache-Control'] = cache_control
+
+    return response
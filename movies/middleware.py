@@ -0,0 +1,183 @@
+"""
+Per-request timing, for finding the slow pages in production.
+
+ServerTimingMiddleware measures, for every request:
+ - db:       how many queries were run and how long they took (an execute wrapper, so one perf_counter pair per query
+             and nothing else; queries are not recorded like DEBUG's connection.queries)
+ - template: how long the response's template took to render, not counting the queries run while rendering
+             (lazy querysets), which count under db. This covers the class-based views, whose TemplateResponse is
+             rendered after the view returns; a view that calls render() itself has its template time counted under app
+ - app:      everything else (total - db - template)
+ - total:    from this middleware seeing the request to it seeing the response
+
+and reports them two ways: a Server-Timing header, which shows up in the browser's dev tools under the request's
+Timing tab, and an INFO message per request on the 'movies.middleware' logger, tagged with the view name, e.g.
+
+    server_timing view=movies:resultspartystate method=GET status=200 total_ms=14.2 app_ms=9.8 db_ms=4.4 db_queries=3 template_ms=0.0
+
+The numbers are also on the log record (record.server_timing), for handlers that want them as fields. Where the
+messages go, if anywhere, is up to LOGGING (production.py sends them to the console); Python's default is to drop
+INFO messages. Put it first in MIDDLEWARE, so the total includes the other middleware (sessions, auth...).
+SERVER_TIMING_HEADER switches the header off.
+
+It works both ways round, sync (WSGI) and async (ASGI), so under ASGI it doesn't push the async party views back onto
+a thread. In async mode the queries run on sync_to_async's threads, each with its own connection, so the execute
+wrapper can't just be put on the request thread's connection: instead every connection gets the same wrapper when it's
+opened (install_query_timer, see signals.py), and it finds the request's timer in a context variable, which
+sync_to_async carries over to the thread. The party views also run some queries with thread_sensitive=False, i.e. on
+some other thread at the same time as the request's own, so the timer's counters are updated under a lock.
+"""
+import asyncio
+import contextvars
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.db import connection
+from django.utils.deprecation import MiddlewareMixin
+
+
+SERVER_TIMING_HEADER = getattr(settings, 'SERVER_TIMING_HEADER', True)
+
+logger = logging.getLogger(__name__)
+
+
+class RequestTimer:
+    """the numbers for one request; also the execute_wrapper that counts its queries"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.db_queries = 0
+        self.db_seconds = 0.0
+        self.template_started = None
+        self.template_db_seconds = 0.0
+        self.template_seconds = 0.0
+        self.lock = threading.Lock()
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - started
+            with self.lock:
+                self.db_seconds += elapsed
+                self.db_queries += 1
+
+    def template_rendered(self, response):
+        if self.template_started is not None:
+            elapsed = time.perf_counter() - self.template_started
+            self.template_seconds += elapsed - (self.db_seconds - self.template_db_seconds)
+            self.template_started = None
+
+    def metrics(self):
+        """name -> milliseconds, plus the query count"""
+        total = (time.perf_counter() - self.started) * 1000
+        db = self.db_seconds * 1000
+        template = self.template_seconds * 1000
+        return {
+            'total': total,
+            'app': total - db - template,
+            'db': db,
+            'template': template,
+            'db_queries': self.db_queries,
+        }
+
+
+# the timer of the request being handled, if any; sync_to_async copies it into the threads it runs code on
+_request_timer = contextvars.ContextVar('server_timing_request_timer', default=None)
+
+
+def _timed_execute(execute, sql, params, many, context):
+    timer = _request_timer.get()
+    if timer is None:
+        return execute(sql, params, many, context)     # not in a request (management commands, startup...)
+    return timer(execute, sql, params, many, context)
+
+
+def install_query_timer(sender=None, connection=None, **kwargs):
+    """put the timing execute wrapper on connection; a connection_created receiver (see signals.py)"""
+    if _timed_execute not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_timed_execute)
+
+
+def server_timing_header(metrics):
+    return ', '.join([
+        'app;dur={:.1f}'.format(metrics['app']),
+        'db;dur={:.1f};desc="{} queries"'.format(metrics['db'], metrics['db_queries']),
+        'template;dur={:.1f}'.format(metrics['template']),
+        'total;dur={:.1f}'.format(metrics['total']),
+    ])
+
+
+def view_name(request):
+    """'namespace:name' of the URL pattern the request matched, or the view's dotted path if it isn't named"""
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return '-'      # didn't resolve (404), or a middleware answered before the URL was resolved
+    return match.view_name or match._func_path
+
+
+class ServerTimingMiddleware(MiddlewareMixin):
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.is_async = asyncio.iscoroutinefunction(get_response)
+        # (MiddlewareMixin marks this instance as a coroutine function when get_response is one)
+        super().__init__(get_response)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.timed_async(request)
+
+        timer = RequestTimer()
+        request._server_timer = timer
+
+        # (this thread's connection may have been opened before the connection_created receiver was connected)
+        install_query_timer(connection=connection)
+        token = _request_timer.set(timer)
+        try:
+            response = self.get_response(request)
+        finally:
+            _request_timer.reset(token)
+
+        return self.report(request, response, timer)
+
+    async def timed_async(self, request):
+        timer = RequestTimer()
+        request._server_timer = timer
+
+        token = _request_timer.set(timer)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _request_timer.reset(token)
+
+        return self.report(request, response, timer)
+
+    def report(self, request, response, timer):
+        metrics = timer.metrics()
+
+        if SERVER_TIMING_HEADER:
+            response['Server-Timing'] = server_timing_header(metrics)
+
+        if logger.isEnabledFor(logging.INFO):
+            fields = {'view': view_name(request), 'method': request.method, 'status': response.status_code,
+                      'total_ms': round(metrics['total'], 1), 'app_ms': round(metrics['app'], 1),
+                      'db_ms': round(metrics['db'], 1), 'db_queries': metrics['db_queries'],
+                      'template_ms': round(metrics['template'], 1)}
+            logger.info('server_timing %s', ' '.join('{}={}'.format(key, value) for key, value in fields.items()),
+                        extra={'server_timing': fields})
+
+        return response
+
+    def process_template_response(self, request, response):
+        # called just before the handler renders a TemplateResponse; the post-render callback stops the clock.
+        # Being first in MIDDLEWARE, this is the last process_template_response to run, so nothing else is timed
+        timer = request._server_timer
+        timer.template_started = time.perf_counter()
+        timer.template_db_seconds = timer.db_seconds
+        response.add_post_render_callback(timer.template_rendered)
+        return response
@@ -0,0 +1,24 @@
+# Generated by Django 4.2.16 on 2026-10-18 07:14
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movies', '0016_movie_rating_aggregates'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PartyPayload',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('version', models.PositiveIntegerField(default=1)),
+                ('document', models.JSONField()),
+                ('built_at', models.DateTimeField(auto_now=True)),
+                ('game_round', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='party_payload', to='movies.gameround')),
+            ],
+        ),
+    ]
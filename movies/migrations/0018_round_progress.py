@@ -0,0 +1,23 @@
+# Generated by Django 4.2.16 on 2026-10-18 07:16
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movies', '0017_party_payload'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RoundProgress',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('submitted', models.JSONField(default=dict)),
+                ('details_received', models.PositiveIntegerField(default=0)),
+                ('game_round', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='progress', to='movies.gameround')),
+            ],
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 4.2.16 on 2026-10-18 07:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movies', '0018_round_progress'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='gameround',
+            index=models.Index(fields=['active_round'], name='gameround_active_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='gameround',
+            index=models.Index(fields=['round_completed', 'round_number'], name='gameround_completed_num_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='movie',
+            index=models.Index(fields=['game_round', 'date_watched'], name='movie_round_watched_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='pointsearned',
+            index=models.Index(fields=['user_round_ob', 'point_type'], name='points_urd_type_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='usermoviedetail',
+            index=models.Index(fields=['movie', 'is_user_movie'], name='umd_movie_user_movie_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='usermoviedetail',
+            index=models.Index(fields=['movie', 'user_guess'], name='umd_movie_guess_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='userrounddetail',
+            index=models.Index(fields=['game_round', 'rank'], name='urd_round_rank_idx'),
+        ),
+    ]
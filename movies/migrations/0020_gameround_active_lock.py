@@ -0,0 +1,37 @@
+# Generated by Django 4.2.16 on 2026-10-18 07:24
+
+from django.db import migrations, models
+
+
+def lock_active_round(apps, schema_editor):
+    """
+    Set active_lock on the active round. If more than one round is marked active, the one the pages were showing (the
+    last one, by id) stays active and the others are de-activated, since the unique lock can only be held by one.
+    """
+    GameRound = apps.get_model('movies', 'GameRound')
+
+    active_ids = list(GameRound.objects.filter(active_round=True).order_by('id').values_list('id', flat=True))
+    if not active_ids:
+        return
+
+    if len(active_ids) > 1:
+        print('\nMore than one active round: keeping round id {} active, de-activating {}'.format(active_ids[-1], active_ids[:-1]))
+        GameRound.objects.filter(id__in=active_ids[:-1]).update(active_round=False)
+
+    GameRound.objects.filter(id=active_ids[-1]).update(active_lock=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movies', '0019_hot_path_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='gameround',
+            name='active_lock',
+            field=models.BooleanField(editable=False, null=True, unique=True),
+        ),
+        migrations.RunPython(lock_active_round, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,56 @@
+# Generated by Django 4.2.16 on 2026-10-18 07:28
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('movies', '0020_gameround_active_lock'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='alltimescore',
+            name='game_round',
+            field=models.OneToOneField(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='standings', to='movies.gameround'),
+        ),
+        migrations.AddField(
+            model_name='alltimescore',
+            name='standings',
+            field=models.JSONField(default=dict),
+        ),
+        migrations.AlterField(
+            model_name='alltimescore',
+            name='most_disliked_points',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='all_time_disliked', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AlterField(
+            model_name='alltimescore',
+            name='most_guess_points',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='all_time_guess', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AlterField(
+            model_name='alltimescore',
+            name='most_liked_points',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='all_time_liked', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AlterField(
+            model_name='alltimescore',
+            name='most_rounds_won',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='all_time_rounds', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AlterField(
+            model_name='alltimescore',
+            name='most_seen_points',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='all_time_seen', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AlterField(
+            model_name='alltimescore',
+            name='most_unseen_points',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='all_time_unseen', to=settings.AUTH_USER_MODEL),
+        ),
+    ]
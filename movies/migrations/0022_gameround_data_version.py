@@ -0,0 +1,18 @@
+# Generated by Django 4.2.16 on 2026-10-18 07:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movies', '0021_alltimescore_standings'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='gameround',
+            name='data_version',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.16 on 2026-10-18 07:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movies', '0022_gameround_data_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='gameround',
+            name='data_modified',
+            field=models.DateTimeField(editable=False, null=True),
+        ),
+    ]
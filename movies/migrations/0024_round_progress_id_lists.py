@@ -0,0 +1,39 @@
+# Generated by Django 4.2.16 on 2026-10-18 08:05
+
+from django.db import migrations
+
+
+def bitmaps_to_id_lists(apps, schema_editor):
+    """RoundProgress.submitted was movie id -> hex bitmap of user ids; it's movie id -> sorted list of user ids now"""
+    RoundProgress = apps.get_model('movies', 'RoundProgress')
+
+    for progress in RoundProgress.objects.all():
+        submitted = {}
+        for movie_id, mask in progress.submitted.items():
+            if isinstance(mask, list):
+                submitted[movie_id] = mask     # already converted
+                continue
+            mask = int(mask, 16)
+            submitted[movie_id] = [user_id for user_id in range(mask.bit_length()) if mask >> user_id & 1]
+        progress.submitted = submitted
+        progress.save(update_fields=['submitted'])
+
+
+def id_lists_to_bitmaps(apps, schema_editor):
+    RoundProgress = apps.get_model('movies', 'RoundProgress')
+
+    for progress in RoundProgress.objects.all():
+        progress.submitted = {movie_id: format(sum(1 << user_id for user_id in user_ids), 'x')
+                              for movie_id, user_ids in progress.submitted.items()}
+        progress.save(update_fields=['submitted'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movies', '0023_gameround_data_modified'),
+    ]
+
+    operations = [
+        migrations.RunPython(bitmaps_to_id_lists, id_lists_to_bitmaps),
+    ]
@@ -1,25 +1,40 @@
-from django.db import models
+from django.db import models, transaction
 from django.conf import settings
 from django.urls import reverse
+from django.utils import timezone
 from django.utils.text import slugify
 from django.db.models import F, Max, Min, Avg
 from datetime import date
-from django.db.models import Avg, Max, Min, Count, Q
+from django.db.models import Avg, Max, Min, Count, Q, Sum
 from django.core.exceptions import ObjectDoesNotExist
+from decimal import Decimal
 
+from .dirty_fields import DirtyFieldsMixin
 
 
-class GameRound(models.Model):
+
+class GameRoundManager(models.Manager):
+
+    def bump_data_version(self, game_round_id):
+        """note that something the round's results are worked out from (its movies, details or participants) changed"""
+        self.filter(pk=game_round_id).update(data_version=F('data_version') + 1, data_modified=timezone.now())
+
+
+class GameRound(DirtyFieldsMixin, models.Model):
     
     bool_choices = ((True, 'Yes'), (False, 'No'))
 
     # the method to set this is called by the CreateView that creats this object CreateRoundView
     round_number = models.PositiveSmallIntegerField()
 
-    # Q: should you add unique=True to this field, so only one game round record can be the active round?
-    # what happens if this unique rule is broken? 
     active_round = models.BooleanField(choices=bool_choices, default=False, verbose_name="Is this round currently active?")  # is this the 'active' round, now in progress.
 
+    # only one round can be the active round, and this is what enforces it: True on the active round, NULL on every other
+    # one (a unique column can hold any number of NULLs, but only one True). save() keeps it in step with active_round,
+    # and also de-activates the previously active round when another one is made active. Looking the active round up by
+    # it is a unique index lookup.
+    active_lock = models.BooleanField(null=True, unique=True, editable=False)
+
     # a round can be complete and still  be the active round -- e.g. it's data is displayed on index and will be there until a new round is started
     round_completed = models.BooleanField(choices=bool_choices, default=False, verbose_name="Round Already Completed?")
 
@@ -35,14 +50,59 @@ class GameRound(models.Model):
     participants = models.ManyToManyField(settings.AUTH_USER_MODEL, through='UserRoundDetail', verbose_name='Participating Members', 
         related_name='related_game_rounds')
 
+    # goes up by one whenever the round or anything its results are worked out from changes: the round itself (save()
+    # below), its movies, its participants and their details (see signals.py). Anything derived from a round's data
+    # can be stored / cached under (round id, data_version) and is current for as long as the version matches.
+    data_version = models.PositiveIntegerField(default=0, editable=False)
+    # ...and when it last did, for Last-Modified headers (see conditional.py). NULL for rounds untouched since it was added
+    data_modified = models.DateTimeField(null=True, editable=False)
+
+    objects = GameRoundManager()
+
 
     def __str__(self):
         return 'Round {}'.format(self.round_number)
 
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['active_round'], name='gameround_active_idx'),
+            # list of completed rounds, in order (results page, overview, party archive)
+            models.Index(fields=['round_completed', 'round_number'], name='gameround_completed_num_idx'),
+        ]
+
+
     def save(self, *args, **kwargs):
         """ do stuff here as needed"""
-        super().save(*args, **kwargs)
+        self.active_lock = True if self.active_round else None
+
+        # only the fields that changed are written (see dirty_fields.py), and nothing at all if none did: then the
+        # round's data hasn't changed either, so there's no version to bump
+        adding = self._state.adding
+        if not adding and not args and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = self.get_dirty_fields()
+        if kwargs.get('update_fields') is not None and not kwargs['update_fields']:
+            return super().save(*args, **kwargs)
+
+        # bump data_version in the UPDATE itself, rather than writing back the number this instance was loaded with (a
+        # signal may have bumped it since)
+        self.data_modified = timezone.now()
+        if not adding:
+            self.data_version = F('data_version') + 1
+            if kwargs.get('update_fields') is not None:
+                kwargs['update_fields'] = list(kwargs['update_fields']) + ['data_version', 'data_modified']
+
+        with transaction.atomic():
+            if self.active_round:
+                # there can be only one: de-activate whichever round was active before this one. update() sends no
+                # signals, but saving this round invalidates the cached round state anyway (see signals.py)
+                GameRound.objects.filter(active_lock=True).exclude(pk=self.pk).update(active_round=False, active_lock=None)
+            super().save(*args, **kwargs)
+
+        if not adding:
+            # the new number is only known to the database; rather than a query to read it back now, leave the field
+            # deferred, so it's loaded if and when something asks for it
+            del self.__dict__['data_version']
 
 
     def get_absolute_url(self):
@@ -54,46 +114,30 @@ class GameRound(models.Model):
             return reverse('movies:old_round_results', kwargs={'pk': str(self.pk)})
 
 
-#NOTE: this is not currently used at all, and isn't really necessary; data is drawn from UserProfiles to show all-time scores.
 class AllTimeScore(models.Model):
     """Stores current all-time ranks for specific areas, as tabulated every time a Round is concluded; e.g. 'best guesser', 'worst movie chooser'"""
 
-    # each record is a "timestamp" of when the last calculation was run. A given record says: "at time of calculation on date X, here are the 
-    # all-time-standings per specific rank-type"
+    # each record is a "timestamp" of the standings after one round: "after round N, here are the all-time standings per
+    # rank-type". The records are written by standings.refresh_standings() when a round is concluded (not by save(), and
+    # not by the view that shows them); see standings.py
 
     date_created = models.DateTimeField(auto_now_add=True)
 
-    most_rounds_won = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="all_time_rounds", null=True)
-    most_guess_points = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="all_time_guess")
-    most_liked_points = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="all_time_liked")
-    most_disliked_points = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="all_time_disliked")
-    most_seen_points = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="all_time_seen")
-    most_unseen_points = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="all_time_unseen")
-
-    def __str__(self):
-        return 'All-Time Results as tabulated on {}'.format(self.date_last_run)
-
-    # with this approach of having 'hard coded' the rank fields, we can write methods that update those fields meaningfully
-
-    # Question: given that a new record always represents the tabulation of results at that time, should the calculation code go into
-    # the save method rather than an additional custom method? Answer: Yes, that is the design principle of this table: any update to scores
-    # always represents A NEW RECORD IN THE TABLE. A method that updates the above fields for an existing record is pointless, we don't
-    # need to ever update those unless something went wrong in calculations and we needed to override results; any given record of this table
-    # will show the standings at the time that record was created. there is no "update" to an instance, we simply create a new record
-    # instead.
+    game_round = models.OneToOneField(GameRound, on_delete=models.CASCADE, related_name='standings', null=True)
 
-    def save(self, *args, **kwargs):
-        """add logic here"""
-        
-        # first, calculate all the #1 placehodlers for each field-rank at time of new record creation; use aggregates to do that?
-        # you will simply compute that by looking at all UserProfile objects, then grabbing the relevant user.
-
-        # then do self.most_rounds_won = result_here
+    # the full standings: every category's ranking, with each member's value, rank and movement since the round before
+    standings = models.JSONField(default=dict)
 
-        # I guess the only remaining question is, what calls the constructor of this class? the view? that's bad -- that would create
-        # a record everytime the relevant page is rendered! It should be added as an Admin function in the admin page.
+    # the leader of each category, as of this round
+    most_rounds_won = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, related_name="all_time_rounds", null=True)
+    most_guess_points = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, related_name="all_time_guess", null=True)
+    most_liked_points = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, related_name="all_time_liked", null=True)
+    most_disliked_points = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, related_name="all_time_disliked", null=True)
+    most_seen_points = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, related_name="all_time_seen", null=True)
+    most_unseen_points = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, related_name="all_time_unseen", null=True)
 
-        super().save(*args, **kwargs)
+    def __str__(self):
+        return 'All-Time Results after {}'.format(self.game_round)
 
 
 class RoundRank(models.Model):
@@ -111,7 +155,7 @@ class Trophy(models.Model):
 
 
 #intermediary table of the 'participants' M2M field in GameRound above
-class UserRoundDetail(models.Model):
+class UserRoundDetail(DirtyFieldsMixin, models.Model):
     # M2M connections
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
     game_round = models.ForeignKey(GameRound, on_delete=models.CASCADE)
@@ -138,6 +182,12 @@ class UserRoundDetail(models.Model):
 
     finalized_by_admin = models.BooleanField(default=False)
 
+    class Meta:
+        indexes = [
+            # a round's participants by rank (winner, podium)
+            models.Index(fields=['game_round', 'rank'], name='urd_round_rank_idx'),
+        ]
+
 
     def __str__(self):
         return 'Round {} results for {}'.format(self.game_round.round_number, self.user.username)
@@ -156,11 +206,11 @@ class UserRoundDetail(models.Model):
             else:
                 average_score = movie.average_rating  # call the property average_rating of the Movie object
                 self.movie_average_rating = average_score # assign it to this URD instance
-                self.save()     # save this instance
+                self.save()     # save this instance (only movie_average_rating is written, if it changed; see dirty_fields.py)
 
 
 
-class Movie(models.Model):
+class Movie(DirtyFieldsMixin, models.Model):
     name = models.CharField(max_length=150, verbose_name='Movie Title')
     year = models.PositiveIntegerField(null=True, verbose_name='Year Released')
 
@@ -193,31 +243,44 @@ class Movie(models.Model):
         max_length = 150,
         )
 
+    # stored rating aggregates; these are kept current by the UserMovieDetail signals in signals.py (every time a UMD is
+    # created, edited or deleted), so reading a movie's rating is a column read rather than an AVG() query. If they ever
+    # drift, run:  python3 manage.py rebuild_rating_aggregates
+    rating_sum = models.PositiveIntegerField(default=0)
+    rating_count = models.PositiveIntegerField(default=0)
+    rating_average = models.DecimalField(default=0.0, max_digits=2, decimal_places=1, db_index=True)
+
+    # star histogram: how many 1-star, 2-star (etc) ratings the movie received
+    star_1_count = models.PositiveIntegerField(default=0)
+    star_2_count = models.PositiveIntegerField(default=0)
+    star_3_count = models.PositiveIntegerField(default=0)
+    star_4_count = models.PositiveIntegerField(default=0)
+    star_5_count = models.PositiveIntegerField(default=0)
+
 
     @property
     def average_rating(self):
-        # aggregate returns a dict
-        average_dict = self.usermoviedetail_set.aggregate(avg_rating=Avg('star_rating'))  # note: quotes required on named field!!
         if self.game_round.round_completed == False:
             return float(0.0)    # we need to catch any movies in an incomplete round, because if they DO have scores submitted, they will
                         # be sorted.
-        elif average_dict['avg_rating']:
-            return round(average_dict['avg_rating'], 1) # round the average to one decimal place
         else:
-            return float(0.0)   # this is gaming things a bit; OverviewView sorts a queryset of movies and looks at average rating;
-                        # movies with no ratings submitted will return NoneType, which can't be rounded
+            return float(self.rating_average)   # 0.0 when no ratings were submitted
 
     @property
     def average_rating_incomplete(self):
-        # aggregate returns a dict
-        average_dict = self.usermoviedetail_set.aggregate(avg_rating=Avg('star_rating'))
-        if average_dict['avg_rating']:
-            return round(average_dict['avg_rating'], 1)
-        else:
-            return float(0.0)
+        return float(self.rating_average)
+
+    @property
+    def rating_histogram(self):
+        """dict of star value -> number of ratings with that value, e.g. {1: 0, 2: 3, 3: 1, 4: 0, 5: 2}"""
+        return {star: getattr(self, 'star_{}_count'.format(star)) for star in range(1, 6)}
 
     class Meta:
         ordering = ['date_watched']
+        indexes = [
+            # a round's movies, in the order they were watched
+            models.Index(fields=['game_round', 'date_watched'], name='movie_round_watched_idx'),
+        ]
 
 
     def __str__(self):
@@ -239,11 +302,43 @@ class Movie(models.Model):
 
 
     def save(self, *args, **kwargs):
-        value_for_slug = self.name
-        self.slug = slugify(value_for_slug, allow_unicode=True)
+        # the slug only needs working out again when the name changes (assign_user() saves every movie of a round
+        # just to set chosen_by); only changed fields are written, see dirty_fields.py
+        if self._state.adding or not self.slug or 'name' in self.get_dirty_fields():
+            value_for_slug = self.name
+            self.slug = slugify(value_for_slug, allow_unicode=True)
+            if kwargs.get('update_fields') is not None and 'name' in kwargs['update_fields']:
+                kwargs['update_fields'] = list(kwargs['update_fields']) + ['slug']
         super().save(*args, **kwargs)
 
 
+    def update_rating_aggregates(self):
+        """Recalculate the stored rating fields from this movie's UserMovieDetail records. One aggregate query plus
+        one narrow UPDATE; this deliberately doesn't call save(), so nothing else on the row gets rewritten."""
+        totals = UserMovieDetail.objects.filter(movie_id=self.pk).aggregate(
+            rating_sum=Sum('star_rating'),
+            rating_count=Count('id'),
+            star_1_count=Count('id', filter=Q(star_rating=1)),
+            star_2_count=Count('id', filter=Q(star_rating=2)),
+            star_3_count=Count('id', filter=Q(star_rating=3)),
+            star_4_count=Count('id', filter=Q(star_rating=4)),
+            star_5_count=Count('id', filter=Q(star_rating=5)),
+        )
+        # Sum returns None when there are no rows
+        values = {field: (value or 0) for field, value in totals.items()}
+
+        if values['rating_count']:
+            values['rating_average'] = Decimal(str(round(values['rating_sum'] / values['rating_count'], 1)))
+        else:
+            values['rating_average'] = Decimal('0.0')
+
+        Movie.objects.filter(pk=self.pk).update(**values)
+
+        # keep this instance in step with the row we just wrote
+        for field, value in values.items():
+            setattr(self, field, value)
+
+
     def assign_user(self):
         """When a Round is completed, this method will be called on each Movie object in the Round to 
         update the chosen_by field to the appropriate user. Movie objects in non-completed rounds all
@@ -278,8 +373,62 @@ class Movie(models.Model):
 
 
 
+# UserRoundDetail field -> the UserProfile field that holds its all-time total
+PROFILE_TOTAL_FIELDS = {
+    'correct_guess_points': 'total_correct_guess_points',
+    'known_movie_points': 'total_known_movie_points',
+    'unseen_movie_points': 'total_unseen_movie_points',
+    'liked_movie_points': 'total_liked_movie_points',
+    'disliked_movie_points': 'total_disliked_movie_points',
+}
+
+
+class UserProfileManager(models.Manager):
+    """Table-level methods for keeping every profile's all-time totals current (see the note below UserProfile)"""
+
+    def rebuild_all_totals(self):
+        """Recalculate every profile's point totals and rounds_won from scratch: one GROUP BY user aggregate over the
+        completed rounds' UserRoundDetail records, one query for the profiles, one bulk UPDATE. Safe to run any time."""
+        aggregates = {urd_field: Sum(urd_field) for urd_field in PROFILE_TOTAL_FIELDS}
+        aggregates['rounds_won'] = Count('id', filter=Q(winner_bool=True))
+
+        rows = UserRoundDetail.objects.filter(game_round__round_completed=True).values('user_id').annotate(**aggregates).order_by()
+        totals_by_user = {row['user_id']: row for row in rows}
+
+        profiles = list(self.all())
+        for profile in profiles:
+            # users with no completed rounds get everything reset to 0
+            totals = totals_by_user.get(profile.user_id, {})
+            for urd_field, profile_field in PROFILE_TOTAL_FIELDS.items():
+                setattr(profile, profile_field, totals.get(urd_field) or 0)
+            profile.rounds_won = totals.get('rounds_won') or 0
+
+        self.bulk_update(profiles, fields=list(PROFILE_TOTAL_FIELDS.values()) + ['rounds_won'])
+
+        return len(profiles)
+
+    def add_round_totals(self, game_round):
+        """Incremental version of rebuild_all_totals, used when a round is concluded: adds just that round's points to
+        its participants' totals (one read of the round's URDs, one bulk UPDATE using F() expressions). Only call this
+        once per round -- calling it again would count the round twice; use rebuild_all_totals to recover."""
+        urds = UserRoundDetail.objects.filter(game_round=game_round).values('user_id', 'winner_bool', *PROFILE_TOTAL_FIELDS)
+
+        profiles = []
+        for urd in urds:
+            # no need to load the profiles themselves, bulk_update only needs the primary key (which is the user id)
+            profile = self.model(user_id=urd['user_id'])
+            for urd_field, profile_field in PROFILE_TOTAL_FIELDS.items():
+                setattr(profile, profile_field, F(profile_field) + (urd[urd_field] or 0))
+            profile.rounds_won = F('rounds_won') + (1 if urd['winner_bool'] else 0)
+            profiles.append(profile)
+
+        self.bulk_update(profiles, fields=list(PROFILE_TOTAL_FIELDS.values()) + ['rounds_won'])
+
+        return len(profiles)
+
+
 # NOT an intermediary table;  connected via OneToOne to the default User model
-class UserProfile(models.Model):
+class UserProfile(DirtyFieldsMixin, models.Model):
     # you MUST review / learn what it means to set primary_key = True on this, and why you would want to...
     user = models.OneToOneField(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, primary_key=True)
 
@@ -302,6 +451,8 @@ class UserProfile(models.Model):
 
     rounds_won = models.PositiveSmallIntegerField(default=0, null=True, blank=True)
 
+    objects = UserProfileManager()
+
     def __str__(self):
         return 'Profile record for User {}'.format(self.user)
 
@@ -322,6 +473,9 @@ class UserProfile(models.Model):
 
         # there's no problem running this method multiple times, it won't screw up point totals, as it will simply re-calculate
         # the values and (re)assign them to the relevant field; doing it over and over would just be pointless, but not destructive.
+
+        # NOTE: to update every profile at once, use UserProfile.objects.rebuild_all_totals() instead of calling this in a
+        # loop; it does the same work for all users in a fixed number of queries.
     
         # get all UserRoundDetail objects for user of this user profile instance:
         user_urds = self.user.userrounddetail_set.filter(game_round__round_completed=True)
@@ -431,6 +585,12 @@ class UserMovieDetail(models.Model):
         constraints = [
             models.UniqueConstraint(fields=['user', 'movie'], name='unique_user_movie_pairs')
         ]
+        indexes = [
+            # who chose this movie (the chooser's own UMD)
+            models.Index(fields=['movie', 'is_user_movie'], name='umd_movie_user_movie_idx'),
+            # who guessed whom, per movie (scoring, party payload)
+            models.Index(fields=['movie', 'user_guess'], name='umd_movie_guess_idx'),
+        ]
 
     def __str__(self):
         text = "{}'s details for {}".format(self.user.username, self.movie.name)
@@ -458,6 +618,11 @@ class PointsEarned(models.Model):
     point_type = models.CharField(max_length=100, null=True, verbose_name='Type of Point Earned')
     point_string = models.CharField(max_length=300, verbose_name='How Point Was Earned')
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['user_round_ob', 'point_type'], name='points_urd_type_idx'),
+        ]
+
     def __str__(self):
         return self.point_string
 
@@ -477,3 +642,102 @@ class PartyGoers(models.Model):
     uid = models.PositiveSmallIntegerField()
     last_ping = models.DateTimeField()
 
+
+
+class PartyPayload(models.Model):
+    """
+    in which we keep the Results Party data for a round (films, users, guesses, points), built once when the round is
+    concluded (see party_payload.py) instead of on every load of the party page. version goes up every time it's rebuilt.
+    """
+    game_round = models.OneToOneField(GameRound, on_delete=models.CASCADE, related_name='party_payload')
+    version = models.PositiveIntegerField(default=1)
+    document = models.JSONField()
+    built_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return 'Party payload for {} (v{})'.format(self.game_round, self.version)
+
+
+class RoundProgressManager(models.Manager):
+
+    def rebuild(self, game_round_id):
+        """work out a round's progress from scratch, from its UMDs (one query), and store it"""
+        submitters = {}
+        for movie_id, user_id in UserMovieDetail.objects.filter(movie__game_round_id=game_round_id).values_list('movie_id', 'user_id'):
+            submitters.setdefault(movie_id, set()).add(user_id)
+
+        progress, created = self.update_or_create(game_round_id=game_round_id, defaults={
+            'submitted': {str(movie_id): sorted(user_ids) for movie_id, user_ids in submitters.items()},
+            'details_received': sum(len(user_ids) for user_ids in submitters.values()),
+        })
+        return progress
+
+    def for_round(self, game_round_id):
+        """a round's progress, built first if the round has none yet (e.g. it was started before these were kept)"""
+        progress = self.filter(game_round_id=game_round_id).first()
+        if progress is None:
+            progress = self.rebuild(game_round_id)
+        return progress
+
+    def set_submitted(self, game_round_id, movie_id, user_id, submitted=True):
+        """record that a UMD for movie_id / user_id was added (or removed, with submitted=False)"""
+        with transaction.atomic():
+            # lock the row: two members submitting at the same moment would otherwise overwrite each other's id
+            progress = self.select_for_update().filter(game_round_id=game_round_id).first()
+            if progress is None:
+                return self.rebuild(game_round_id)
+
+            if progress.set_submitted(movie_id, user_id, submitted):
+                progress.save(update_fields=['submitted', 'details_received'])
+            return progress
+
+
+class RoundProgress(models.Model):
+    """
+    in which we keep track of which participants have submitted their details for which movies in a round, so the
+    Results page can show a round's progress from this one row instead of checking every movie x participant pair.
+
+    submitted maps each movie id (as a string; it's JSON) to the sorted list of ids of the users who have submitted
+    details for it. (It used to be a bitmap with one bit per user id, which meant a round's row grew with the highest
+    user id on the site rather than with the round's size.) details_received is the number of ids in all of them. Both
+    are kept up to date by the UMD signal handlers in signals.py.
+    """
+    game_round = models.OneToOneField(GameRound, on_delete=models.CASCADE, related_name='progress')
+    submitted = models.JSONField(default=dict)
+    details_received = models.PositiveIntegerField(default=0)
+
+    objects = RoundProgressManager()
+
+    def __str__(self):
+        return 'Progress for {} ({} details received)'.format(self.game_round, self.details_received)
+
+    def movie_submitters(self, movie_id):
+        """the set of ids of the users who have submitted details for movie_id"""
+        return set(self.submitted.get(str(movie_id), ()))
+
+    def has_submitted(self, movie_id, user_id):
+        return user_id in self.movie_submitters(movie_id)
+
+    def set_submitted(self, movie_id, user_id, submitted=True):
+        """add / remove one user id for a movie; returns True if anything changed (the instance still needs saving)"""
+        user_ids = self.movie_submitters(movie_id)
+        if (user_id in user_ids) == submitted:
+            return False
+
+        if submitted:
+            user_ids.add(user_id)
+            self.details_received += 1
+        else:
+            user_ids.discard(user_id)
+            self.details_received -= 1
+
+        if user_ids:
+            self.submitted[str(movie_id)] = sorted(user_ids)
+        else:
+            self.submitted.pop(str(movie_id), None)
+        return True
+
+    def details_needed(self, movie_ids, user_ids):
+        """how many of the given movie x user pairs are still missing details"""
+        participants = set(user_ids)
+        return sum(len(participants - self.movie_submitters(movie_id)) for movie_id in movie_ids)
@@ -0,0 +1,104 @@
+"""
+The Overview page's movie list: every movie ever watched, in one of several orders, a page at a time.
+
+The page used to render the whole archive in one go, and every row cost a few queries of its own (the movie's round for
+its URL, the chooser, the chooser's profile), so it got slower with every round played. Now:
+
+ - each sort mode is one queryset, with the round, chooser and chooser's profile joined in by select_related(), and the
+   sort columns annotated onto it (never NULL, so they can be compared)
+ - it's shown OVERVIEW_PAGE_SIZE movies at a time, with keyset pagination: the link to the next page carries the id of
+   the last movie shown (?after=<id>), and the next page is 'the movies that sort after that one', which the database
+   answers from the ordering / indexes without counting past the earlier pages the way OFFSET does
+
+so a page costs the same few queries whether the archive holds fifty movies or five thousand.
+"""
+from datetime import date
+
+from django.conf import settings
+from django.db.models import F, Q, Case, When, Value, DecimalField, CharField, DateField
+from django.db.models.functions import Coalesce
+
+from .models import Movie
+
+
+OVERVIEW_PAGE_SIZE = getattr(settings, 'OVERVIEW_PAGE_SIZE', 50)
+
+
+def _base_queryset():
+    return Movie.objects.select_related('game_round', 'chosen_by', 'chosen_by__userprofile')
+
+
+def _by_round():
+    return _base_queryset().annotate(sort_round=F('game_round__round_number')), ('sort_round', 'id')
+
+
+def _by_movie():
+    return _base_queryset().annotate(sort_name=F('name')), ('sort_name', 'id')
+
+
+def _by_user():
+    # movies nobody has claimed yet have no chooser; they sort as an empty name, i.e. last, as they always have
+    queryset = _base_queryset().annotate(
+        sort_user=Coalesce(F('chosen_by__username'), Value(''), output_field=CharField()),
+        sort_rating=F('rating_average'),
+    )
+    return queryset, ('-sort_user', '-sort_rating', 'id')
+
+
+def _by_rating():
+    # movies in a round that's still in progress sort as 0.0, same as the average_rating property reports them
+    queryset = _base_queryset().annotate(
+        sort_rating=Case(
+            When(game_round__round_completed=True, then=F('rating_average')),
+            default=Value(0),
+            output_field=DecimalField(max_digits=2, decimal_places=1),
+        ),
+        sort_watched=Coalesce(F('date_watched'), Value(date.min), output_field=DateField()),
+    )
+    return queryset, ('-sort_rating', 'sort_watched', 'id')
+
+
+# sort_by (from the URL) -> function returning (queryset, ordering). Every ordering ends with id, so no two movies tie
+SORT_MODES = {
+    'round': _by_round,
+    'movie': _by_movie,     # not actually used in the sort drop-down
+    'user': _by_user,
+    'rating': _by_rating,
+}
+
+
+def _after(ordering, values):
+    """
+    Q for 'sorts after the row with these values' under ordering, e.g. for ('-sort_rating', 'id'):
+    sort_rating < r OR (sort_rating = r AND id > i)
+    """
+    condition = Q()
+    equal_so_far = Q()
+    for key in ordering:
+        field = key.lstrip('-')
+        lookup = '{}__{}'.format(field, 'lt' if key.startswith('-') else 'gt')
+        condition |= equal_so_far & Q(**{lookup: values[field]})
+        equal_so_far &= Q(**{field: values[field]})
+    return condition
+
+
+def overview_page(sort_by, after=None, page_size=None):
+    """
+    One page of the overview: (list of movies, id of the movie to continue after, or None if this is the last page).
+    after is the id of the last movie on the previous page. Raises KeyError for an unknown sort_by.
+    """
+    page_size = page_size or OVERVIEW_PAGE_SIZE
+    queryset, ordering = SORT_MODES[sort_by]()
+    fields = [key.lstrip('-') for key in ordering]
+
+    if after is not None:
+        # (if that movie has been deleted since, this just starts again from the top)
+        last_shown = queryset.filter(pk=after).values(*fields).first()
+        if last_shown is not None:
+            queryset = queryset.filter(_after(ordering, last_shown))
+
+    # one more than a page, to know whether there's a next one
+    movies = list(queryset.order_by(*ordering)[:page_size + 1])
+    if len(movies) > page_size:
+        return movies[:page_size], movies[page_size - 1].id
+    return movies, None
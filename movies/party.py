@@ -0,0 +1,101 @@
+"""
+Results Party state, shared by the polling endpoint (resultspartystate.json) and the server-push event stream
+(resultspartyevents/, see party_async.py).
+
+The party index lives in the PartyState table, but reading it there on every poll / stream tick is what made the reveal
+expensive. Instead the current state is kept in the cache: publish_party_state() is called whenever the index changes
+(ResultsPartyStateIncrement, or a round being concluded) with a new version stamp; streams only send an event when the
+version they last sent is out of date.
+
+The cached state also expires after PARTY_STATE_CACHE_SECONDS, so with the default per-process (LocMem) cache a stream
+served by another worker process still picks up a change within that many seconds. Point CACHES at a shared cache
+(memcached, redis, database) and every stream sees the change as soon as it's published.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+from .models import PartyState
+from .presence import record_ping, party_goers
+from .round_state import get_round_state
+
+
+PARTY_STATE_CACHE_KEY = 'party:state'
+
+# how long a cached copy of the party state is trusted before it's re-read from the database
+PARTY_STATE_CACHE_SECONDS = getattr(settings, 'PARTY_STATE_CACHE_SECONDS', 1)
+
+# how often an open event stream checks for a new state, and how often it re-sends the current state (which also
+# carries the list of party-goers) even when nothing has changed
+PARTY_STREAM_TICK_SECONDS = getattr(settings, 'PARTY_STREAM_TICK_SECONDS', 0.25)
+PARTY_STREAM_REFRESH_SECONDS = getattr(settings, 'PARTY_STREAM_REFRESH_SECONDS', 2)
+
+# streams are closed after this long; the browser's EventSource reconnects on its own (after 'retry' milliseconds)
+PARTY_STREAM_MAX_SECONDS = getattr(settings, 'PARTY_STREAM_MAX_SECONDS', 60)
+PARTY_STREAM_RETRY_MILLISECONDS = 2000
+
+
+def _load_party_state():
+    record = PartyState.objects.last()
+    if record is None:
+        return {'idx': 0, 'next_time': None, 'version': '0'}
+    # the row's next_time doubles as a version stamp: it changes every time the index is set
+    return {'idx': record.idx, 'next_time': record.next_time, 'version': record.next_time.isoformat()}
+
+
+def peek_party_state():
+    """the cached party state, or None if it isn't cached; never touches the database"""
+    return cache.get(PARTY_STATE_CACHE_KEY)
+
+
+def get_party_state():
+    """the current party index and the time the clients should move to it, as a dict: idx, next_time, version"""
+    state = cache.get(PARTY_STATE_CACHE_KEY)
+    if state is None:
+        state = _load_party_state()
+        cache.set(PARTY_STATE_CACHE_KEY, state, PARTY_STATE_CACHE_SECONDS)
+    return state
+
+
+def publish_party_state(record):
+    """call after saving a PartyState record, so the new index is pushed to every connected client"""
+    state = {'idx': int(record.idx), 'next_time': record.next_time, 'version': record.next_time.isoformat()}
+    cache.set(PARTY_STATE_CACHE_KEY, state, PARTY_STATE_CACHE_SECONDS)
+    return state
+
+
+def set_party_index(idx, next_time):
+    """store the new party index (the one database write of a party) and push it out to everyone; returns the state"""
+    record = PartyState.objects.last() or PartyState()
+    record.idx = idx
+    record.next_time = next_time
+    record.save()
+    return publish_party_state(record)
+
+
+def build_party_state(user_id, state=None):
+    """
+    the data the party page works from: current index, server time, when to move to the index, and who's here. This is
+    only the part that changes during a party; the round's films, guesses and points are in its party payload (see
+    party_payload.py), whose version is included so a page holding an out-of-date copy knows to reload. Also the
+    state's version, which a polling page sends back to long-poll (see party_async.py).
+
+    state is the party state to describe, if the caller already has it (from get_party_state()).
+    """
+    record_ping(user_id)
+
+    # Get each user's party state (from memory, see presence.py)
+    users = party_goers()
+
+    # Get the overall party state
+    server_time = timezone.now()
+
+    if state is None:
+        state = get_party_state()
+    idx = state['idx']
+    next_time = state['next_time']
+    if next_time is None or next_time < server_time:
+        next_time = server_time # if we aren't ready to advance, leave as current time
+
+    return { "idx": idx, "server_time": server_time, "next_time": next_time, "users": users,
+             "payload_version": get_round_state().party_payload_version, "version": state['version'] }
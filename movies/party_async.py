@@ -0,0 +1,126 @@
+"""
+Async versions of the Results Party endpoints' work: party state, presence pings and the admin's index changes.
+
+The party endpoints used to be plain sync views, so under ASGI each request was handed to a thread, and under WSGI each
+one held a worker for as long as it ran. The views are coroutines now, and so is the one part of their work that takes
+any time: waiting for the party state to change. The work itself is party.py's and presence.py's, called through
+sync_to_async -- there's one copy of it, used by the sync and async code alike.
+
+The state endpoint can also long-poll: a client that sends the version it already has (?version=...) gets no answer
+until the state changes or PARTY_LONG_POLL_SECONDS pass. The wait is an asyncio.sleep() between looks at the cached
+state, so under ASGI it costs nothing but an open socket; under WSGI it holds a worker the whole time, so long-polling
+is only for clients that ask for it.
+
+The event stream (aparty_event_stream()) is the same wait, kept up for PARTY_STREAM_MAX_SECONDS. It's an async
+generator, so an open stream holds no thread under ASGI, and each event goes out as soon as it's yielded.
+"""
+import asyncio
+import json
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+
+from .models import UserProfile
+from .party import (PARTY_STREAM_TICK_SECONDS, PARTY_STREAM_REFRESH_SECONDS, PARTY_STREAM_MAX_SECONDS,
+                    PARTY_STREAM_RETRY_MILLISECONDS, build_party_state, get_party_state, peek_party_state, set_party_index)
+from .presence import record_ping, party_goers
+
+
+# the longest a long-polling state request is kept waiting for a change. A waiting client doesn't ping, so keep this
+# (plus the page's 2 seconds between polls) under the party page's activity threshold, 5 seconds, or it shows as gone
+PARTY_LONG_POLL_SECONDS = getattr(settings, 'PARTY_LONG_POLL_SECONDS', 2)
+
+
+async def aget_party_state():
+    """async get_party_state() (see party.py)"""
+    # the cache alone first, on any thread: a long-poll looks every tick, and the state is nearly always there
+    state = await sync_to_async(peek_party_state, thread_sensitive=False)()
+    if state is None:
+        # rebuilt from the PartyState table, and cached again
+        state = await sync_to_async(get_party_state, thread_sensitive=True)()
+    return state
+
+
+async def await_party_state_change(since, timeout):
+    """the party state, once its version is no longer since (or timeout seconds have passed)"""
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    state = await aget_party_state()
+    while state['version'] == since and loop.time() < deadline:
+        await asyncio.sleep(PARTY_STREAM_TICK_SECONDS)
+        state = await aget_party_state()
+    return state
+
+
+async def arecord_ping(user_id):
+    """async record_ping() (see presence.py)"""
+    await sync_to_async(record_ping, thread_sensitive=True)(user_id)
+
+
+async def aparty_goers():
+    """async party_goers() (see presence.py)"""
+    return await sync_to_async(party_goers, thread_sensitive=True)()
+
+
+async def abuild_party_state(user_id, since=None, state=None):
+    """
+    async build_party_state() (see party.py). If since is the version the client already has, waits for it to change
+    first (for up to PARTY_LONG_POLL_SECONDS).
+    """
+    if since is not None:
+        state = await await_party_state_change(since, PARTY_LONG_POLL_SECONDS)
+    return await sync_to_async(build_party_state, thread_sensitive=True)(user_id, state)
+
+
+async def aset_party_index(idx, next_time):
+    """async set_party_index() (see party.py)"""
+    return await sync_to_async(set_party_index, thread_sensitive=True)(idx, next_time)
+
+
+async def aparty_event_stream(user_id, last_version=None):
+    """
+    async generator of Server-Sent Events for one connected client. An event is sent as soon as the party state's
+    version changes, and at least every PARTY_STREAM_REFRESH_SECONDS otherwise. Each event's data is the same JSON
+    document the polling endpoint returns, so the page handles both the same way.
+    """
+    yield 'retry: {}\n\n'.format(PARTY_STREAM_RETRY_MILLISECONDS)
+
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+    last_sent = None
+
+    while loop.time() - started < PARTY_STREAM_MAX_SECONDS:
+        state = await aget_party_state()
+        now = loop.time()
+
+        if state['version'] != last_version or last_sent is None or now - last_sent >= PARTY_STREAM_REFRESH_SECONDS:
+            last_version = state['version']
+            last_sent = now
+            data = json.dumps(await abuild_party_state(user_id, state=state), cls=DjangoJSONEncoder)
+            yield 'id: {}\ndata: {}\n\n'.format(last_version, data)
+
+        await asyncio.sleep(PARTY_STREAM_TICK_SECONDS)
+
+
+def _load_user(request):
+    # request.user is loaded lazily, from the session and then the user table
+    user = request.user
+    if not user.is_authenticated:
+        return None, False
+    return user.id, UserProfile.objects.filter(user_id=user.id).values_list('is_mmg_admin', flat=True).first() or False
+
+
+def _load_user_id(request):
+    user = request.user
+    return user.id if user.is_authenticated else None
+
+
+async def arequest_user_id(request):
+    """the logged in user's id, or None"""
+    return await sync_to_async(_load_user_id, thread_sensitive=True)(request)
+
+
+async def arequest_user_and_admin(request):
+    """(the logged in user's id or None, whether they're an MMG admin)"""
+    return await sync_to_async(_load_user, thread_sensitive=True)(request)
@@ -0,0 +1,159 @@
+"""
+Precomputed Results Party data.
+
+Everything the party page shows about a round -- its users, films, every guess / rating / comment, and each user's
+points by type -- only changes when the round is concluded. ResultsPartyView used to rebuild all of it on every page
+load, with a PointsEarned query per participant, a UserMovieDetail query per film and a filesystem check per film.
+(Where each film's poster lives isn't stored in the document; the page looks that up in the media manifest.)
+
+build_party_payload() now does that work once, in four queries, when the round is concluded, and stores the result as a
+versioned JSON document in PartyPayload. The version goes up every time the document is rebuilt (e.g. the round is
+concluded a second time). The document also records the round's data_version (see GameRound) it was built from, and
+get_party_payload() rebuilds it once that's out of date, e.g. after an admin corrects one of the round's details.
+
+How it's served:
+ - the party page renders from the stored document (late joiners get everything in the page they load)
+ - resultsparty/<round>/payload.json returns the raw document, with an ETag so clients can revalidate cheaply
+ - the state endpoint / event stream (party.py) only carry the party index, times and party-goers, plus the version
+   of the active round's document; a page holding an older version reloads to pick up the new one
+"""
+from datetime import date
+
+from .models import GameRound, UserRoundDetail, PointsEarned, Movie, UserMovieDetail, PartyPayload
+
+
+# bump this when the document's shape or contents change; stored documents of an older schema are rebuilt when next read
+# (2: films in watch order, as the party always revealed them)
+PARTY_PAYLOAD_SCHEMA = 2
+
+
+def _star_width(rating, scale, offset):
+    return offset + (scale * (rating / 5.0))
+
+
+def build_party_payload(game_round):
+    """Work out the Results Party document for game_round, as a dict (not saved; see refresh_party_payload)"""
+    users = []
+    users_index = {}
+    user_ratings = {}
+    points_by_movie = {}
+    guesses_by_movie = {}
+    winner_name = None
+
+    round_users = list(UserRoundDetail.objects.filter(game_round=game_round).select_related('user').order_by('pk'))
+    for round_user in round_users:
+        if round_user.user_id == game_round.winner_id:
+            winner_name = round_user.user.username
+
+        users.append({'user_id': round_user.user_id, 'username': round_user.user.username})
+        user_ratings[round_user.user_id] = float(round_user.movie_average_rating or 0)
+        users_index[round_user.user_id] = round_user.user.username
+        points_by_movie[round_user.user_id] = {"liked": 0, "loathed": 0, "guesses": 0, "known": 0, "unseen": 0, "total": 0}
+        guesses_by_movie[round_user.user_id] = []
+
+    # every point for the round in one go (guess points are worked out on the page from guesses_by_movie instead)
+    user_by_urd = {round_user.id: round_user.user_id for round_user in round_users}
+    for user_point in PointsEarned.objects.filter(user_round_ob__game_round=game_round).exclude(point_type='guess'):
+        user_points = points_by_movie[user_by_urd[user_point.user_round_ob_id]]
+        point_type = 'loathed' if user_point.point_type == 'disliked' else user_point.point_type
+        user_points[point_type] += user_point.point_int
+        user_points['total'] += user_point.point_int
+
+    round_films = list(Movie.objects.filter(game_round=game_round).order_by('date_watched', 'pk'))
+
+    umds_by_movie = {round_film.id: [] for round_film in round_films}
+    for umd in UserMovieDetail.objects.filter(movie__game_round=game_round).order_by('movie_id', 'user_id'):
+        umds_by_movie[umd.movie_id].append(umd)
+
+    films = []
+    all_guesses = {}
+    winner_film_id = None
+    for idx, round_film in enumerate(round_films, 1):
+        star_rating = user_ratings[round_film.chosen_by_id]
+        film_data = {'idx': idx, 'id': round_film.id, 'name': round_film.name, 'year': round_film.year,
+            'chosen_by_id': round_film.chosen_by_id, 'chosen_by_name': users_index[round_film.chosen_by_id],
+            'star_rating': star_rating, 'stars_width': int(_star_width(star_rating, 120, 16))}
+        films.append(film_data)
+
+        if round_film.chosen_by_id == game_round.winner_id:
+            winner_film_id = round_film.id
+
+        # guesses; guesses_by_movie is the index of correct guesses by movie (actually indexed by the user who picked the movie)
+        guesses_by_movie[round_film.chosen_by_id] = []
+        all_guesses[round_film.id] = []
+        for guess in umds_by_movie[round_film.id]:
+            guess_data = {"user_id": guess.user_id, "username": users_index[guess.user_id],
+                "star_rating": guess.star_rating, "star_width": _star_width(guess.star_rating, 60, 8),
+                "seen_previously": 1 if guess.seen_previously else 0, "heard_of": 1 if guess.heard_of else 0,
+                "comments": guess.comments}
+            if guess.user_guess_id:
+                was_right = guess.user_guess_id == round_film.chosen_by_id
+                guess_data.update({"user_guess_id": guess.user_guess_id, "guessed_username": users_index[guess.user_guess_id],
+                    "was_right": 1 if was_right else 0})
+                if was_right:
+                    guesses_by_movie[round_film.chosen_by_id].append(guess.user_id)
+            else:
+                guess_data.update({"user_guess_id": 0, "guessed_username": "-"})
+            all_guesses[round_film.id].append(guess_data)
+
+    return {
+        'schema': PARTY_PAYLOAD_SCHEMA,
+        'round_id': game_round.id,
+        'round_number': game_round.round_number,
+        'round_start': game_round.date_started.isoformat() if game_round.date_started else None,
+        'round_end': game_round.date_finished.isoformat() if game_round.date_finished else None,
+        'winner_id': game_round.winner_id,
+        'winner_name': winner_name,
+        'winner_film_id': winner_film_id,
+        'users': users,
+        'users_index': users_index,
+        'films': films,
+        'all_guesses': all_guesses,
+        'points_by_movie': points_by_movie,
+        'guesses_by_movie': guesses_by_movie,
+    }
+
+
+def refresh_party_payload(game_round):
+    """(Re)build and store game_round's party document; call once the round's results have been committed"""
+    # read before building: if the round changes while this runs, the document is marked as older than the change
+    data_version = GameRound.objects.filter(pk=game_round.pk).values_list('data_version', flat=True).first()
+    document = build_party_payload(game_round)
+    document['data_version'] = data_version
+
+    payload = PartyPayload.objects.filter(game_round=game_round).first()
+    if payload is None:
+        payload = PartyPayload(game_round=game_round, version=1)
+    else:
+        payload.version += 1
+
+    document['version'] = payload.version
+    payload.document = document
+    payload.save()
+
+    return payload
+
+
+def get_party_payload(game_round):
+    """game_round's stored party document, building it first if the round was concluded before these were kept, before
+    the current PARTY_PAYLOAD_SCHEMA, or before the round's data last changed"""
+    payload = PartyPayload.objects.filter(game_round=game_round).first()
+    if (payload is None or payload.document.get('schema') != PARTY_PAYLOAD_SCHEMA
+            or payload.document.get('data_version') != game_round.data_version):
+        payload = refresh_party_payload(game_round)
+    return payload
+
+
+def party_payload_etag(game_round_id, version, data_version):
+    # (the schema too, so a copy of an older schema's document is never answered with a 304; and the round's
+    # data_version, so a stored document that's due to be rebuilt isn't either)
+    return '"party-{}-{}-{}-{}"'.format(PARTY_PAYLOAD_SCHEMA, game_round_id, version, data_version)
+
+
+def int_keys(data):
+    """JSON turns the documents' int dict keys into strings; turn them back, for templates comparing them to ids"""
+    return {int(key): value for key, value in data.items()}
+
+
+def parse_date(value):
+    return date.fromisoformat(value) if value else None
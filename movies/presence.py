@@ -0,0 +1,90 @@
+"""
+Results Party presence: who currently has the party page open.
+
+Every poll / stream tick from a party page counts as a ping. Pings used to be an UPDATE (or INSERT) on PartyGoers, one per
+client every two seconds, and "who is here" was a full scan of PartyGoers that never forgot anybody. Now a ping only
+writes that user's last-ping time to the cache, under its own key with a TTL, so people who leave simply drop out once
+PARTY_PRESENCE_TTL_SECONDS have passed. Nothing touches the database on a ping.
+
+PartyGoers is still written, but in batches: at most once every PARTY_PRESENCE_FLUSH_SECONDS, all current pings are
+saved in one go. Set PARTY_PRESENCE_FLUSH_SECONDS = None to never write them at all.
+
+A ping is that one cache.set() and nothing else: there's no shared list of who has pinged to read, update and write
+back, which would lose one of two pings arriving together. "Who is here" reads every member's key in one get_many()
+instead (a club has tens of members, not thousands); the list of member ids is cached for PARTY_PRESENCE_MEMBERS_SECONDS.
+
+Presence is only shared between worker processes if CACHES points at a shared cache, as production.py's memcached does; with a
+per-process LocMem cache each process only knows about the clients it has served.
+"""
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.utils import timezone
+
+from .models import PartyGoers
+
+
+PRESENCE_KEY = 'party:presence:{}'
+PRESENCE_MEMBERS_KEY = 'party:presence:members'
+PRESENCE_FLUSH_LOCK_KEY = 'party:presence:flushed'
+
+# how long after their last ping someone still counts as being at the party
+PARTY_PRESENCE_TTL_SECONDS = getattr(settings, 'PARTY_PRESENCE_TTL_SECONDS', 60)
+
+# how long the list of member ids is kept; someone who signed up since then doesn't show as here until it's re-read
+PARTY_PRESENCE_MEMBERS_SECONDS = getattr(settings, 'PARTY_PRESENCE_MEMBERS_SECONDS', 60)
+
+# how often pings are written through to PartyGoers (None: never)
+PARTY_PRESENCE_FLUSH_SECONDS = getattr(settings, 'PARTY_PRESENCE_FLUSH_SECONDS', 30)
+
+
+def record_ping(user_id):
+    """note that user_id is still on the party page"""
+    cache.set(PRESENCE_KEY.format(user_id), timezone.now(), PARTY_PRESENCE_TTL_SECONDS)
+
+    # whoever pings first after the flush interval has passed does the flush for everyone
+    if PARTY_PRESENCE_FLUSH_SECONDS is not None and cache.add(PRESENCE_FLUSH_LOCK_KEY, True, PARTY_PRESENCE_FLUSH_SECONDS):
+        flush_presence()
+
+
+def _member_ids():
+    member_ids = cache.get(PRESENCE_MEMBERS_KEY)
+    if member_ids is None:
+        member_ids = list(get_user_model().objects.filter(is_active=True).order_by('id').values_list('id', flat=True))
+        cache.set(PRESENCE_MEMBERS_KEY, member_ids, PARTY_PRESENCE_MEMBERS_SECONDS)
+    return member_ids
+
+
+def invalidate_presence_members():
+    cache.delete(PRESENCE_MEMBERS_KEY)
+
+
+def current_pings():
+    """dict of user id -> last ping time, for everyone whose last ping hasn't expired"""
+    keys = {PRESENCE_KEY.format(user_id): user_id for user_id in _member_ids()}
+    pings = cache.get_many(list(keys))
+
+    return {keys[key]: last_ping for key, last_ping in pings.items()}
+
+
+def party_goers():
+    """the list of party-goers, in the shape the party page expects: [{'uid': .., 'last_ping': ..}, ...]"""
+    return [{"uid": user_id, "last_ping": last_ping} for user_id, last_ping in sorted(current_pings().items())]
+
+
+def flush_presence():
+    """write the current pings to PartyGoers: one read, then one bulk update and (for new faces) one bulk insert"""
+    pings = current_pings()
+    if not pings:
+        return 0
+
+    existing = list(PartyGoers.objects.filter(uid__in=pings.keys()))
+    for record in existing:
+        record.last_ping = pings[record.uid]
+    PartyGoers.objects.bulk_update(existing, fields=['last_ping'])
+
+    seen = {record.uid for record in existing}
+    PartyGoers.objects.bulk_create([PartyGoers(uid=user_id, last_ping=last_ping)
+                                    for user_id, last_ping in pings.items() if user_id not in seen])
+
+    return len(pings)
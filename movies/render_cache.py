@@ -0,0 +1,31 @@
+"""
+Render caching for completed rounds.
+
+A completed round's pages -- Old Round results and Old Movie details -- show the same thing
+every time, but every view used to work it all out again: average ratings, who chose each movie, the guess / rating /
+comment loops over every UserMovieDetail. Now their templates keep the rendered HTML in {% cache %} fragments, keyed on
+the round's id and data_version (see GameRound), which goes up on any change to the round, its movies or its details
+(e.g. an admin edit). A changed round gets new keys, so nothing is ever served stale and nothing needs deleting.
+
+The views only hand the templates lazy objects (see lazy_context): the queries behind a fragment run only when the
+fragment is actually rendered, so a cache hit costs no queries beyond loading the round itself. Parts that differ per
+member ("Your Details") are small fragments of their own, keyed on the member too.
+
+Only completed rounds are cached; round_cache_seconds() gives a timeout of 0 (i.e. don't keep it) for anything else.
+The timeout is just a safety net for what data_version doesn't track, such as a member changing their username.
+"""
+from django.conf import settings
+from django.utils.functional import SimpleLazyObject
+
+
+COMPLETED_ROUND_CACHE_SECONDS = getattr(settings, 'COMPLETED_ROUND_CACHE_SECONDS', 24 * 60 * 60)
+
+
+def round_cache_seconds(game_round):
+    """the {% cache %} timeout for game_round's fragments: 0 (don't keep them) unless the round is completed"""
+    return COMPLETED_ROUND_CACHE_SECONDS if game_round.round_completed else 0
+
+
+def lazy_context(build):
+    """build() is only called (once) when the template first looks inside the result, i.e. on a fragment cache miss"""
+    return SimpleLazyObject(build)
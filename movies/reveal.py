@@ -0,0 +1,81 @@
+"""
+A movie's reveal: who chose it, its average rating, everyone's ratings, guesses and comments. The Movie page shows it
+once the round is completed, and the Old Movie page always does.
+
+Both views used to work it out with their own copy of the same loop: a query for the chooser, then one for the movie's
+UserMovieDetails, then two more for each of them (its user's name, and the user it guessed), with the guesses re-sorted
+after every one. build_reveal() gets the details, their users and guessed users in one query, makes one pass over
+them and sorts the guesses once at the end.
+
+A completed round's reveals don't change unless the round's data does, so get_reveal() caches them under the movie id
+and the round's data_version (see GameRound), like the scoring drafts and rendered fragments (see render_cache.py).
+"""
+from django.conf import settings
+from django.core.cache import cache
+
+from .models import UserMovieDetail
+
+
+REVEAL_CACHE_SECONDS = getattr(settings, 'REVEAL_CACHE_SECONDS', 24 * 60 * 60)
+
+# what the templates get for a movie whose round isn't completed yet
+NO_REVEAL = {
+    'user_that_chose_movie': None,
+    'movie_avg_rating': None,
+    'movie_ratings': None,
+    'movie_comments': None,
+    'guess_dicts': None,
+    'non_guess_dicts': None,
+}
+
+
+def build_reveal(movie):
+    """the reveal of movie (whose round is completed) as a dict of template variables"""
+    umds = list(UserMovieDetail.objects.filter(movie=movie).select_related('user', 'user_guess'))
+    user_that_chose_movie = next((umd.user for umd in umds if umd.is_user_movie), None)
+
+    ratings_for_movie = []
+    comments_for_movie = []
+    guess_dicts = []
+    non_guess_dicts = []
+
+    for umd in umds:
+        username = umd.user.username
+        ratings_for_movie.append({'username': username, 'rating': umd.star_rating})
+
+        if umd.is_user_movie:
+            pass
+        elif umd.user_guess is None:
+            non_guess_dicts.append({'username': username, 'guess': 'n/a', 'result': 'n/a'})
+        else:
+            result = 'Nailed It!' if umd.user_guess == user_that_chose_movie else 'Nope!'
+            guess_dicts.append({'username': username, 'guess': umd.user_guess, 'result': result})
+
+        if umd.comments:
+            comments_for_movie.append({'username': username, 'comment': umd.comments})
+
+    # correct guesses first (a plain string sort: Nailed It! comes before Nope!); sorted() keeps the order within each
+    guess_dicts.sort(key=lambda guess: guess['result'])
+
+    return {
+        'user_that_chose_movie': user_that_chose_movie,
+        'movie_avg_rating': movie.average_rating,
+        'movie_ratings': ratings_for_movie,
+        'movie_comments': comments_for_movie,
+        'guess_dicts': guess_dicts,
+        'non_guess_dicts': non_guess_dicts,
+    }
+
+
+def get_reveal(movie):
+    """movie's reveal, from the cache if it's been built since its round last changed; NO_REVEAL until it's completed"""
+    game_round = movie.game_round
+    if not game_round.round_completed:
+        return NO_REVEAL
+
+    key = 'reveal:{}:{}'.format(movie.pk, game_round.data_version)
+    reveal = cache.get(key)
+    if reveal is None:
+        reveal = build_reveal(movie)
+        cache.set(key, reveal, REVEAL_CACHE_SECONDS)
+    return reveal
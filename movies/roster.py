@@ -0,0 +1,60 @@
+"""
+Cached round rosters: who is taking part in a round (user id and username).
+
+The user_guess drop-down of every UserMovieDetailForm was a query joining User to the round's UserRoundDetails, run
+whenever a form was shown (every Movie page view), and the Results page and the Current Round page each loaded the
+round's participants again on top of that. Membership only changes when someone is added to or removed from a round,
+so now get_roster() keeps each round's list in the cache, and those draw from it.
+
+The signal handlers in signals.py throw a round's roster away whenever its participants change (the M2M field, or
+saving / deleting a UserRoundDetail directly) or a member changes their username; the next get_roster() rebuilds it.
+That only reaches other worker processes through a shared cache (see CACHES in production.py); without one, another
+process's roster can be up to ROSTER_CACHE_SECONDS out of date.
+
+So the roster is for display only. Anything that decides something -- scoring, checking a submitted guess -- asks the
+database for the round's participants.
+"""
+from dataclasses import dataclass
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.urls import reverse
+
+
+ROSTER_CACHE_KEY = 'round:roster:{}'
+ROSTER_CACHE_SECONDS = getattr(settings, 'ROSTER_CACHE_SECONDS', 60)
+
+
+@dataclass(frozen=True)
+class RosterMember:
+    id: int
+    username: str
+
+    def __str__(self):
+        return self.username
+
+    def get_absolute_url(self):
+        """the member's profile page (UserProfile's primary key is the user id)"""
+        return reverse('movies:user_profile', kwargs={'pk': str(self.id)})
+
+
+def _build_roster(game_round_id):
+    members = User.objects.filter(related_game_rounds=game_round_id).order_by('id').values_list('id', 'username')
+    return [RosterMember(user_id, username) for user_id, username in members]
+
+
+def get_roster(game_round_id):
+    """the round's participants as a list of RosterMembers, in user id order; [] if there's no such round"""
+    if game_round_id is None:
+        return []
+    key = ROSTER_CACHE_KEY.format(game_round_id)
+    roster = cache.get(key)
+    if roster is None:
+        roster = _build_roster(game_round_id)
+        cache.set(key, roster, ROSTER_CACHE_SECONDS)
+    return roster
+
+
+def invalidate_roster(*game_round_ids):
+    cache.delete_many([ROSTER_CACHE_KEY.format(game_round_id) for game_round_id in game_round_ids])
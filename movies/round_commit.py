@@ -0,0 +1,85 @@
+"""
+Round commit pipeline.
+
+commit_round_result() takes a RoundResult from scoring.score_round() and writes it out: every PointsEarned record for
+the round in one bulk INSERT, and every UserRoundDetail in one bulk UPDATE, all inside a single transaction. Any
+PointsEarned records already written for the round are deleted first (one DELETE), so committing the same round twice
+leaves the same rows behind as committing it once.
+
+This replaces the per-participant CommitUserRoundView.update_user() calls, which did a RoundRank lookup, an
+exists() + delete, one INSERT per point and a full-row save for every participant.
+"""
+import time
+from dataclasses import dataclass
+
+from django.db import transaction
+
+from .models import UserRoundDetail, RoundRank, PointsEarned
+from .scoring import POINT_TYPES
+
+
+@dataclass
+class CommitReport:
+    game_round_id: int
+    points_deleted: int = 0
+    points_written: int = 0
+    details_updated: int = 0
+    elapsed: float = 0.0        # seconds
+
+    def __str__(self):
+        return 'Round {}: wrote {} points ({} replaced), updated {} round details in {:.3f}s'.format(
+            self.game_round_id, self.points_written, self.points_deleted, self.details_updated, self.elapsed)
+
+
+def commit_round_result(round_result):
+    """Write round_result's points and per-participant totals to the database. Safe to call more than once."""
+    started = time.perf_counter()
+    report = CommitReport(game_round_id=round_result.game_round_id)
+
+    results_by_user = {p_result.user_id: p_result for p_result in round_result.participants}
+
+    with transaction.atomic():
+        urds = list(UserRoundDetail.objects.filter(game_round_id=round_result.game_round_id))
+
+        # the RoundRank table only needs to be read once for the whole round
+        ranks = {rank.rank_int: rank for rank in RoundRank.objects.filter(rank_int__in=[p.rank for p in round_result.participants])}
+
+        # clear out any points already written for this round, e.g. if the round is being concluded a second time
+        report.points_deleted, _ = PointsEarned.objects.filter(user_round_ob__game_round_id=round_result.game_round_id).delete()
+
+        new_points = []
+        for urd in urds:
+            p_result = results_by_user.get(urd.user_id)
+            if p_result is None:
+                continue    # participant wasn't scored (shouldn't happen for a valid result), leave their URD alone
+
+            for point_type in POINT_TYPES:
+                for point in p_result.points[point_type]:
+                    new_points.append(PointsEarned(user_round_ob=urd, point_int=point.point_value,
+                        point_type=point.point_type, point_string=point.point_string))
+
+            urd.correct_guess_points = p_result.points_for('guess')
+            urd.known_movie_points = p_result.points_for('known')
+            urd.unseen_movie_points = p_result.points_for('unseen')
+            urd.liked_movie_points = p_result.points_for('liked')
+            urd.disliked_movie_points = p_result.points_for('disliked')
+            urd.total_points = p_result.total_points
+
+            urd.rank = ranks.get(p_result.rank)
+            urd.winner_bool = (p_result.rank == 1)
+            urd.movie_average_rating = p_result.movie_average_rating
+            urd.finalized_by_admin = True
+
+            report.details_updated += 1
+
+        PointsEarned.objects.bulk_create(new_points)
+        report.points_written = len(new_points)
+
+        UserRoundDetail.objects.bulk_update(urds, fields=[
+            'correct_guess_points', 'known_movie_points', 'unseen_movie_points', 'liked_movie_points',
+            'disliked_movie_points', 'total_points', 'rank', 'winner_bool', 'movie_average_rating', 'finalized_by_admin',
+        ])
+
+    report.elapsed = time.perf_counter() - started
+
+    return report
@@ -0,0 +1,84 @@
+"""
+Cached snapshot of the current ("active") round.
+
+Nearly every page needs to know the same few things before doing its real work: which round is active, whether it has
+been completed, how many films are in it, and how far the Results Party has got. Working that out took 4-6 queries
+(ShallWeParty alone did an exists(), a .last(), a Movie count and up to two PartyState queries), on every page view.
+
+get_round_state() answers all of it from one cached RoundState object. The signal handlers in signals.py throw the
+cached copy away whenever a GameRound, Movie, PartyState or PartyPayload is saved or deleted, so the next request
+rebuilds it. Code that changes those tables with queryset.update() (which sends no signals) must call
+invalidate_round_state() itself.
+
+Invalidation only reaches other worker processes if CACHES points at a shared cache; as a safety net the snapshot also
+expires on its own after ROUND_STATE_CACHE_SECONDS.
+"""
+from dataclasses import dataclass
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .models import GameRound, Movie, PartyState, PartyPayload
+
+
+ROUND_STATE_CACHE_KEY = 'round:state'
+ROUND_STATE_CACHE_SECONDS = getattr(settings, 'ROUND_STATE_CACHE_SECONDS', 10)
+
+
+@dataclass
+class RoundState:
+    active_round_id: int = None
+    round_number: int = None
+    round_completed: bool = False
+    film_count: int = 0
+    party_index: int = None     # None if the party has never been started (no PartyState record)
+    party_payload_version: int = None   # version of the active round's stored party data (see party_payload.py)
+
+    @property
+    def active_round_exists(self):
+        return self.active_round_id is not None
+
+    @property
+    def party_pending(self):
+        """True once the active round is completed but its Results Party hasn't revealed every film yet"""
+        return self.round_completed and (self.party_index is None or self.party_index <= self.film_count)
+
+
+def _build_round_state():
+    state = RoundState()
+
+    # only one round can hold the active lock (see GameRound.active_lock), so this is a unique index lookup
+    current_round = GameRound.objects.filter(active_lock=True).values('id', 'round_number', 'round_completed').first()
+    if current_round:
+        state.active_round_id = current_round['id']
+        state.round_number = current_round['round_number']
+        state.round_completed = current_round['round_completed']
+        state.film_count = Movie.objects.filter(game_round_id=current_round['id']).count()
+        state.party_payload_version = PartyPayload.objects.filter(game_round_id=current_round['id']).values_list('version', flat=True).first()
+
+    party_state = PartyState.objects.values('idx').last()
+    if party_state:
+        state.party_index = party_state['idx']
+
+    return state
+
+
+def get_round_state():
+    state = cache.get(ROUND_STATE_CACHE_KEY)
+    if state is None:
+        state = _build_round_state()
+        cache.set(ROUND_STATE_CACHE_KEY, state, ROUND_STATE_CACHE_SECONDS)
+    return state
+
+
+def get_active_round():
+    """the active GameRound object itself (one query by primary key), or None if there isn't one"""
+    state = get_round_state()
+    if not state.active_round_exists:
+        return None
+    return GameRound.objects.filter(pk=state.active_round_id).first()
+
+
+def invalidate_round_state(**kwargs):
+    # accepts (and ignores) the signal arguments so it can be connected as a receiver directly
+    cache.delete(ROUND_STATE_CACHE_KEY)
@@ -0,0 +1,160 @@
+"""
+Round scoring engine.
+
+score_round() loads everything needed to score a GameRound -- its participants, its movies, and every UserMovieDetail
+for those movies (with the related users and movies) -- in a fixed number of queries, then works out every participant's
+guess / known / unseen / liked / disliked points and their rank in memory. The number of queries does not depend on how
+many participants or movies are in the round.
+
+The old approach (calculate_guess_points / calculate_movie_points on ConcludeRoundView) ran a .get() per participant
+per movie, so a round's query count grew with participants x movies.
+"""
+from dataclasses import dataclass, field
+
+from .models import UserMovieDetail
+
+
+def get_point_values():
+    return {
+        "liked_point_value":   2,
+        "loathed_point_value": 2,
+        "guess_point_value":   2,
+        "unseen_point_value":  1,
+        "known_point_value":   1
+    }
+
+
+# point_type (as stored in PointsEarned.point_type) -> the key the Commit User Round page groups its points under
+POINT_QUEUE_KEYS = {
+    'guess': 'points_by_guess',
+    'known': 'points_by_movie_known',
+    'unseen': 'points_by_movie_unseen',
+    'liked': 'points_by_movie_liked',
+    'disliked': 'points_by_movie_disliked',
+}
+
+POINT_TYPES = tuple(POINT_QUEUE_KEYS.keys())
+
+
+@dataclass
+class Point:
+    """One earned point, before it's written out as a PointsEarned record"""
+    point_type: str
+    point_value: int
+    point_string: str
+
+
+@dataclass
+class ParticipantResult:
+    user_id: int
+    username: str
+    movie_id: int = None                   # the movie this participant chose for the round
+    movie_average_rating: float = 0.0      # average rating of that movie; used to break ties on points
+    rank: int = 0
+    points: dict = field(default_factory=lambda: {point_type: [] for point_type in POINT_TYPES})
+
+    def points_for(self, point_type):
+        return sum(point.point_value for point in self.points[point_type])
+
+    @property
+    def total_points(self):
+        return sum(self.points_for(point_type) for point_type in POINT_TYPES)
+
+
+@dataclass
+class RoundResult:
+    game_round_id: int
+    participants: list = field(default_factory=list)            # ParticipantResult objects, in rank order
+    invalid_participants: list = field(default_factory=list)    # usernames of anyone whose details are incomplete
+
+    @property
+    def is_valid(self):
+        return not self.invalid_participants
+
+    @property
+    def winner(self):
+        return self.participants[0] if self.participants else None
+
+    def for_user(self, user_id):
+        for participant in self.participants:
+            if participant.user_id == user_id:
+                return participant
+        return None
+
+
+def score_round(game_round):
+    """Score every participant of game_round. Always runs exactly three queries: participants, movies, and UMDs."""
+    point_values = get_point_values()
+
+    participants = list(game_round.participants.all())
+    round_movies = list(game_round.movies_from_round.all())
+
+    umds = list(UserMovieDetail.objects.filter(movie__game_round=game_round)
+        .select_related('user', 'movie', 'user_guess')
+        .order_by('pk'))
+
+    # index the UMDs every way we need them, in one pass
+    umds_by_movie = {movie.id: [] for movie in round_movies}
+    umds_by_user = {participant.id: {} for participant in participants}
+    chooser_by_movie = {}
+
+    for umd in umds:
+        umds_by_movie.setdefault(umd.movie_id, []).append(umd)
+        umds_by_user.setdefault(umd.user_id, {})[umd.movie_id] = umd
+        if umd.is_user_movie:
+            chooser_by_movie[umd.movie_id] = umd.user_id
+
+    result = RoundResult(game_round_id=game_round.id)
+
+    for participant in participants:
+        participant_umds = umds_by_user[participant.id]
+
+        # sanity-check: everyone must have submitted details for every movie, and claimed exactly one movie as theirs
+        # (with no guess on it -- you can't guess who chose your own movie)
+        chosen = [umd for umd in participant_umds.values() if umd.is_user_movie and umd.user_guess_id is None]
+        if len(participant_umds) < len(round_movies) or len(chosen) != 1:
+            result.invalid_participants.append(participant.username)
+            continue
+
+        participant_movie = chosen[0].movie
+        movie_umds = umds_by_movie[participant_movie.id]
+
+        p_result = ParticipantResult(user_id=participant.id, username=participant.username, movie_id=participant_movie.id)
+
+        # average rating of the participant's own movie; the round isn't completed yet, so this is the 'incomplete' average
+        if movie_umds:
+            p_result.movie_average_rating = round(sum(umd.star_rating for umd in movie_umds) / len(movie_umds), 1)
+
+        # guess points: one for every movie where this participant correctly guessed who chose it
+        for movie in round_movies:
+            umd = participant_umds[movie.id]
+            if umd.user_guess_id is not None and umd.user_guess_id == chooser_by_movie.get(movie.id):
+                p_result.points['guess'].append(Point('guess', point_values['guess_point_value'],
+                    'Correctly guessed that {} chose {}'.format(umd.user_guess.username, movie.name)))
+
+        # movie points: earned from how everyone else responded to this participant's movie
+        for umd in movie_umds:
+            if not umd.seen_previously:
+                p_result.points['unseen'].append(Point('unseen', point_values['unseen_point_value'],
+                    '{} had not previously seen {}'.format(umd.user.username, participant_movie.name)))
+
+            if umd.heard_of:
+                p_result.points['known'].append(Point('known', point_values['known_point_value'],
+                    '{} had heard of {}'.format(umd.user.username, participant_movie.name)))
+
+            if umd.star_rating == 1:
+                p_result.points['disliked'].append(Point('disliked', point_values['loathed_point_value'],
+                    '{} gave {} the worst possible rating, 1 star.'.format(umd.user.username, participant_movie.name)))
+
+            if umd.star_rating > 3:
+                p_result.points['liked'].append(Point('liked', point_values['liked_point_value'],
+                    '{} rated {} higher than 3 stars.'.format(umd.user.username, participant_movie.name)))
+
+        result.participants.append(p_result)
+
+    # rank by point total, with the average rating of the participant's movie breaking ties (higher is better)
+    result.participants.sort(key=lambda p: (p.total_points, p.movie_average_rating), reverse=True)
+    for rank, p_result in enumerate(result.participants, 1):
+        p_result.rank = rank
+
+    return result
@@ -0,0 +1,74 @@
+"""
+Scoring drafts: a round's scored results, kept on the server between the Conclude Round and Commit views.
+
+ConcludeRoundView used to score the round and put the whole result -- every point string of every participant
+(point_queue), the ranks (ranked_results) and the winner's name -- into request.session, keyed by username, for
+CommitUserRoundView and CommitGameRoundView to read back (the winner by User.objects.get(username__icontains=...)).
+With the database session backend, that meant writing and re-reading a large blob on every admin request.
+
+Now the result is kept in the cache as a ScoringDraft, under the round's id and data_version (see GameRound): every view
+that needs the results asks get_scoring_draft() for them, and gets the stored draft as long as nothing in the round has
+changed since it was scored. If something has (a detail was edited, a movie added...), the version no longer matches
+and the round is scored again, so a draft is never stale. Participants are looked up by user id.
+
+A missing draft (cache cleared, another worker process without a shared cache) just means the round is scored again:
+three queries, see scoring.py.
+"""
+from dataclasses import dataclass
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+from .scoring import POINT_QUEUE_KEYS, POINT_TYPES, score_round
+
+
+SCORING_DRAFT_CACHE_SECONDS = getattr(settings, 'SCORING_DRAFT_CACHE_SECONDS', 6 * 60 * 60)
+
+
+def _cache_key(game_round_id, data_version):
+    return 'scoring:draft:{}:{}'.format(game_round_id, data_version)
+
+
+@dataclass
+class ScoringDraft:
+    game_round_id: int
+    data_version: int
+    result: object          # scoring.RoundResult
+    scored_at: object       # datetime
+
+    @property
+    def is_valid(self):
+        return self.result.is_valid
+
+    @property
+    def winner_id(self):
+        winner = self.result.winner
+        return winner.user_id if winner else None
+
+    def for_user(self, user_id):
+        """the participant's ParticipantResult, or None if they weren't scored"""
+        return self.result.for_user(user_id)
+
+    def points_by_key(self, user_id):
+        """
+        the participant's points in the layout the commit page shows them: 'points_by_guess' / 'points_by_movie_known' /
+        ... -> list of {'point_value', 'point_string'}
+        """
+        participant = self.for_user(user_id)
+        return {
+            POINT_QUEUE_KEYS[point_type]: [{'point_value': point.point_value, 'point_string': point.point_string}
+                                           for point in participant.points[point_type]]
+            for point_type in POINT_TYPES
+        }
+
+
+def get_scoring_draft(game_round):
+    """the scored results of game_round as it is now (game_round must have been loaded in this request)"""
+    key = _cache_key(game_round.pk, game_round.data_version)
+    draft = cache.get(key)
+    if draft is None:
+        draft = ScoringDraft(game_round_id=game_round.pk, data_version=game_round.data_version,
+            result=score_round(game_round), scored_at=timezone.now())
+        cache.set(key, draft, SCORING_DRAFT_CACHE_SECONDS)
+    return draft
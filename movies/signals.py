@@ -1,8 +1,15 @@
 from django.conf import settings
-from django.db.models.signals import post_save
+from django.core.signals import request_started
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_save, post_delete, m2m_changed
 from django.dispatch import receiver
 
-from movies.models import UserProfile
+from movies.models import UserProfile, UserMovieDetail, UserRoundDetail, Movie, GameRound, PartyState, PartyPayload, RoundProgress
+from movies.round_state import invalidate_round_state
+from movies.roster import invalidate_roster
+from movies.presence import invalidate_presence_members
+from movies.middleware import install_query_timer
+from movies.media_manifest import check_manifest
 
 
 # using a Signal to create a UserProfile for a user, everytime a new user is created
@@ -12,6 +19,116 @@ def create_user_profile(sender, instance, created, **kwargs):
         UserProfile.objects.create(user=instance) # create will automatically save the record in the db
 
 # we need the UserProfile to be saved anytime the User model is saved, not just the first time it's created...
+# ...but only if it was loaded through this user (otherwise there's nothing of it to save, and loading it is a query),
+# and then only what changed on it gets written, if anything did (see dirty_fields.py). Logins save the user every time.
 @receiver(post_save, sender=settings.AUTH_USER_MODEL)
 def save_user_profile(sender, instance, **kwargs):
-    instance.userprofile.save()
+    if sender.userprofile.is_cached(instance):
+        instance.userprofile.save()
+
+
+# keep the stored rating aggregates on Movie current whenever a UMD is created or edited...
+@receiver(post_save, sender=UserMovieDetail)
+def update_movie_ratings(sender, instance, **kwargs):
+    instance.movie.update_rating_aggregates()
+
+# ...or deleted. The movie itself may be going away too (cascade delete), in which case there's nothing to update.
+@receiver(post_delete, sender=UserMovieDetail)
+def update_movie_ratings_on_delete(sender, instance, **kwargs):
+    movie = Movie.objects.filter(pk=instance.movie_id).first()
+    if movie:
+        movie.update_rating_aggregates()
+
+
+# keep the round's submission progress (see RoundProgress) current: who has submitted details for which movie
+@receiver(post_save, sender=UserMovieDetail)
+def record_round_progress(sender, instance, created, **kwargs):
+    if created:
+        RoundProgress.objects.set_submitted(instance.movie.game_round_id, instance.movie_id, instance.user_id)
+
+@receiver(post_delete, sender=UserMovieDetail)
+def record_round_progress_on_delete(sender, instance, **kwargs):
+    game_round_id = Movie.objects.filter(pk=instance.movie_id).values_list('game_round_id', flat=True).first()
+    if game_round_id:
+        RoundProgress.objects.set_submitted(game_round_id, instance.movie_id, instance.user_id, submitted=False)
+
+
+# the cached active-round snapshot (see round_state.py) is built from these tables, so any change to them
+# throws it away; the next request rebuilds it
+for model in (GameRound, Movie, PartyState, PartyPayload):
+    post_save.connect(invalidate_round_state, sender=model, dispatch_uid='invalidate_round_state_save_{}'.format(model.__name__))
+    post_delete.connect(invalidate_round_state, sender=model, dispatch_uid='invalidate_round_state_delete_{}'.format(model.__name__))
+
+
+# a round's data_version (see GameRound) goes up whenever something its results are worked out from changes, so
+# anything derived from those results and stored under the version (e.g. the scoring draft) is known to be stale
+@receiver(post_save, sender=UserMovieDetail)
+@receiver(post_delete, sender=UserMovieDetail)
+def bump_round_version_for_detail(sender, instance, **kwargs):
+    game_round_id = Movie.objects.filter(pk=instance.movie_id).values_list('game_round_id', flat=True).first()
+    if game_round_id:
+        GameRound.objects.bump_data_version(game_round_id)
+
+@receiver(post_save, sender=Movie)
+@receiver(post_delete, sender=Movie)
+@receiver(post_save, sender=UserRoundDetail)
+@receiver(post_delete, sender=UserRoundDetail)
+def bump_round_version(sender, instance, **kwargs):
+    GameRound.objects.bump_data_version(instance.game_round_id)
+
+# participants added / removed through the M2M field (rather than by saving a UserRoundDetail)
+@receiver(m2m_changed, sender=GameRound.participants.through)
+def bump_round_version_for_participants(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        GameRound.objects.bump_data_version(instance.pk)
+    elif pk_set:
+        # changed from the user's side (user.related_game_rounds.add(...)): pk_set holds the rounds
+        for game_round_id in pk_set:
+            GameRound.objects.bump_data_version(game_round_id)
+
+
+# the cached round rosters (see roster.py) change with a round's participants...
+@receiver(post_save, sender=UserRoundDetail)
+def invalidate_roster_for_detail(sender, instance, created, **kwargs):
+    if created:
+        invalidate_roster(instance.game_round_id)
+
+@receiver(post_delete, sender=UserRoundDetail)
+def invalidate_roster_for_deleted_detail(sender, instance, **kwargs):
+    invalidate_roster(instance.game_round_id)
+
+@receiver(m2m_changed, sender=GameRound.participants.through)
+def invalidate_roster_for_participants(sender, instance, action, reverse, pk_set, **kwargs):
+    if not reverse:
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            invalidate_roster(instance.pk)
+    elif action in ('post_add', 'post_remove') and pk_set:
+        invalidate_roster(*pk_set)
+    elif action == 'pre_clear':
+        # (post_clear from the user's side doesn't say which rounds they were in; they're still there before)
+        invalidate_roster(*instance.related_game_rounds.values_list('id', flat=True))
+
+# ...and with their usernames. (Logging in saves the user too, but only its last_login.)
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def invalidate_roster_for_user(sender, instance, created, update_fields=None, **kwargs):
+    if created or (update_fields is not None and set(update_fields) <= {'last_login'}):
+        return
+    invalidate_roster(*instance.related_game_rounds.values_list('id', flat=True))
+
+
+# the party page's presence check reads a cached list of member ids (see presence.py); a new or (de)activated member
+# needs it re-read
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def invalidate_presence_members_for_user(sender, instance, created, update_fields=None, **kwargs):
+    if created or update_fields is None or 'is_active' in update_fields:
+        invalidate_presence_members()
+
+
+# every database connection reports its queries to ServerTimingMiddleware, whichever thread it's opened on (under ASGI,
+# a request's queries run on sync_to_async's threads, not the one the middleware runs on)
+connection_created.connect(install_query_timer)
+
+# the in-process copy of the media manifest is checked against the shared stamp once per request (see media_manifest.py)
+request_started.connect(check_manifest)
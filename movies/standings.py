@@ -0,0 +1,166 @@
+"""
+All-time standings snapshots ("standings as of round N"), stored in AllTimeScore.
+
+The Members page used to sort UserProfile six different ways (rounds won, guesses, liked, disliked, known, unseen) and
+count the completed rounds on every view, although none of it changes between round conclusions. Now the standings are
+worked out once, when a round is concluded, and stored with that round:
+
+ - build_standings() works out every category's ranking as of a round, from the UserRoundDetails of the completed rounds
+   up to and including it (one GROUP BY user query), plus each member's rank movement since the round before
+ - refresh_standings() stores that in the round's AllTimeScore row, along with the leader of each category, and redoes
+   the snapshots of any later rounds (a round concluded a second time changes the standings after every round since)
+ - the Members page shows the latest snapshot, and members/after/<round number>/ any earlier one
+
+The Members page only reads them: until there are any (the rounds concluded before they were stored), it shows no
+rankings. To work them out once after deploying, or if they ever go missing or wrong, run:
+python3 manage.py rebuild_standings  (or use the admin page's Update Points)
+"""
+from django.db import transaction
+from django.db.models import F, Q, Sum, Count
+
+from .models import AllTimeScore, GameRound, UserProfile, UserRoundDetail
+
+
+# 2: members who haven't taken part in a round yet are in the standings too, with zeros
+STANDINGS_SCHEMA = 2
+
+# category -> (UserRoundDetail field it adds up, AllTimeScore field holding its leader, title, column heading, footnote),
+# in the order the Members page shows them
+CATEGORIES = {
+    'rounds_won': ('winner_bool', 'most_rounds_won', 'Rounds Won', 'Rounds Won', ''),
+    'correct_guesses': ('correct_guess_points', 'most_guess_points', 'Correct Guesses', 'Correct Guesses', ''),
+    'liked': ('liked_movie_points', 'most_liked_points', 'Liked Movies', 'Liked Movie Points',
+        'Players earn +2 point for every 4 or 5 star rating of their movies.'),
+    'disliked': ('disliked_movie_points', 'most_disliked_points', 'Loathed Movies', 'Disliked Movie Points',
+        'Players earn +2 point for every 1 star rating of their movies.'),
+    'unseen': ('unseen_movie_points', 'most_unseen_points', 'Unseen Movies', 'Unseen Movie Points',
+        'Players earn +1 point for every member that had not seen their movie choice.'),
+    'known': ('known_movie_points', 'most_seen_points', 'Known Movies', 'Known Movie Points',
+        'Players earn +1 point for every member that had heard of their movie choice.'),
+}
+
+
+def _ranked(rows, category):
+    """rows sorted best first, with competition ranks (two members tied for first are both #1, the next one is #3)"""
+    ranked = []
+    for position, row in enumerate(sorted(rows, key=lambda row: (-row[category], row['username'].lower())), start=1):
+        rank = ranked[-1]['rank'] if ranked and ranked[-1]['value'] == row[category] else position
+        ranked.append({'user_id': row['user_id'], 'username': row['username'], 'value': row[category], 'rank': rank})
+    return ranked
+
+
+def build_standings(game_round, previous=None):
+    """
+    The standings after game_round, as a dict (not saved; see refresh_standings). previous is the standings document
+    of the round before, if there is one, for the rank movement.
+
+    Every member (every UserProfile) is in the standings, with zeros until they've taken part in a round; admin accounts
+    never are. Both as on the old Members page.
+    """
+    aggregates = {category: Sum(field) for category, (field, *rest) in CATEGORIES.items() if category != 'rounds_won'}
+    aggregates['rounds_won'] = Count('id', filter=Q(winner_bool=True))
+
+    rounds = GameRound.objects.filter(round_completed=True, round_number__lte=game_round.round_number)
+    rows = list(UserRoundDetail.objects.filter(game_round__in=rounds).exclude(user__username__icontains='admin')
+        .values('user_id', username=F('user__username')).annotate(**aggregates).order_by())
+
+    for row in rows:
+        for category in CATEGORIES:
+            row[category] = row[category] or 0
+        row['correct_guesses'] //= 2    # two points per correct guess
+
+    taken_part = {row['user_id'] for row in rows}
+    for user_id, username in UserProfile.objects.exclude(user__username__icontains='admin').values_list('user_id', 'user__username'):
+        if user_id not in taken_part:
+            rows.append(dict({category: 0 for category in CATEGORIES}, user_id=user_id, username=username))
+
+    previous_ranks = {}
+    if previous:
+        for category, ranking in previous['categories'].items():
+            previous_ranks[category] = {row['user_id']: row['rank'] for row in ranking}
+
+    categories = {}
+    for category in CATEGORIES:
+        ranking = _ranked(rows, category)
+        for row in ranking:
+            # positive: moved up the table since the round before; None: wasn't in those standings
+            previous_rank = previous_ranks.get(category, {}).get(row['user_id'])
+            row['movement'] = None if previous_rank is None else previous_rank - row['rank']
+        categories[category] = ranking
+
+    return {
+        'schema': STANDINGS_SCHEMA,
+        'round_number': game_round.round_number,
+        'previous_round_number': previous['round_number'] if previous else None,
+        'completed_rounds': rounds.count(),
+        'categories': categories,
+    }
+
+
+def _save_standings(game_round, standings):
+    leaders = {}
+    for category, (field, leader_field, *rest) in CATEGORIES.items():
+        ranking = standings['categories'][category]
+        leaders[leader_field + '_id'] = ranking[0]['user_id'] if ranking else None
+
+    snapshot, created = AllTimeScore.objects.update_or_create(game_round=game_round,
+        defaults=dict(standings=standings, **leaders))
+    return snapshot
+
+
+def refresh_standings(game_round):
+    """
+    Work out and store the standings after game_round (a completed round), then redo those of every later completed
+    round, since their totals and movements build on this one. Returns game_round's AllTimeScore.
+    """
+    previous = (AllTimeScore.objects.filter(game_round__round_completed=True, game_round__round_number__lt=game_round.round_number)
+        .order_by('-game_round__round_number').values_list('standings', flat=True).first())
+
+    later_rounds = GameRound.objects.filter(round_completed=True, round_number__gt=game_round.round_number).order_by('round_number')
+
+    with transaction.atomic():
+        snapshot = _save_standings(game_round, build_standings(game_round, previous))
+
+        previous = snapshot.standings
+        for later_round in later_rounds:
+            previous = _save_standings(later_round, build_standings(later_round, previous)).standings
+
+    return snapshot
+
+
+def rebuild_all_standings():
+    """redo the snapshot of every completed round, from the first; returns how many there are"""
+    first_round = GameRound.objects.filter(round_completed=True).order_by('round_number').first()
+    if first_round is None:
+        return 0
+
+    # snapshots of rounds that have since been re-opened (or deleted) don't count any more
+    AllTimeScore.objects.exclude(game_round__round_completed=True).delete()
+    refresh_standings(first_round)
+    return AllTimeScore.objects.count()
+
+
+def get_standings(round_number=None):
+    """
+    The AllTimeScore snapshot after round round_number, or after the latest completed round if round_number is None.
+    None if there isn't one (yet).
+    """
+    snapshots = AllTimeScore.objects.filter(game_round__round_completed=True)
+    if round_number is not None:
+        return snapshots.filter(game_round__round_number=round_number).first()
+    return snapshots.order_by('-game_round__round_number').first()
+
+
+def leaderboards(standings):
+    """the standings document laid out for the Members page: one dict per category, in page order"""
+    boards = []
+    for category, (field, leader_field, title, column, note) in CATEGORIES.items():
+        rows = []
+        for row in standings['categories'].get(category, []):
+            movement = row['movement']
+            rows.append(dict(row,
+                new=movement is None and standings['previous_round_number'] is not None,
+                up=movement if movement and movement > 0 else 0,
+                down=-movement if movement and movement < 0 else 0))
+        boards.append({'category': category, 'title': title, 'column': column, 'note': note, 'rows': rows})
+    return boards
@@ -1,3 +1,1179 @@
-from django.test import TestCase
+import asyncio
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+import unittest
+from datetime import date
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+import django
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.cache.utils import make_template_fragment_key
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Avg
+from django.test import AsyncClient, Client, RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from . import media_manifest, media_serving, party_async
+from .db_pool import ConnectionPool, PoolTimeout
+from .forms import UserMovieDetailForm
+from .image_variants import Image, make_poster_variants, sweep_poster_variants
+from .media_manifest import MEDIA_MANIFEST_FILENAME, check_manifest, get_asset, poster_images, rebuild_manifest, record_asset
+from .middleware import RequestTimer
+from .overview import SORT_MODES, overview_page
+from .party import PARTY_STREAM_TICK_SECONDS, set_party_index
+from .party_payload import get_party_payload
+from .reveal import NO_REVEAL, get_reveal
+from .presence import party_goers, record_ping
+from .roster import ROSTER_CACHE_KEY
+from .round_commit import commit_round_result
+from .standings import get_standings, rebuild_all_standings
+from .scoring import score_round
+from .models import (GameRound, Movie, UserMovieDetail, UserRoundDetail, PointsEarned, RoundRank, PartyState, RoundProgress,
+                     AllTimeScore, UserProfile, PROFILE_TOTAL_FIELDS)
+
+
+class ActiveRoundTests(TestCase):
+
+    def test_activating_a_round_deactivates_the_previous_one(self):
+        first = GameRound.objects.create(round_number=1, active_round=True)
+        second = GameRound.objects.create(round_number=2, active_round=True)
+
+        first.refresh_from_db()
+        self.assertFalse(first.active_round)
+        self.assertIsNone(first.active_lock)
+        self.assertTrue(second.active_lock)
+        self.assertEqual(list(GameRound.objects.filter(active_round=True)), [second])
+
+    def test_deactivating_releases_the_lock(self):
+        game_round = GameRound.objects.create(round_number=1, active_round=True)
+        game_round.active_round = False
+        game_round.save()
+
+        self.assertFalse(GameRound.objects.filter(active_lock=True).exists())
+
+    def test_database_refuses_a_second_active_round(self):
+        GameRound.objects.create(round_number=1, active_round=True)
+        other = GameRound.objects.create(round_number=2)
+
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            GameRound.objects.filter(pk=other.pk).update(active_round=True, active_lock=True)
+
+
+def _explained_tables(plan):
+    """every 'table' entry in a MySQL EXPLAIN FORMAT=JSON plan, whatever it's nested in"""
+    if isinstance(plan, dict):
+        if 'table_name' in plan:
+            yield plan
+        for value in plan.values():
+            yield from _explained_tables(value)
+    elif isinstance(plan, list):
+        for value in plan:
+            yield from _explained_tables(value)
+
+
+@unittest.skipUnless(connection.vendor == 'mysql', 'the index tests read MySQL EXPLAIN output')
+class HotQueryIndexTests(TestCase):
+    """each of the hot lookups can use (and uses) an index on MySQL, rather than scanning its table"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.users = [User.objects.create(username='member_{}'.format(index)) for index in range(3)]
+        cls.rank = RoundRank.objects.create(rank_int=1, rank_string='Winner')
+
+        # a few rounds, so the optimizer has some reason to use an index
+        for round_number in range(1, 6):
+            game_round = GameRound.objects.create(round_number=round_number, round_completed=round_number < 5,
+                active_round=round_number == 5)
+            for user in cls.users:
+                urd = UserRoundDetail.objects.create(user=user, game_round=game_round, rank=cls.rank)
+                PointsEarned.objects.create(user_round_ob=urd, point_int=1, point_type='correct_guess', point_string='a point')
+                movie = Movie.objects.create(name='Movie {}-{}'.format(round_number, user.id), game_round=game_round)
+                for other in cls.users:
+                    UserMovieDetail.objects.create(user=other, movie=movie, is_user_movie=other == user,
+                        user_guess=None if other == user else user)
+
+        cls.game_round = GameRound.objects.get(round_number=3)
+        cls.movie = Movie.objects.filter(game_round=cls.game_round).first()
+        cls.urd = UserRoundDetail.objects.filter(game_round=cls.game_round).first()
+
+    def assertUsesIndex(self, queryset, table, index_name):
+        plan = json.loads(queryset.explain(format='json'))
+        entries = [entry for entry in _explained_tables(plan) if entry['table_name'] == table]
+        self.assertTrue(entries, 'no {} in the plan: {}'.format(table, plan))
+
+        entry = entries[0]
+        self.assertNotEqual(entry['access_type'], 'ALL', 'full scan of {}: {}'.format(table, entry))
+        self.assertIn(index_name, entry.get('possible_keys', []), entry)
+        self.assertIsNotNone(entry.get('key'), entry)
+
+    def test_active_round(self):
+        self.assertUsesIndex(GameRound.objects.filter(active_lock=True), 'movies_gameround', 'active_lock')
+        self.assertUsesIndex(GameRound.objects.filter(active_round=True), 'movies_gameround', 'gameround_active_idx')
+
+    def test_completed_rounds(self):
+        self.assertUsesIndex(GameRound.objects.filter(round_completed=True).order_by('round_number'),
+            'movies_gameround', 'gameround_completed_num_idx')
+
+    def test_chooser_detail(self):
+        self.assertUsesIndex(UserMovieDetail.objects.filter(movie=self.movie, is_user_movie=True),
+            'movies_usermoviedetail', 'umd_movie_user_movie_idx')
+
+    def test_guesses(self):
+        self.assertUsesIndex(UserMovieDetail.objects.filter(movie=self.movie, user_guess=self.users[0]),
+            'movies_usermoviedetail', 'umd_movie_guess_idx')
+
+    def test_points_by_type(self):
+        self.assertUsesIndex(PointsEarned.objects.filter(user_round_ob=self.urd, point_type='correct_guess'),
+            'movies_pointsearned', 'points_urd_type_idx')
+
+    def test_round_ranks(self):
+        self.assertUsesIndex(UserRoundDetail.objects.filter(game_round=self.game_round, rank=self.rank),
+            'movies_userrounddetail', 'urd_round_rank_idx')
+
+    def test_round_movies(self):
+        self.assertUsesIndex(Movie.objects.filter(game_round=self.game_round).order_by('date_watched'),
+            'movies_movie', 'movie_round_watched_idx')
+
+
+class FakeConnection:
+    """stands in for a MySQLdb connection: ping() fails once the 'server' has dropped it"""
+
+    def __init__(self, number):
+        self.number = number
+        self.dropped = False
+        self.closed = False
+
+    def ping(self):
+        if self.dropped:
+            raise OSError('MySQL server has gone away')
+
+    def close(self):
+        self.closed = True
+
+
+class FakeClock:
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class ConnectionPoolTests(SimpleTestCase):
+
+    def make_pool(self, **kwargs):
+        self.opened = []
+
+        def connect():
+            connection = FakeConnection(len(self.opened) + 1)
+            self.opened.append(connection)
+            return connection
+
+        kwargs.setdefault('health_check', FakeConnection.ping)
+        return ConnectionPool(connect, **kwargs)
+
+    def test_connections_are_reused(self):
+        pool = self.make_pool()
+        first = pool.checkout()
+        pool.checkin(first)
+        second = pool.checkout()
+
+        self.assertIs(first, second)
+        stats = pool.stats()
+        self.assertEqual((stats['checkouts'], stats['creates'], stats['waits']), (2, 1, 0))
+        self.assertEqual((stats['size'], stats['in_use']), (1, 1))
+
+    def test_fill_opens_min_size(self):
+        pool = self.make_pool(min_size=3, max_size=5)
+        pool.fill()
+
+        self.assertEqual(len(self.opened), 3)
+        self.assertEqual(pool.stats()['idle'], 3)
+
+    def test_dropped_connection_is_replaced_on_checkout(self):
+        pool = self.make_pool()
+        first = pool.checkout()
+        pool.checkin(first)
+        first.dropped = True
+
+        second = pool.checkout()
+        self.assertIsNot(first, second)
+        self.assertTrue(first.closed)
+        self.assertEqual(pool.stats()['discards'], 1)
+        self.assertEqual(pool.stats()['size'], 1)
+
+    def test_old_connections_are_retired(self):
+        clock = FakeClock()
+        pool = self.make_pool(max_lifetime=60, clock=clock)
+        first = pool.checkout()
+        pool.checkin(first)
+
+        clock.now = 61
+        second = pool.checkout()
+        self.assertIsNot(first, second)
+        self.assertTrue(first.closed)
+
+        # and one that gets too old while it's checked out isn't taken back
+        clock.now = 200
+        pool.checkin(second)
+        self.assertTrue(second.closed)
+        self.assertEqual(pool.stats()['size'], 0)
+
+    def test_full_pool_times_out(self):
+        pool = self.make_pool(max_size=1, timeout=0)
+        pool.checkout()
+
+        with self.assertRaises(PoolTimeout):
+            pool.checkout()
+        stats = pool.stats()
+        self.assertEqual((stats['waits'], stats['timeouts'], stats['creates']), (1, 1, 1))
+
+    def test_full_pool_waits_for_a_checkin(self):
+        pool = self.make_pool(max_size=1, timeout=5)
+        first = pool.checkout()
+        got = []
+
+        waiter = threading.Thread(target=lambda: got.append(pool.checkout()))
+        waiter.start()
+        while pool.stats()['waits'] == 0:
+            pass
+        pool.checkin(first)
+        waiter.join(5)
+
+        self.assertEqual(got, [first])
+        self.assertEqual(pool.stats()['creates'], 1)
+
+    def test_failed_connect_frees_its_place(self):
+        pool = ConnectionPool(lambda: 1 / 0, max_size=1, timeout=0)
+
+        with self.assertRaises(ZeroDivisionError):
+            pool.checkout()
+        self.assertEqual(pool.stats()['size'], 0)
+
+
+class DirtyFieldsTests(TestCase):
+
+    def setUp(self):
+        self.game_round = GameRound.objects.create(round_number=1)
+        self.movie = Movie.objects.create(name='Alien', game_round=self.game_round)
+        self.movie = Movie.objects.get(pk=self.movie.pk)
+
+    def test_unchanged_save_is_skipped(self):
+        with self.assertNumQueries(0):
+            self.movie.save()
+        self.assertEqual(self.movie.get_dirty_fields(), [])
+
+    def test_only_changed_fields_are_written(self):
+        self.movie.year = 1979
+        self.assertEqual(self.movie.get_dirty_fields(), ['year'])
+
+        with connection.execute_wrapper(self._record_sql):
+            self.movie.save()
+        movie_updates = [sql for sql in self.sql if sql.startswith('UPDATE "movies_movie"')]
+        self.assertEqual(len(movie_updates), 1)
+        self.assertIn('"year"', movie_updates[0])
+        self.assertNotIn('"name"', movie_updates[0])
+        self.assertEqual(self.movie.get_dirty_fields(), [])
+
+    def test_renaming_updates_the_slug(self):
+        self.movie.name = 'Aliens'
+        self.movie.save()
+        self.assertEqual(Movie.objects.get(pk=self.movie.pk).slug, 'aliens')
+
+    def test_unchanged_round_keeps_its_version(self):
+        game_round = GameRound.objects.get(pk=self.game_round.pk)
+        version = game_round.data_version
+        game_round.save()
+        self.assertEqual(GameRound.objects.get(pk=game_round.pk).data_version, version)
+
+        game_round.round_completed = True
+        with CaptureQueriesContext(connection) as queries:
+            game_round.save()
+        self.assertFalse([query for query in queries if query['sql'].startswith('SELECT')])
+        self.assertEqual(GameRound.objects.get(pk=game_round.pk).data_version, version + 1)
+        self.assertEqual(game_round.get_dirty_fields(), [])
+        # read back when asked for
+        self.assertEqual(game_round.data_version, version + 1)
+        self.assertEqual(game_round.get_dirty_fields(), [])
+
+    def _record_sql(self, execute, sql, params, many, context):
+        self.sql = getattr(self, 'sql', []) + [sql]
+        return execute(sql, params, many, context)
+
+
+class PresenceTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.first = User.objects.create_user('first')
+        self.second = User.objects.create_user('second')
+
+    def test_every_ping_counts(self):
+        record_ping(self.first.id)
+        record_ping(self.second.id)
+
+        self.assertEqual([goer['uid'] for goer in party_goers()], [self.first.id, self.second.id])
+
+    def test_new_member_shows_up(self):
+        record_ping(self.first.id)
+        party_goers()   # caches the member list
+        newcomer = User.objects.create_user('newcomer')
+        record_ping(newcomer.id)
+
+        self.assertIn(newcomer.id, [goer['uid'] for goer in party_goers()])
+
+    def test_ping_costs_no_queries(self):
+        record_ping(self.first.id)     # the first ping takes the flush lock and flushes; the next ones don't
+        with self.assertNumQueries(0):
+            record_ping(self.second.id)
+
+    def test_ping_costs_no_queries_on_the_production_cache(self):
+        from mmg.settings import production
+        self.assertNotIn('.db.', production.CACHES['default']['BACKEND'])
+
+        with override_settings(CACHES=production.CACHES):
+            try:
+                cache.set('presence-test', True)
+            except Exception as error:
+                self.skipTest('production cache not reachable here: {!r}'.format(error))
+            self.addCleanup(cache.clear)
+
+            record_ping(self.first.id)
+            with self.assertNumQueries(0):
+                record_ping(self.second.id)
+
+
+class RosterTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.game_round = GameRound.objects.create(round_number=1, active_round=True)
+        self.member = User.objects.create_user('member')
+        self.game_round.participants.add(self.member)
+
+    def test_guess_is_checked_against_the_database(self):
+        latecomer = User.objects.create_user('latecomer')
+        self.game_round.participants.add(latecomer)
+        # as another worker process's cache would have it, from before latecomer joined
+        cache.set(ROSTER_CACHE_KEY.format(self.game_round.id), [], 60)
+
+        form = UserMovieDetailForm({'is_user_movie': False, 'seen_previously': False, 'heard_of': False,
+                                    'user_guess': latecomer.id, 'star_rating': 3}, current_user=self.member)
+        self.assertTrue(form.is_valid(), form.errors)
+
+    def test_shown_form_uses_the_roster(self):
+        UserMovieDetailForm(current_user=self.member)     # caches the round state and roster
+        other = User.objects.create_user('other')
+        self.game_round.participants.add(other)
+
+        with self.assertNumQueries(1):  # the roster, rebuilt after the participants changed
+            form = UserMovieDetailForm(current_user=self.member)
+            choices = [choice[0] for choice in form.fields['user_guess'].choices]
+        self.assertEqual(choices, ['', other.id])
+
+
+class PartyEndpointTests(TestCase):
+    """the async party views, through Django's async request path"""
+
+    def setUp(self):
+        cache.clear()
+        self.admin = User.objects.create_user('admin')
+        self.admin.userprofile.is_mmg_admin = True
+        self.admin.userprofile.save()
+        self.guest = User.objects.create_user('guest')
+        self.admin_client = self.logged_in(self.admin)
+        self.guest_client = self.logged_in(self.guest)
+
+    def logged_in(self, user):
+        login = Client()
+        login.force_login(user)
+        client = AsyncClient()
+        client.cookies = login.cookies
+        return client
+
+    async def test_state(self):
+        response = await self.guest_client.get(reverse('movies:resultspartystate'))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['idx'], 0)
+        self.assertIn(self.guest.id, [user['uid'] for user in response.json()['users']])
+
+    async def test_increment_moves_the_long_poll_on(self):
+        guest = self.guest_client
+        admin = self.admin_client
+        version = (await guest.get(reverse('movies:resultspartystate'))).json()['version']
+
+        response = await admin.get(reverse('movies:resultspartyincrement', args=[3]))
+        self.assertEqual(response.status_code, 200)
+
+        with mock.patch.object(party_async, 'PARTY_LONG_POLL_SECONDS', 5):
+            data = (await guest.get(reverse('movies:resultspartystate'), {'version': version})).json()
+        self.assertEqual(data['idx'], 3)
+        self.assertNotEqual(data['version'], version)
+
+    async def test_long_poll_times_out_unchanged(self):
+        guest = self.guest_client
+        version = (await guest.get(reverse('movies:resultspartystate'))).json()['version']
+
+        with mock.patch.object(party_async, 'PARTY_LONG_POLL_SECONDS', 0.1):
+            data = (await guest.get(reverse('movies:resultspartystate'), {'version': version})).json()
+        self.assertEqual(data['version'], version)
+
+    async def test_only_admins_increment(self):
+        response = await self.guest_client.get(reverse('movies:resultspartyincrement', args=[3]))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(await sync_to_async(PartyState.objects.filter(idx=3).exists)())
+
+    async def test_presence(self):
+        await self.admin_client.get(reverse('movies:resultspartypresence'))
+        response = await self.guest_client.get(reverse('movies:resultspartypresence'))
+
+        self.assertEqual(sorted(user['uid'] for user in response.json()['users']), [self.admin.id, self.guest.id])
+
+    async def test_anonymous(self):
+        response = await AsyncClient().get(reverse('movies:resultspartystate'))
+        self.assertEqual(response.status_code, 404)
+
+
+@unittest.skipIf(django.VERSION < (4, 2), 'StreamingHttpResponse takes async iterators from Django 4.2')
+class PartyEventStreamTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        login = Client()
+        login.force_login(User.objects.create_user('guest'))
+        self.client = AsyncClient()
+        self.client.cookies = login.cookies
+
+    async def test_first_event_within_a_tick(self):
+        started = time.monotonic()
+        response = await self.client.get(reverse('movies:resultspartyevents'))
+        stream = response.streaming_content.__aiter__()
+        try:
+            self.assertTrue((await stream.__anext__()).startswith(b'retry:'))
+            event = await asyncio.wait_for(stream.__anext__(), PARTY_STREAM_TICK_SECONDS)
+        finally:
+            await stream.aclose()
+
+        self.assertLess(time.monotonic() - started, PARTY_STREAM_TICK_SECONDS)
+        self.assertEqual(json.loads(event.decode().split('data: ', 1)[1])['idx'], 0)
+
+
+class ServerTimingTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('member')
+        self.client.force_login(self.user)
+
+    def db_queries(self, response):
+        header = response['Server-Timing']
+        for metric in ('app', 'db', 'template', 'total'):
+            self.assertIn(metric + ';dur=', header)
+        return int(re.search(r'db;dur=[0-9.]+;desc="(\d+) queries"', header).group(1))
+
+    def test_sync_request(self):
+        response = self.client.get(reverse('movies:index'))
+        self.assertGreater(self.db_queries(response), 0)
+
+    async def test_async_request_counts_its_queries(self):
+        client = AsyncClient()
+        client.cookies = self.client.cookies
+        # at least the session and the user, loaded on sync_to_async's threads
+        response = await client.get(reverse('movies:resultspartypresence'))
+        self.assertGreater(self.db_queries(response), 0)
+
+    def test_logged_not_printed(self):
+        with mock.patch('builtins.print') as printed, self.assertLogs('movies.middleware', 'INFO') as logs:
+            response = self.client.get(reverse('movies:index'))
+
+        printed.assert_not_called()
+        record = logs.records[0]
+        self.assertTrue(record.getMessage().startswith('server_timing view=movies:index method=GET status=200 '))
+        self.assertEqual(record.server_timing['db_queries'], self.db_queries(response))
+
+    def test_queries_counted_from_several_threads(self):
+        timer = RequestTimer()
+        execute = lambda sql, params, many, context: None
+
+        def run_queries():
+            for _ in range(2000):
+                timer(execute, 'SELECT 1', None, False, None)
+
+        threads = [threading.Thread(target=run_queries) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(timer.db_queries, 16000)
+
+
+def _make_round(round_number, members):
+    """a round ready to score: members participants, a movie each, and everyone's details for every movie"""
+    game_round = GameRound.objects.create(round_number=round_number)
+    users = [User.objects.create(username='round_{}_member_{}'.format(round_number, index)) for index in range(members)]
+    for user in users:
+        UserRoundDetail.objects.create(user=user, game_round=game_round)
+        movie = Movie.objects.create(name='Movie {}-{}'.format(round_number, user.id), game_round=game_round)
+        for other in users:
+            UserMovieDetail.objects.create(user=other, movie=movie, is_user_movie=other == user,
+                user_guess=None if other == user else user, star_rating=1 + other.id % 5)
+    return game_round
+
+
+class RoundProgressTests(TestCase):
+    """RoundProgress keeps who has submitted what, sized by the round rather than by the highest user id"""
+
+    def test_kept_current_by_the_signals(self):
+        game_round = _make_round(1, 3)
+        movies = list(game_round.movies_from_round.all())
+        user_ids = list(UserRoundDetail.objects.filter(game_round=game_round).values_list('user_id', flat=True))
+
+        progress = RoundProgress.objects.for_round(game_round.id)
+        self.assertEqual(progress.details_received, 9)
+        self.assertEqual(progress.details_needed([movie.id for movie in movies], user_ids), 0)
+
+        UserMovieDetail.objects.filter(movie=movies[0], user_id=user_ids[1]).first().delete()
+        progress = RoundProgress.objects.for_round(game_round.id)
+        self.assertFalse(progress.has_submitted(movies[0].id, user_ids[1]))
+        self.assertEqual(progress.details_needed([movie.id for movie in movies], user_ids), 1)
+        # the signals' incremental updates agree with working it out from scratch
+        self.assertEqual(progress.submitted, RoundProgress.objects.rebuild(game_round.id).submitted)
+
+    def test_large_user_ids(self):
+        game_round = GameRound.objects.create(round_number=1)
+        progress = RoundProgress.objects.create(game_round=game_round)
+        progress.set_submitted(7, 10 ** 9)
+        progress.set_submitted(7, 3)
+
+        self.assertEqual(progress.submitted, {'7': [3, 10 ** 9]})
+        self.assertTrue(progress.has_submitted(7, 10 ** 9))
+        self.assertEqual(progress.details_needed([7, 8], [3, 10 ** 9, 12]), 4)
+
+
+def _completed_round(round_number, members):
+    """_make_round(), then concluded the way the pages need it: choosers set, round completed, details finalized"""
+    game_round = _make_round(round_number, members)
+    for detail in UserMovieDetail.objects.filter(movie__game_round=game_round, is_user_movie=True):
+        Movie.objects.filter(pk=detail.movie_id).update(chosen_by=detail.user_id)
+    UserRoundDetail.objects.filter(game_round=game_round).update(finalized_by_admin=True)
+    GameRound.objects.filter(pk=game_round.pk).update(round_completed=True)
+    return GameRound.objects.get(pk=game_round.pk)
+
+
+class ScoreRoundQueryTests(TestCase):
+    """score_round() runs the same number of queries however many take part"""
+
+    def test_query_count_does_not_grow_with_participants(self):
+        small = _make_round(1, 2)
+        large = _make_round(2, 8)
+
+        with self.assertNumQueries(3):
+            small_result = score_round(small)
+        with self.assertNumQueries(3):
+            large_result = score_round(large)
+
+        self.assertTrue(small_result.is_valid and large_result.is_valid)
+        self.assertEqual(len(small_result.participants), 2)
+        self.assertEqual(len(large_result.participants), 8)
+
+
+class CommitRoundResultTests(TestCase):
+
+    def setUp(self):
+        for rank_int in range(1, 5):
+            RoundRank.objects.create(rank_int=rank_int, rank_string='Rank {}'.format(rank_int))
+        self.game_round = _make_round(1, 4)
+        self.round_result = score_round(self.game_round)
+
+    def test_writes_in_three_statements(self):
+        with CaptureQueriesContext(connection) as queries:
+            report = commit_round_result(self.round_result)
+
+        writes = [query['sql'].split()[0].upper() for query in queries
+                  if query['sql'].split()[0].upper() in ('INSERT', 'UPDATE', 'DELETE')]
+        self.assertEqual(writes, ['DELETE', 'INSERT', 'UPDATE'])
+        self.assertEqual(report.details_updated, 4)
+        self.assertEqual(PointsEarned.objects.filter(user_round_ob__game_round=self.game_round).count(), report.points_written)
+
+    def test_failed_write_rolls_everything_back(self):
+        commit_round_result(self.round_result)
+        points_before = list(PointsEarned.objects.order_by('pk').values_list('pk', flat=True))
+
+        # the last of the three statements fails, after the DELETE and INSERT have run
+        with mock.patch.object(UserRoundDetail.objects, 'bulk_update', side_effect=IntegrityError('boom')):
+            with self.assertRaises(IntegrityError):
+                commit_round_result(self.round_result)
+
+        self.assertEqual(list(PointsEarned.objects.order_by('pk').values_list('pk', flat=True)), points_before)
+        self.assertEqual(UserRoundDetail.objects.filter(game_round=self.game_round, finalized_by_admin=True).count(), 4)
+
+    def test_nothing_written_when_the_first_commit_fails(self):
+        with mock.patch.object(UserRoundDetail.objects, 'bulk_update', side_effect=IntegrityError('boom')):
+            with self.assertRaises(IntegrityError):
+                commit_round_result(self.round_result)
+
+        self.assertFalse(PointsEarned.objects.exists())
+        self.assertFalse(UserRoundDetail.objects.filter(finalized_by_admin=True).exists())
+
+
+class MediaTestCase(SimpleTestCase):
+    """MEDIA_ROOT and the manifest in a temporary folder"""
+
+    def setUp(self):
+        folder = tempfile.TemporaryDirectory()
+        self.addCleanup(folder.cleanup)
+        self.media_root = os.path.join(folder.name, 'media')
+        self.manifest_path = os.path.join(folder.name, 'media_manifest.json')
+        os.makedirs(os.path.join(self.media_root, 'user'))
+
+        settings_override = override_settings(MEDIA_ROOT=self.media_root, MEDIA_MANIFEST_PATH=self.manifest_path)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        cache.clear()
+        check_manifest()
+
+
+class MediaManifestTests(MediaTestCase):
+
+    def upload(self, user_id):
+        with open(os.path.join(self.media_root, 'user', str(user_id)), 'wb') as avatar:
+            avatar.write(b'avatar %d' % user_id)
+        return 'user/{}'.format(user_id)
+
+    def test_saved_outside_media_root(self):
+        with open(os.path.join(self.media_root, MEDIA_MANIFEST_FILENAME), 'w') as old_manifest:
+            old_manifest.write('{}')
+        record_asset(self.upload(1))
+        self.assertTrue(os.path.isfile(self.manifest_path))
+
+        rebuild_manifest()
+        self.assertFalse(os.path.exists(os.path.join(self.media_root, MEDIA_MANIFEST_FILENAME)))
+        self.assertEqual(sorted(os.listdir(self.media_root)), ['user'])
+
+    def test_concurrent_uploads_all_recorded(self):
+        paths = [self.upload(user_id) for user_id in range(1, 21)]
+        threads = [threading.Thread(target=record_asset, args=(path,)) for path in paths]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        cache.clear()
+        for path in paths:
+            self.assertIsNotNone(get_asset(path), path)
+        # no temporary files left behind
+        self.assertFalse([name for name in os.listdir(os.path.dirname(self.manifest_path)) if name.endswith('.tmp')])
+
+    def test_lookups_come_from_memory(self):
+        paths = [self.upload(user_id) for user_id in range(1, 4)]
+        media_manifest.update_manifest({path: media_manifest.file_entry(os.path.join(self.media_root, path)) for path in paths})
+
+        check_manifest()    # as at the start of a request
+        with mock.patch.object(cache, 'get', wraps=cache.get) as cache_get:
+            for movie_id in range(50):
+                poster_images(movie_id)
+            for path in paths:
+                self.assertIsNotNone(get_asset(path))
+        # one look at the stamp for the whole request, and no copies of the manifest out of the cache
+        self.assertEqual(cache_get.call_count, 1)
+
+    def test_sees_another_process_write(self):
+        record_asset(self.upload(1))
+        self.assertIsNone(get_asset('user/2'))
+
+        # another process records an upload: a new file, and a new stamp in the shared cache
+        manifest = dict(media_manifest._read_manifest())
+        manifest['user/2'] = media_manifest.file_entry(os.path.join(self.media_root, self.upload(2)))
+        with open(self.manifest_path + '.new', 'w') as manifest_file:
+            json.dump(manifest, manifest_file)
+        os.replace(self.manifest_path + '.new', self.manifest_path)
+        cache.set(media_manifest.MEDIA_MANIFEST_STAMP_KEY, media_manifest._file_stamp())
+
+        check_manifest()
+        self.assertIsNotNone(get_asset('user/2'))
+
+
+@unittest.skipIf(Image is None, 'Pillow is not installed')
+class PosterVariantTests(MediaTestCase):
+
+    def upload_poster(self, movie_id, color):
+        os.makedirs(os.path.join(self.media_root, 'movie'), exist_ok=True)
+        Image.new('RGB', (600, 900), color).save(os.path.join(self.media_root, 'movie', '{}.jpg'.format(movie_id)))
+        return make_poster_variants(movie_id)
+
+    def variant_files(self):
+        return {'movie/variants/' + filename for filename in os.listdir(os.path.join(self.media_root, 'movie', 'variants'))}
+
+    def test_replaced_variants_kept_until_swept(self):
+        with mock.patch('builtins.print') as printed, self.assertLogs('movies.image_variants', 'INFO'):
+            old = self.upload_poster(1, 'red')
+        printed.assert_not_called()
+        other_movie = self.upload_poster(2, 'green')
+        old_files = {path for formats in old.values() for path in formats.values()}
+
+        new = self.upload_poster(1, 'blue')
+        manifest = media_manifest.get_manifest()
+        self.assertEqual(manifest['movie/1.jpg']['variants'], new)
+        self.assertFalse(old_files & set(manifest))
+        # the old files are still there for pages that point at them...
+        self.assertTrue(old_files <= self.variant_files())
+        self.assertEqual(sweep_poster_variants(), [])
+
+        # ...until they've been unused for the grace period; nothing in the manifest is touched
+        self.assertEqual(set(sweep_poster_variants(grace_seconds=-1)), old_files)
+        in_use = {path for variants in (new, other_movie) for formats in variants.values() for path in formats.values()}
+        self.assertEqual(self.variant_files(), in_use)
+
+
+class MediaServingTests(MediaTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.data = bytes(range(256)) * 4
+        self.variant = 'movie/variants/1-grid-0123456789ab.jpg'
+        for relative_path in ('user/3', self.variant):
+            os.makedirs(os.path.dirname(os.path.join(self.media_root, relative_path)), exist_ok=True)
+            with open(os.path.join(self.media_root, relative_path), 'wb') as media_file:
+                media_file.write(self.data)
+            record_asset(relative_path)
+        self.entry = get_asset('user/3')
+
+    def get(self, path, **headers):
+        return media_serving.serve_media(RequestFactory().get('/media/' + path, **headers), path)
+
+    def body(self, response):
+        return b''.join(response.streaming_content) if response.streaming else response.content
+
+    def test_whole_file(self):
+        response = self.get('user/3')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.body(response), self.data)
+        self.assertEqual(response['ETag'], '"{}"'.format(self.entry['hash']))
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+
+    def test_not_modified(self):
+        response = self.get('user/3', HTTP_IF_NONE_MATCH='"{}"'.format(self.entry['hash']))
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+
+    def test_byte_range(self):
+        response = self.get('user/3', HTTP_RANGE='bytes=10-19')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Range'], 'bytes 10-19/1024')
+        self.assertEqual(response.content, self.data[10:20])
+
+        response = self.get('user/3', HTTP_RANGE='bytes=-24')
+        self.assertEqual(response['Content-Range'], 'bytes 1000-1023/1024')
+        self.assertEqual(response.content, self.data[-24:])
+
+    def test_unsatisfiable_range(self):
+        response = self.get('user/3', HTTP_RANGE='bytes=2000-')
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response['Content-Range'], 'bytes */1024')
+
+    def test_if_range_mismatch_sends_everything(self):
+        response = self.get('user/3', HTTP_RANGE='bytes=10-19', HTTP_IF_RANGE='"something-else"')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.body(response), self.data)
+
+        response = self.get('user/3', HTTP_RANGE='bytes=10-19', HTTP_IF_RANGE='"{}"'.format(self.entry['hash']))
+        self.assertEqual(response.status_code, 206)
+
+    def test_immutable_only_for_hashed_urls(self):
+        self.assertEqual(self.get(self.variant)['Cache-Control'], media_serving.IMMUTABLE_CACHE_CONTROL)
+        self.assertEqual(media_serving.serve_media(
+            RequestFactory().get('/media/user/3', {'v': self.entry['hash']}), 'user/3')['Cache-Control'],
+            media_serving.IMMUTABLE_CACHE_CONTROL)
+
+        for response in (self.get('user/3'), media_serving.serve_media(RequestFactory().get('/media/user/3', {'v': 'old'}), 'user/3')):
+            self.assertEqual(response['Cache-Control'], 'public, max-age={}'.format(media_serving.MEDIA_MAX_AGE_SECONDS))
+
+    def test_sendfile(self):
+        with mock.patch.object(media_serving, 'MEDIA_SENDFILE', 'x-accel-redirect'):
+            response = self.get('user/3', HTTP_RANGE='bytes=10-19')
+        self.assertEqual(response.status_code, 200)     # the proxy deals with the range
+        self.assertEqual(response['X-Accel-Redirect'], media_serving.MEDIA_ACCEL_REDIRECT_PREFIX + 'user/3')
+        self.assertEqual(response.content, b'')
+        self.assertEqual(response['ETag'], '"{}"'.format(self.entry['hash']))
+
+        with mock.patch.object(media_serving, 'MEDIA_SENDFILE', 'x-sendfile'):
+            response = self.get('user/3')
+        self.assertEqual(response['X-Sendfile'], os.path.join(self.media_root, 'user/3'))
+
+
+class OverviewPaginationTests(TestCase):
+    """keyset pagination gives the same movies, in the same order, as one big query, whatever ties there are"""
+
+    def setUp(self):
+        finished = GameRound.objects.create(round_number=1, round_completed=True)
+        in_progress = GameRound.objects.create(round_number=2)
+        first = User.objects.create_user('first')
+        second = User.objects.create_user('second')
+
+        # lots of ties on every sort key: same round, name, chooser (or none), rating and date (or none)
+        movies = [
+            (finished, 'Same Name', first, '3.5', date(2020, 1, 1)),
+            (finished, 'Same Name', first, '3.5', date(2020, 1, 1)),
+            (finished, 'Other', first, '4.0', None),
+            (finished, 'Other', second, '3.5', None),
+            (finished, 'Same Name', second, '4.0', date(2020, 1, 1)),
+            (finished, 'Zed', None, '0.0', date(2020, 2, 1)),
+            (finished, 'Zed', None, '0.0', None),
+            (in_progress, 'Same Name', first, '5.0', date(2020, 3, 1)),
+            (in_progress, 'Other', second, '3.5', date(2020, 1, 1)),
+            (in_progress, 'Zed', None, '0.0', None),
+            (in_progress, 'Other', first, '3.5', date(2020, 3, 1)),
+        ]
+        for game_round, name, chosen_by, rating, watched in movies:
+            movie = Movie.objects.create(game_round=game_round, name=name, chosen_by=chosen_by, date_watched=watched)
+            Movie.objects.filter(pk=movie.pk).update(rating_average=Decimal(rating))
+
+    def test_pages_match_the_full_ordering(self):
+        for sort_by, sort_mode in SORT_MODES.items():
+            queryset, ordering = sort_mode()
+            expected = list(queryset.order_by(*ordering).values_list('id', flat=True))
+
+            shown, after = [], None
+            for _ in range(len(expected)):
+                page, after = overview_page(sort_by, after=after, page_size=2)
+                self.assertLessEqual(len(page), 2)
+                shown += [movie.id for movie in page]
+                if after is None:
+                    break
+
+            self.assertIsNone(after, sort_by)
+            self.assertEqual(shown, expected, sort_by)
+            self.assertEqual(len(set(shown)), Movie.objects.count(), sort_by)
+
+
+class StandingsTests(TestCase):
+
+    def setUp(self):
+        self.users = {name: User.objects.create_user(name) for name in ('ann', 'bob', 'cat', 'dan')}
+        User.objects.create_user('mmg_admin')
+        # dan has never taken part in a round
+        self.play_round(1, {'ann': (True, 4), 'bob': (False, 4), 'cat': (False, 2)})
+        self.play_round(2, {'ann': (False, 0), 'bob': (True, 0), 'cat': (False, 6)})
+
+    def play_round(self, round_number, results):
+        game_round = GameRound.objects.create(round_number=round_number, round_completed=True)
+        for name, (won, guess_points) in results.items():
+            UserRoundDetail.objects.create(user=self.users[name], game_round=game_round, winner_bool=won,
+                                           correct_guess_points=guess_points)
+
+    def ranking(self, standings, category):
+        return [(row['username'], row['value'], row['rank'], row['movement']) for row in standings['categories'][category]]
+
+    def test_ranks_ties_and_movement(self):
+        self.assertEqual(rebuild_all_standings(), 2)
+
+        after_first = get_standings(1).standings
+        self.assertEqual(self.ranking(after_first, 'correct_guesses'),
+                         [('ann', 2, 1, None), ('bob', 2, 1, None), ('cat', 1, 3, None), ('dan', 0, 4, None)])
+
+        after_second = get_standings().standings
+        self.assertEqual(after_second['round_number'], 2)
+        self.assertEqual(after_second['previous_round_number'], 1)
+        self.assertEqual(after_second['completed_rounds'], 2)
+        # ties share a rank, and the next one skips past them; movement is since round 1
+        self.assertEqual(self.ranking(after_second, 'rounds_won'),
+                         [('ann', 1, 1, 0), ('bob', 1, 1, 1), ('cat', 0, 3, -1), ('dan', 0, 3, -1)])
+        self.assertEqual(self.ranking(after_second, 'correct_guesses'),
+                         [('cat', 4, 1, 2), ('ann', 2, 2, -1), ('bob', 2, 2, -1), ('dan', 0, 4, 0)])
+        self.assertEqual(get_standings().most_guess_points_id, self.users['cat'].id)
+
+    def test_members_page_does_not_write_standings(self):
+        self.client.force_login(self.users['ann'])
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('movies:members'))
+
+        self.assertContains(response, "The rankings haven't been worked out yet")
+        self.assertFalse(AllTimeScore.objects.exists())
+        self.assertFalse([query['sql'] for query in queries if 'movies_alltimescore' in query['sql']
+                          and not query['sql'].startswith('SELECT')])
+
+        rebuild_all_standings()
+        response = self.client.get(reverse('movies:members'))
+        self.assertContains(response, 'Standings after Round 2')
+        self.assertNotContains(response, 'mmg_admin')
+
+
+class ConditionalGetTests(TestCase):
+    """the archive pages' ETags: per viewer, 304 when nothing changed, new when the round's data does"""
+
+    def setUp(self):
+        cache.clear()
+        self.game_round = _make_round(1, 3)
+        GameRound.objects.filter(pk=self.game_round.pk).update(round_completed=True)
+        GameRound.objects.create(round_number=2, active_round=True)
+        PartyState.objects.create(idx=0, next_time=timezone.now())
+        self.members = list(User.objects.filter(related_game_rounds=self.game_round).order_by('id'))
+        self.movie = Movie.objects.filter(game_round=self.game_round).order_by('id').first()
+
+        self.clients = []
+        for member in self.members[:2]:
+            client = Client()
+            client.force_login(member)
+            self.clients.append(client)
+
+    def urls(self):
+        return [reverse('movies:old_round_results', kwargs={'pk': self.game_round.pk}),
+                reverse('movies:old_movie', kwargs={'pk': self.movie.pk, 'slug': self.movie.slug}),
+                reverse('movies:resultspartyarchive', kwargs={'pk': 1})]
+
+    def test_etag_per_viewer_and_304(self):
+        for url in self.urls():
+            first, second = (client.get(url) for client in self.clients)
+            self.assertEqual((first.status_code, second.status_code), (200, 200), url)
+            self.assertEqual(first['Cache-Control'], 'private, no-cache', url)
+            self.assertNotEqual(first['ETag'], second['ETag'], url)
+
+            not_modified = self.clients[0].get(url, HTTP_IF_NONE_MATCH=first['ETag'])
+            self.assertEqual(not_modified.status_code, 304, url)
+            self.assertEqual(not_modified['Cache-Control'], 'private, no-cache', url)
+            # someone else's ETag is no good
+            self.assertEqual(self.clients[0].get(url, HTTP_IF_NONE_MATCH=second['ETag']).status_code, 200, url)
+
+    def test_data_version_bump_changes_etag(self):
+        etags = [self.clients[0].get(url)['ETag'] for url in self.urls()]
+
+        # an admin corrects one of the round's details
+        detail = UserMovieDetail.objects.filter(movie=self.movie).exclude(user=self.movie.chosen_by).first()
+        detail.star_rating = 5 if detail.star_rating != 5 else 4
+        detail.save()
+
+        for url, etag in zip(self.urls(), etags):
+            response = self.clients[0].get(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, 200, url)
+            self.assertNotEqual(response['ETag'], etag, url)
+
+    def test_party_index_changes_party_etag(self):
+        url = reverse('movies:resultspartyarchive', kwargs={'pk': 1})
+        etag = self.clients[0].get(url)['ETag']
+        set_party_index(1, timezone.now())
+
+        response = self.clients[0].get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+
+class RatingAggregateTests(TestCase):
+    """the stored rating aggregates give the same averages as the AVG() query the properties used to run"""
+
+    def old_average(self, movie, require_completed=True):
+        # Movie.average_rating / average_rating_incomplete as they were
+        average = UserMovieDetail.objects.filter(movie=movie).aggregate(avg_rating=Avg('star_rating'))['avg_rating']
+        if require_completed and not movie.game_round.round_completed:
+            return 0.0
+        return round(average, 1) if average else 0.0
+
+    def test_same_as_the_avg_query(self):
+        finished = GameRound.objects.create(round_number=1, round_completed=True)
+        in_progress = GameRound.objects.create(round_number=2)
+        users = [User.objects.create_user('rater_{}'.format(index)) for index in range(4)]
+
+        ratings = {'none': [], 'one': [4], 'thirds': [1, 2, 2], 'halves': [4, 5], 'quarters': [1, 2, 2, 2], 'all': [5, 5, 1, 3]}
+        movies = []
+        for game_round in (finished, in_progress):
+            for name, stars in ratings.items():
+                movie = Movie.objects.create(name='{} {}'.format(name, game_round.round_number), game_round=game_round)
+                for user, star_rating in zip(users, stars):
+                    UserMovieDetail.objects.create(user=user, movie=movie, star_rating=star_rating)
+                movies.append(movie)
+
+        # one rating changed and one removed afterwards, to go through the update and delete signals too
+        changed = UserMovieDetail.objects.get(movie=movies[-1], user=users[0])
+        changed.star_rating = 2
+        changed.save()
+        UserMovieDetail.objects.filter(movie=movies[-2], user=users[0]).first().delete()
+
+        for movie in Movie.objects.select_related('game_round'):
+            self.assertEqual(movie.average_rating, self.old_average(movie), movie.name)
+            self.assertEqual(movie.average_rating_incomplete, self.old_average(movie, require_completed=False), movie.name)
+            stars = list(UserMovieDetail.objects.filter(movie=movie).values_list('star_rating', flat=True))
+            self.assertEqual(movie.rating_count, len(stars))
+            self.assertEqual(movie.rating_histogram, {star: stars.count(star) for star in range(1, 6)})
+
+
+class ProfileTotalsTests(TestCase):
+    """rebuild_all_totals() and add_round_totals() agree with the old per-profile loop, update_all_data()"""
+
+    def setUp(self):
+        self.users = [User.objects.create_user('player_{}'.format(index)) for index in range(4)]
+        User.objects.create_user('never_played')
+
+        self.completed = []
+        for round_number in range(1, 4):
+            game_round = GameRound.objects.create(round_number=round_number, round_completed=True)
+            self.completed.append(game_round)
+            for index, user in enumerate(self.users[:3 + round_number % 2]):
+                UserRoundDetail.objects.create(user=user, game_round=game_round, winner_bool=index == round_number % 3,
+                    correct_guess_points=2 * ((index + round_number) % 3), known_movie_points=index + round_number,
+                    unseen_movie_points=round_number, liked_movie_points=2 * index, disliked_movie_points=2 * (index % 2))
+
+        # a round still in progress counts for nothing
+        in_progress = GameRound.objects.create(round_number=4)
+        for user in self.users:
+            UserRoundDetail.objects.create(user=user, game_round=in_progress, winner_bool=True, correct_guess_points=10,
+                known_movie_points=10, unseen_movie_points=10, liked_movie_points=10, disliked_movie_points=10)
+
+    def totals(self):
+        fields = list(PROFILE_TOTAL_FIELDS.values()) + ['rounds_won']
+        return {row[0]: row[1:] for row in UserProfile.objects.values_list('user_id', *fields)}
+
+    def reset(self):
+        UserProfile.objects.update(rounds_won=7, **{field: 7 for field in PROFILE_TOTAL_FIELDS.values()})
+
+    def old_totals(self):
+        self.reset()
+        for profile in UserProfile.objects.select_related('user'):
+            profile.update_all_data()
+        return self.totals()
+
+    def test_rebuild_matches_the_loop(self):
+        expected = self.old_totals()
+        self.assertTrue(any(any(values) for values in expected.values()))
+
+        self.reset()
+        self.assertEqual(UserProfile.objects.rebuild_all_totals(), len(expected))
+        self.assertEqual(self.totals(), expected)
+
+    def test_adding_each_round_matches_the_loop(self):
+        expected = self.old_totals()
+
+        UserProfile.objects.update(rounds_won=0, **{field: 0 for field in PROFILE_TOTAL_FIELDS.values()})
+        for game_round in self.completed:
+            UserProfile.objects.add_round_totals(game_round)
+        self.assertEqual(self.totals(), expected)
+
+
+class PartyPayloadTests(TestCase):
+    """the stored party document is rebuilt once the round's data changes, and its ETag with it"""
+
+    def setUp(self):
+        self.game_round = _completed_round(1, 3)
+        self.detail = UserMovieDetail.objects.filter(movie__game_round=self.game_round, is_user_movie=False).order_by('pk').first()
+        self.client.force_login(self.detail.user)
+        self.url = reverse('movies:resultspartypayload', kwargs={'pk': 1})
+
+    def ratings(self, payload):
+        return {(guess['user_id'], int(movie_id)): guess['star_rating']
+                for movie_id, guesses in payload.document['all_guesses'].items() for guess in guesses}
+
+    def test_rebuilt_after_an_edit(self):
+        first = get_party_payload(self.game_round)
+        self.assertEqual(get_party_payload(GameRound.objects.get(pk=self.game_round.pk)).version, first.version)
+
+        # an admin corrects a rating after the round was concluded
+        self.detail.star_rating = 5 if self.detail.star_rating != 5 else 1
+        self.detail.save()
+
+        second = get_party_payload(GameRound.objects.get(pk=self.game_round.pk))
+        self.assertEqual(second.version, first.version + 1)
+        self.assertEqual(self.ratings(second)[(self.detail.user_id, self.detail.movie_id)], self.detail.star_rating)
+
+    def test_etag_changes_after_an_edit(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+
+        self.detail.comments = 'changed my mind'
+        self.detail.save()
+
+        response_after = self.client.get(self.url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response_after.status_code, 200)
+        self.assertNotEqual(response_after['ETag'], response['ETag'])
+        self.assertIn('changed my mind', response_after.content.decode())
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=response_after['ETag']).status_code, 304)
+
+
+class RenderCacheTests(TestCase):
+    """the archive pages' {% cache %} fragments: kept per round data_version, and never for a round in progress"""
+
+    def setUp(self):
+        cache.clear()
+        self.game_round = _completed_round(1, 3)
+        GameRound.objects.create(round_number=2, active_round=True)
+        self.movie = Movie.objects.filter(game_round=self.game_round).order_by('pk').first()
+        self.client.force_login(User.objects.filter(related_game_rounds=self.game_round).first())
+
+    def data_version(self):
+        return GameRound.objects.filter(pk=self.game_round.pk).values_list('data_version', flat=True).get()
+
+    def test_round_fragment_follows_data_version(self):
+        url = reverse('movies:old_round_results', kwargs={'pk': self.game_round.pk})
+        self.client.get(url)
+        first_key = make_template_fragment_key('old_round_results', [self.game_round.pk, self.data_version()])
+        self.assertIsNotNone(cache.get(first_key))
+
+        self.movie.name = 'Renamed By The Admin'
+        self.movie.save()
+
+        self.assertContains(self.client.get(url), 'Renamed By The Admin')
+        self.assertIsNotNone(cache.get(make_template_fragment_key('old_round_results', [self.game_round.pk, self.data_version()])))
+        self.assertNotIn('Renamed By The Admin', cache.get(first_key))
+
+    def test_movie_fragment_follows_data_version(self):
+        url = reverse('movies:old_movie', kwargs={'pk': self.movie.pk, 'slug': self.movie.slug})
+        self.client.get(url)
+        self.assertIsNotNone(cache.get(make_template_fragment_key('old_movie', [self.movie.pk, self.data_version()])))
+
+        detail = UserMovieDetail.objects.filter(movie=self.movie, is_user_movie=False).first()
+        detail.comments = 'an admin added this'
+        detail.save()
+
+        self.assertContains(self.client.get(url), 'an admin added this')
+
+    def test_round_in_progress_not_cached(self):
+        GameRound.objects.filter(pk=self.game_round.pk).update(round_completed=False)
+        response = self.client.get(reverse('movies:old_round_results', kwargs={'pk': self.game_round.pk}))
+        self.assertEqual(response.status_code, 200)
+
+        self.assertIsNone(cache.get(make_template_fragment_key('old_round_results', [self.game_round.pk, self.data_version()])))
+
+
+class RevealTests(TestCase):
+    """a movie's reveal: cached per round data_version once the round is completed, NO_REVEAL before that"""
+
+    def setUp(self):
+        cache.clear()
+        self.game_round = _completed_round(1, 3)
+
+    def movie(self):
+        # loaded afresh each time, as a view would, so its round's data_version is current
+        return Movie.objects.select_related('game_round').filter(game_round=self.game_round).order_by('pk').first()
+
+    def test_cached_until_the_round_changes(self):
+        movie = self.movie()
+        first = get_reveal(movie)
+        with self.assertNumQueries(0):
+            self.assertEqual(get_reveal(movie), first)
+
+        detail = UserMovieDetail.objects.filter(movie=movie, is_user_movie=False).first()
+        detail.star_rating = 5 if detail.star_rating != 5 else 1
+        detail.comments = 'second thoughts'
+        detail.save()
+
+        second = get_reveal(self.movie())
+        self.assertIn({'username': detail.user.username, 'rating': detail.star_rating}, second['movie_ratings'])
+        self.assertIn({'username': detail.user.username, 'comment': 'second thoughts'}, second['movie_comments'])
+
+    def test_round_in_progress(self):
+        GameRound.objects.filter(pk=self.game_round.pk).update(round_completed=False)
+        movie = self.movie()
+
+        with mock.patch.object(cache, 'set') as cache_set:
+            self.assertIs(get_reveal(movie), NO_REVEAL)
+        cache_set.assert_not_called()
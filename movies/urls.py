@@ -1,13 +1,14 @@
 from django.urls import path, re_path
 from django.views.generic.base import RedirectView
-from django.views.static import serve
-from django.conf import settings
 
 from .views import (IndexPageView, MovieDetail, OldMovieDetail, MembersView, AddMovieView,
     process_details, update_details, UpdateDetailsView, TrophiesView, ResultsView, OldRoundView, 
     ConcludeRoundView, CommitUserRoundView, CommitGameRoundView, CreateRoundView, EditRoundView, 
     EditRoundImagesView, SettingsView, UserResultsView, update_points, UserProfileView, OverviewView, 
-    ResultsPartyView, ResultsPartyStateView, ResultsPartyStateIncrement)
+    ResultsPartyView, ResultsPartyStateView, ResultsPartyStateIncrement, ResultsPartyEventsView, ResultsPartyPayloadView,
+    ResultsPartyPresenceView)
+
+from .media_serving import serve_media
 
 app_name = 'movies'
 urlpatterns = [
@@ -17,6 +18,7 @@ urlpatterns = [
     path('movie/<int:pk>-<str:slug>/', MovieDetail.as_view(), name='movie'),
     path('old_movie/<int:pk><str:slug>/', OldMovieDetail.as_view(), name='old_movie'), # distinguish between a movie in current round & previous round
     path('members/', MembersView.as_view(), name='members'),
+    path('members/after/<int:round_number>/', MembersView.as_view(), name='standings'),
     path('add_movie/', AddMovieView.as_view(), name='add_movie'),
 
     path('overview/<str:sort_by>/', OverviewView.as_view(), name='overview'),
@@ -39,15 +41,18 @@ urlpatterns = [
     path('results/', ResultsView.as_view(), name='results'),
     path('resultsparty/<int:pk>', ResultsPartyView.as_view(), name='resultspartyarchive'),
     path('resultsparty/', ResultsPartyView.as_view(), name='resultsparty'),
+    path('resultsparty/<int:pk>/payload.json', ResultsPartyPayloadView.request, name='resultspartypayload'),
     path('resultspartystate.json', ResultsPartyStateView.request, name='resultspartystate'),
+    path('resultspartyevents/', ResultsPartyEventsView.request, name='resultspartyevents'),
     path('resultspartyincrement/<value>', ResultsPartyStateIncrement.request, name='resultspartyincrement'),
+    path('resultspartypresence.json', ResultsPartyPresenceView.request, name='resultspartypresence'),
     path('old_round_results/<int:pk>/', OldRoundView.as_view(), name='old_round_results'),
     path('settings/', SettingsView.as_view(), name='settings'),
     path('settings/update_points/', update_points, name='update_points'),
     path('user_results/<int:pk>/', UserResultsView.as_view(), name='user_results'),
     path('user_profile/<int:pk>/', UserProfileView.as_view(), name='user_profile'),
 
-    re_path(r'^media/(?P<path>.*)$', serve,{'document_root': settings.MEDIA_ROOT}), 
+    re_path(r'^media/(?P<path>.*)$', serve_media), # conditional requests, ranges, long-lived caching; see media_serving.py
 
 ]
 
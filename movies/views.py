@@ -6,20 +6,39 @@ from django.contrib.auth.decorators import login_required
 from django.views.generic import (TemplateView, ListView, DetailView, CreateView, UpdateView, DeleteView)
 from django.urls import reverse, reverse_lazy
 from django.utils import timezone
-from django.http import Http404, JsonResponse
+from django.http import Http404, HttpResponse, JsonResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
 from django.db.models import F, Max, Min, Avg, Count, Q
 from datetime import date, datetime, timedelta
 from django.conf import settings
-import time
 
-from .models import (Movie, GameRound, Trophy, UserProfile, UserMovieDetail, UserRoundDetail, TrophyProfileDetail, RoundRank, PointsEarned, PartyState, PartyGoers)
+from .models import (Movie, GameRound, Trophy, UserProfile, UserMovieDetail, UserRoundDetail, TrophyProfileDetail, RoundRank, PointsEarned, PartyState, PartyGoers, PartyPayload, RoundProgress)
 from .forms import AddMovieForm, UserMovieDetailForm
+from .scoring import get_point_values
+from .round_commit import commit_round_result
+from .party import publish_party_state, get_party_state
+from .round_state import get_round_state, get_active_round
+from .media_manifest import get_asset, poster_images, record_asset
+from .image_variants import make_poster_variants
+from .party_payload import get_party_payload, refresh_party_payload, party_payload_etag, int_keys, parse_date
+from .overview import overview_page
+from .standings import refresh_standings, rebuild_all_standings, get_standings, leaderboards
+from .scoring_draft import get_scoring_draft
+from .render_cache import lazy_context, round_cache_seconds
+from .reveal import get_reveal
+from .roster import get_roster
+from .conditional import ConditionalGetMixin, make_etag
+from .party_async import (abuild_party_state, arecord_ping, aparty_goers, aset_party_index, arequest_user_id,
+                          arequest_user_and_admin, aparty_event_stream)
 
 import os
 import re
 import json
 import traceback
 
+import django
+
 # Note: using get_user_model and settings.AUTH_USER_MODEL are unneccessary in this project, as you are
 # using the default django admin User model. You can rewrite the models and views to simply access User
 # and import it as done above.
@@ -33,15 +52,12 @@ def ShallWeParty(kwargs, pk='movie'):
     if not pk == 'movie':
         idx = None
     
-    # find the game round object is that has active = True (only one will ever have this value)
-    if GameRound.objects.filter(active_round=True).exists():
-        current_round = GameRound.objects.filter(active_round=True).last()
-        print("current_round.round_completed:" + str(current_round.round_completed))
-        if current_round.round_completed and (idx is None or idx == current_round.id):
-            # If the current active round is completed, but the party state is < the films involved, redirect to the Results Party for The Reveals.
-            round_films = Movie.objects.filter(game_round_id=current_round)
-            if PartyState.objects.count() == 0 or PartyState.objects.last().idx <= len(round_films):
-                return True
+    # cached snapshot of the active round; see round_state.py
+    state = get_round_state()
+    if state.round_completed and (idx is None or idx == state.active_round_id):
+        # If the current active round is completed, but the party state is < the films involved, redirect to the Results Party for The Reveals.
+        if state.party_pending:
+            return True
 
     return False
     
@@ -57,7 +73,7 @@ class IndexPageView(LoginRequiredMixin, ListView):
     # when you override get_queryset, you don't need to define model=Movie above
     def get_queryset(self):
 
-        self.current_round = GameRound.objects.filter(active_round=True).last() # self so we can pass it to the context in get_context_data without needing to query for it again
+        self.current_round = get_active_round() # self so we can pass it to the context in get_context_data without needing to query for it again
         queryset = Movie.objects.filter(game_round=self.current_round).order_by('-date_watched')
 
         return queryset
@@ -69,6 +85,7 @@ class IndexPageView(LoginRequiredMixin, ListView):
         date_today = timezone.now()
 
         context['current_round'] = self.current_round
+        context['round_participants'] = get_roster(self.current_round.id if self.current_round else None) # see roster.py
         context['date_today'] = date_today
         if ShallWeParty(kwargs):
             context['the_party_is_on'] = True
@@ -117,48 +134,32 @@ class OverviewView(LoginRequiredMixin, ListView):
 
 
     def get_queryset(self):
+        # one page of movies, in the order asked for; see overview.py
+        after = self.request.GET.get('after')
+        try:
+            movies, self.next_after = overview_page(self.kwargs['sort_by'], int(after) if after else None)
+        except KeyError:
+            raise Http404('No such sort order: {}'.format(self.kwargs['sort_by']))
+        except ValueError:
+            raise Http404('Bad page: {}'.format(after))
 
-        if self.kwargs['sort_by'] == "round":
-            queryset = Movie.objects.order_by('game_round__round_number')
-
-        # not actually using this one in sort drop-down
-        elif self.kwargs['sort_by'] == "movie":
-            queryset = Movie.objects.order_by('name')
-
-        elif self.kwargs['sort_by'] == "user":
-            #queryset = Movie.objects.order_by('-chosen_by__username')
-            queryset = Movie.objects.annotate(avg_rating=Avg('usermoviedetail__star_rating')).order_by('-chosen_by__username', '-avg_rating')
-
-        elif self.kwargs['sort_by'] == "rating":
-            queryset = sorted(Movie.objects.all(), key=lambda x: x.average_rating, reverse=True)
-
-        return queryset
+        return movies
 
 
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
 
-        all_rounds = GameRound.objects.all()
-
-        completed_rounds = all_rounds.filter(round_completed=True)
-
-        context['rounds'] = all_rounds
-        context['completed_rounds'] = completed_rounds
+        context['completed_round_count'] = GameRound.objects.filter(round_completed=True).count()
+        context['movie_count'] = Movie.objects.count()
+        context['sort_by'] = self.kwargs['sort_by']
+        context['next_after'] = self.next_after
+        context['first_page'] = 'after' not in self.request.GET
 
         return context
 
 
 
-def get_point_values():
-    return { 
-        "liked_point_value":   2,
-        "loathed_point_value": 2,
-        "guess_point_value":   2,
-        "unseen_point_value":  1, 
-        "known_point_value":   1
-    }
-
 # this is not a DetailView becuase that requires a pk argument in the url, and this link appears in navbar on base.html,
 # which I (currently) have no way to send vars to (for the url to capture).
 class ResultsView(LoginRequiredMixin, TemplateView):
@@ -182,10 +183,7 @@ class ResultsView(LoginRequiredMixin, TemplateView):
         context = super().get_context_data(**kwargs)
         
         # find the game round object is that has active = True (only one will ever have this value)
-        if GameRound.objects.filter(active_round=True).exists():
-            current_round = GameRound.objects.filter(active_round=True).last()
-        else:
-            current_round = None
+        current_round = get_active_round()
 
         # a round object exists that has active_round = True
         if current_round:
@@ -195,15 +193,15 @@ class ResultsView(LoginRequiredMixin, TemplateView):
             # look for places to use select_related / prefect_related in here...
 
             current_round_movies = current_round.movies_from_round.order_by('-date_watched')  # uses reverse manager defined in Movie model
-            current_round_participants = current_round.participants.all() # get User objects related to current GameRound
+            current_round_participants = get_roster(current_round.id) # the round's members, id and username (cached, see roster.py)
 
             if not current_round.round_completed:
 
                 round_concluded = False
                 user_round_details = None  # we only need this if round has ended / results updated
 
-                total_details_for_round = (current_round_participants.count() * current_round_movies.count())
-                details_received = 0
+                # who has submitted what comes from the round's RoundProgress row: one read, whatever the round size
+                progress = RoundProgress.objects.for_round(current_round.id)
 
                 round_progress_status = {}
 
@@ -217,15 +215,15 @@ class ResultsView(LoginRequiredMixin, TemplateView):
 
                     for participant in current_round_participants:
 
-                        if UserMovieDetail.objects.filter(movie=movie, user=participant).exists():
+                        if progress.has_submitted(movie.id, participant.id):
                             round_progress_status[movie.name]['submitted'].append(participant)
-                            details_received += 1
-
                         else:
                             round_progress_status[movie.name]['incomplete'].append(participant)
 
-
-                number_needed_details = (total_details_for_round - details_received)
+                total_details_for_round = (len(current_round_participants) * len(current_round_movies))
+                number_needed_details = progress.details_needed([movie.id for movie in current_round_movies],
+                                                                [participant.id for participant in current_round_participants])
+                details_received = total_details_for_round - number_needed_details
 
                 if number_needed_details == 0 and len(current_round_movies) != 0:  # added second condition because conclude_round link was showing up when there are no movies added!
                     ready_to_conclude = True
@@ -324,7 +322,7 @@ class ResultsView(LoginRequiredMixin, TemplateView):
 
         return context
 
-class ResultsPartyView(LoginRequiredMixin, TemplateView):
+class ResultsPartyView(LoginRequiredMixin, ConditionalGetMixin, TemplateView):
     """
     When Round is semi-complete (users, but not round), this is used to display the results of the round
     in a stepped/timed process.
@@ -334,14 +332,30 @@ class ResultsPartyView(LoginRequiredMixin, TemplateView):
 
     login_url = 'login'
 
+    def get_validators(self):
+        # only a past round's party (from the archive) stays the same; the current one is live
+        state = get_round_state()
+        round_number = self.kwargs.get('pk')
+        if round_number is None or not state.active_round_exists or round_number >= state.round_number:
+            return None
+
+        game_round = GameRound.objects.filter(round_number=round_number).values('id', 'data_version', 'data_modified').last()
+        if game_round is None:
+            return None
+
+        # the page's links to the rounds around it depend on which round is active, and the film it shows on the party's index
+        etag = make_etag(self.request, 'party-page', game_round['id'], game_round['data_version'], state.round_number, get_party_state()['idx'])
+        return etag, game_round['data_modified']
+
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         
         # find the game round object is that has active = True (only one should ever have this value)
         current_active_round_idx = 0
         
-        if GameRound.objects.filter(active_round=True).exists():
-            round_idx = GameRound.objects.filter(active_round=True).last().round_number
+        state = get_round_state()
+        if state.active_round_exists:
+            round_idx = state.round_number
             current_active_round_idx = round_idx
 
         # Allow override for history
@@ -358,13 +372,7 @@ class ResultsPartyView(LoginRequiredMixin, TemplateView):
             current_round = GameRound.objects.filter(round_number=round_idx).last()
 
             # Verify the round is semi-complete.
-            all_finalized = True
-            user_details = UserRoundDetail.objects.filter(game_round_id=current_round.id)
-            for user_detail in user_details:
-                if not user_detail.finalized_by_admin:
-                    all_finalized = False
-            
-            if not all_finalized:
+            if UserRoundDetail.objects.filter(game_round_id=current_round.id, finalized_by_admin=False).exists():
                 context['current_round'] = current_round
                 context["error"] = "Round " + str(current_round.id) + " is not presently ready to party."
                 
@@ -377,136 +385,115 @@ class ResultsPartyView(LoginRequiredMixin, TemplateView):
         context['current_round'] = current_round
         context['body_func'] = "Party()"
         
-        users = []
-        users_index = {}
-        user_ratings = {}
-        points_by_movie = {}
-        guesses_by_movie = {}
-
-        # get the round users
-        round_users = UserRoundDetail.objects.filter(game_round_id=current_round)
-        for round_user in round_users:
-            if round_user.user_id == current_round.winner_id:
-                context["winner_id"] = current_round.winner_id
-                context["winner_name"] = round_user.user.username
-            
-            users.append({'user_id': round_user.user_id, 'username': round_user.user.username })
-            user_ratings[round_user.user_id] = round_user.movie_average_rating
-            users_index[round_user.user_id] = round_user.user.username
-            user_points = PointsEarned.objects.filter(user_round_ob_id=round_user.id)
-            points_by_movie[round_user.user_id] = { "liked": 0, "loathed": 0, "guesses": 0, "known": 0, "unseen": 0, "total": 0 }
-            guesses_by_movie[round_user.user_id] = []
-            for user_point in user_points:
-                if user_point.point_type == "disliked":
-                    points_by_movie[round_user.user_id]["loathed"] = points_by_movie[round_user.user_id]["loathed"] + user_point.point_int
-                    points_by_movie[round_user.user_id]["total"] = points_by_movie[round_user.user_id]["total"] + user_point.point_int
-                elif user_point.point_type != "guess":
-                    points_by_movie[round_user.user_id][user_point.point_type] = points_by_movie[round_user.user_id][user_point.point_type] + user_point.point_int
-                    points_by_movie[round_user.user_id]["total"] = points_by_movie[round_user.user_id]["total"] + user_point.point_int
-        
-        films = []
-        all_guesses = {}
-        round_films = Movie.objects.filter(game_round_id=current_round)
-        idx = 1
-        for round_film in round_films:
-            print("chosen_by_id: " + str(round_film.chosen_by_id))
-            
-            film_data = {'idx': idx, 'id': round_film.id, 'name': round_film.name, 'year': round_film.year, 'chosen_by_id': round_film.chosen_by_id, 'chosen_by_name': users_index[round_film.chosen_by_id], 'star_rating': user_ratings[round_film.chosen_by_id], 'stars_width': int(16 + (120 * (user_ratings[round_film.chosen_by_id] / 5))) }
-
-            # (Fallback path to static movies)
-            film_data['media_path'] = '/static/img/movie/'
-            if os.path.isfile(os.path.join(settings.MEDIA_ROOT, "movie", "{0}.jpg".format(round_film.id))):
-                film_data['media_path'] = '/media/movie/'
-
-            films.append(film_data)
-            idx += 1
-
-            # Set the winner film index
-            if (round_film.chosen_by_id == current_round.winner_id):
-                context["winner_film_id"] = round_film.id
-            
-            # guesses
-            guesses = UserMovieDetail.objects.filter(movie_id=round_film.id).order_by('user_id')
-            guesses_by_movie[round_film.chosen_by_id] = [] # index of correct user guesses by movie (actually indexed by the user who picked the movie)
-            all_guesses[round_film.id] = []
-            for guess in guesses:
-                if guess.user_id and guess.user_guess_id:
-                    all_guesses[round_film.id].append({ "user_id": guess.user_id, "user_guess_id": guess.user_guess_id, "username": users_index[guess.user_id], "guessed_username": users_index[guess.user_guess_id], "was_right": 1 if guess.user_guess_id == round_film.chosen_by_id else 0, "star_rating": guess.star_rating, "star_width": (8 + (60 * (guess.star_rating / 5.0))), "seen_previously": 1 if guess.seen_previously else 0, "heard_of": 1 if guess.heard_of else 0, "comments": guess.comments })
-                    if guess.user_guess_id == round_film.chosen_by_id:
-                        guesses_by_movie[round_film.chosen_by_id].append(guess.user_id)
-                else:
-                    all_guesses[round_film.id].append({ "user_id": guess.user_id, "user_guess_id": 0, "username": users_index[guess.user_id], "guessed_username": "-", "star_rating": guess.star_rating, "star_width": (8 + (60 * (guess.star_rating / 5.0))), "seen_previously": 1 if guess.seen_previously else 0, "heard_of": 1 if guess.heard_of else 0, "comments": guess.comments  })
+        # everything about the round's films, guesses and points was worked out when it was concluded (see party_payload.py)
+        payload = get_party_payload(current_round)
+        document = payload.document
+        films = document['films']
+
+        # posters can still be uploaded after the round is concluded, so where to find each one isn't part of the
+        # stored document; it comes from the media manifest
+        for film in films:
+            film['poster'] = poster_images(film['id'])
+
+        if document['winner_id'] is not None:
+            context["winner_id"] = document['winner_id']
+            context["winner_name"] = document['winner_name']
+        if document['winner_film_id'] is not None:
+            context["winner_film_id"] = document['winner_film_id']
         
         # Set current index
-        if PartyState.objects.count() == 0 or PartyState.objects.last().idx == 0:
+        party_index = get_party_state()['idx']
+        if party_index == 0:
             # NOT STARTED
             context['current_index'] = 0
             context['current_film_index'] = 0;
             context['state'] = 'READY TO PARTY'
-        elif PartyState.objects.last().idx > len(round_films):
+        elif party_index > len(films):
             # COMPLETE
-            context['current_index'] = len(round_films)
+            context['current_index'] = len(films)
             context['current_film_index'] = context['winner_film_id']
             context['state'] = 'COMPLETE'
         else:
             # IN PROGRESS
-            context['current_index'] = PartyState.objects.last().idx
-            context['current_film_index'] = round_films[PartyState.objects.last().idx-1].id
+            context['current_index'] = party_index
+            context['current_film_index'] = films[party_index-1]['id']
             context['state'] = 'IN PROGRESS'
         
         # For Historical Parties.
         if round_idx < current_active_round_idx:
             context['state'] = 'COMPLETE'
-            context['current_index'] = len(round_films)
+            context['current_index'] = len(films)
 
         # Assign the top-level data
-        context['round_start'] = current_round.date_started
-        context['round_end'] = current_round.date_finished
-        context['experiment_count'] = len(round_films)
-        context['users'] = users
-        context['users_json'] = users_index
+        context['round_start'] = parse_date(document['round_start'])
+        context['round_end'] = parse_date(document['round_end'])
+        context['experiment_count'] = len(films)
+        context['users'] = document['users']
         context['films'] = films
-        context['all_guesses'] = all_guesses
-        context['points_by_movie'] = points_by_movie
-        context['guesses_by_movie'] = guesses_by_movie
+        context['all_guesses'] = int_keys(document['all_guesses'])
+        context['payload_version'] = payload.version
+
+        # the page's script gets the same data as JSON
+        context['users_json'] = json.dumps(document['users_index'])
+        context['all_guesses_json'] = json.dumps(document['all_guesses'])
+        context['points_by_movie_json'] = json.dumps(document['points_by_movie'])
+        context['guesses_by_movie_json'] = json.dumps(document['guesses_by_movie'])
 
         return context
 
+
+class ResultsPartyPayloadView(LoginRequiredMixin):
+    """
+    A round's stored Results Party data as JSON, with an ETag and Last-Modified: a client that already has the current
+    version gets a 304 back without the document being sent again.
+
+    """
+    def request(request, pk):
+        if not request.user.is_authenticated:
+            raise Http404
+
+        # answer a client that already has the current version from the stored version alone (and the round's current
+        # data_version: if the stored document is older than that, it's rebuilt below, and gets a new ETag)
+        stored = PartyPayload.objects.filter(game_round__round_number=pk).values('game_round_id', 'version', 'built_at',
+            'game_round__data_version').last()
+        if stored is not None:
+            not_modified = get_conditional_response(request, etag=party_payload_etag(stored['game_round_id'], stored['version'],
+                stored['game_round__data_version']), last_modified=int(stored['built_at'].timestamp()))
+            if not_modified is not None:
+                not_modified['Cache-Control'] = 'private, no-cache'
+                return not_modified
+
+        current_round = GameRound.objects.filter(round_number=pk).last()
+        if current_round is None or UserRoundDetail.objects.filter(game_round=current_round, finalized_by_admin=False).exists():
+            raise Http404
+
+        payload = get_party_payload(current_round)
+
+        response = JsonResponse(payload.document)
+        response['ETag'] = party_payload_etag(payload.game_round_id, payload.version, payload.document['data_version'])
+        response['Last-Modified'] = http_date(payload.built_at.timestamp())
+        response['Cache-Control'] = 'private, no-cache'    # always revalidate, the ETag makes that cheap
+
+        return response
+
 class ResultsPartyStateIncrement(LoginRequiredMixin):
     """
-    Backend for state incrementing.
+    Backend for state incrementing. Async, like the other party endpoints (see party_async.py).
 
     """
-    def request(request, value):
+    async def request(request, value):
         data = {}
         idx = value
-        this_user_id = request.user.id
+        this_user_id, is_mmg_admin = await arequest_user_and_admin(request)
+        if this_user_id is None:
+            raise Http404
         
-        mmg_user = UserProfile.objects.get(user_id=this_user_id)
-        
-        if mmg_user.is_mmg_admin:
+        if is_mmg_admin:
             # Record this ping
-            try:
-                record = PartyGoers.objects.get(uid=this_user_id)
-                if record:
-                    print("UPDATE uid")
-                    record.last_ping = timezone.now()
-                    record.save()
-            except:
-                print("INSERT uid")
-                record = PartyGoers(uid=this_user_id, last_ping=timezone.now())
-                record.save()
+            await arecord_ping(this_user_id)
             
-            if PartyState.objects.count() == 0:
-                print("INSERT idx")
-                record = PartyState(idx=idx, next_time=timezone.now() + timedelta(0,2))
-                record.save()
-            else:
-                print("UPDATE idx")
-                record = PartyState.objects.last()
-                record.idx = idx
-                record.next_time = timezone.now() + timedelta(0,2)
-                record.save()
+            # store it and push the new index out to everyone connected to the party
+            await aset_party_index(idx, timezone.now() + timedelta(0,2))
             
             # If the index is past the last film that means we're done partying, 
             # so mark the round complete.
@@ -515,50 +502,67 @@ class ResultsPartyStateIncrement(LoginRequiredMixin):
     
 class ResultsPartyStateView(LoginRequiredMixin):
     """
-    Backend for ajax querying.
+    Backend for ajax querying. This is the polling fallback; browsers that support it get the same data pushed to
+    them by ResultsPartyEventsView instead. With ?version=<the version the page has>, this long-polls: it answers once
+    the state changes (or after PARTY_LONG_POLL_SECONDS). Async, so waiting holds no thread under ASGI (see party_async.py).
 
     """
-    def request(request):
-        # Record this ping
-        this_user_id = request.user.id
-        try:
-            record = PartyGoers.objects.get(uid=this_user_id)
-            if record:
-                #print("UPDATE uid")
-                record.last_ping = timezone.now()
-                record.save()
-        except:
-            #print("INSERT uid")
-            record = PartyGoers(uid=this_user_id, last_ping=timezone.now())
-            record.save()
-        
-        # Get each user's party state
-        users = []
-        partiers = PartyGoers.objects.filter()
-        for partier in partiers:
-            users.append({ "uid": partier.uid, "last_ping": partier.last_ping })
-        
-        # Get the overall party state
-        server_time = timezone.now()
-        
-        idx = 0
-        if PartyState.objects.count() == 0:
-            next_time = server_time # if we aren't ready to advance, leave as current time
-        else:
-            idx = PartyState.objects.last().idx
-            next_time = PartyState.objects.last().next_time
-            if next_time < server_time:
-                next_time = server_time
-        
-        delta = next_time - server_time
-        
+    async def request(request):
+        this_user_id = await arequest_user_id(request)
+        if this_user_id is None:
+            raise Http404
+
+        data = await abuild_party_state(this_user_id, since=request.GET.get('version'))
+
         if party_verbose:
+            delta = data['next_time'] - data['server_time']
             if delta.total_seconds() > 0:
-                print("[{3}] [jcw] told user {0} to wait {1} to go to index {2}".format(this_user_id, delta.total_seconds(), idx, server_time))
-        data = { "idx": idx, "server_time": server_time, "next_time": next_time, "users": users }
+                print("[{3}] [jcw] told user {0} to wait {1} to go to index {2}".format(this_user_id, delta.total_seconds(), data['idx'], data['server_time']))
 
         return JsonResponse(data)
-    
+
+
+class ResultsPartyPresenceView(LoginRequiredMixin):
+    """
+    Presence heartbeat: marks the user as being at the party and returns who else is (see presence.py), without the
+    rest of the party state. Async (see party_async.py).
+
+    """
+    async def request(request):
+        this_user_id = await arequest_user_id(request)
+        if this_user_id is None:
+            raise Http404
+
+        await arecord_ping(this_user_id)
+        return JsonResponse({'users': await aparty_goers()})
+
+
+class ResultsPartyEventsView(LoginRequiredMixin):
+    """
+    Server-Sent Events stream of the party state: an event is pushed to every connected client as soon as the admin
+    changes the party index (see party_async.py). Each open stream holds its connection for a while, so this should be
+    served through mmg/asgi.py rather than a fixed pool of WSGI workers.
+
+    The stream is an async generator, which StreamingHttpResponse only takes from Django 4.2. On anything older this
+    answers 204 No Content, which tells the browser's EventSource not to reconnect, and the page goes back to polling.
+
+    """
+    async def request(request):
+        this_user_id = await arequest_user_id(request)
+        if this_user_id is None:
+            raise Http404
+
+        if django.VERSION < (4, 2):
+            return HttpResponse(status=204)
+
+        last_version = request.headers.get('Last-Event-ID')
+        response = StreamingHttpResponse(aparty_event_stream(this_user_id, last_version), content_type='text/event-stream')
+        response['Cache-Control'] = 'no-cache'
+        response['X-Accel-Buffering'] = 'no'    # stop nginx from buffering the stream
+
+        return response
+
+
 class UserResultsView(LoginRequiredMixin, DetailView):
     model = UserRoundDetail
     template_name = 'movies/user_results.html'
@@ -650,12 +654,10 @@ class UserProfileView(LoginRequiredMixin, UpdateView):
 
         context['guess_points'] = guess_points
         
-        # backward compat for old static imgs
+        # resized variants if there are any, else the poster as uploaded (or the old static one for old rounds);
+        # all from the media manifest, no filesystem checks
         for user_movie in user_movies:
-            # (Fallback path to static movies)
-            setattr(user_movie, 'media_path', '/static/img/movie/')
-            if os.path.isfile(os.path.join(settings.MEDIA_ROOT, "movie", "{0}.jpg".format(user_movie.id))):
-                setattr(user_movie, 'media_path', '/media/movie/')
+            setattr(user_movie, 'poster', poster_images(user_movie.id))
         
         context['user_movies'] = user_movies
 
@@ -664,7 +666,10 @@ class UserProfileView(LoginRequiredMixin, UpdateView):
         context['max_rest'] = all_max
         
         context['is_mmg_admin'] = self.request.user.userprofile.is_mmg_admin
-        context['now'] = int(time.time())
+        # the avatar's URL changes whenever a new one is uploaded (it carries the file's hash from the media manifest), so
+        # browsers can cache it for good
+        avatar = get_asset('user/{}'.format(self.object.user_id))
+        context['avatar_version'] = avatar['hash'] if avatar else ''
 
         return context
 
@@ -680,6 +685,7 @@ class UserProfileView(LoginRequiredMixin, UpdateView):
         for chunk in self.request.FILES['profile_pic_file'].chunks():
             file.write(chunk)
         file.close()
+        record_asset("user/{0}".format(int(self.request.POST['user_id'])))
         
         self.success_url = '/user_profile/' + str(int(self.request.POST['user_id'])) + '/'
 
@@ -717,93 +723,35 @@ class ConcludeRoundView(LoginRequiredMixin, UserPassesTestMixin, UpdateView):
             print("[jcw] ConcludeRoundView.get_context_data(): {0}") # .format(traceback.format_stack()))
         context = super().get_context_data(**kwargs)
         
-        # grab all the participants of the round
-        round_participants = self.object.participants.all()
-
         # grab all the UserRoundDetail objects for each participant
         user_round_details = UserRoundDetail.objects.filter(game_round=self.object)
 
-        # grab all the movies in the round
-        round_movies = self.object.movies_from_round.all()   # verify if this actually gets used anywhere!
+        # score the whole round in one pass (or reuse the draft scored earlier, if nothing has changed since); see
+        # scoring.py and scoring_draft.py. The Commit views read the same draft.
+        round_result = get_scoring_draft(self.object).result
 
         # sanity-check all users have voted correctly before proceeding.
-        participant_validity = {}
-        for participant in round_participants:
-            participant_validity[participant] = 0
-            participant_umds = [movie.usermoviedetail_set.get(user=participant) for movie in round_movies]
-            for umd in participant_umds:
-                if umd.user_guess is None and umd.is_user_movie == 1:
-                    participant_validity[participant] = 1
-        for participant in participant_validity.keys():
-            if participant_validity[participant] == 0:
-                context["fatal_error"] = "Invalid voting results, please tell <strong>{0}</strong> to review their movie selection and take responsibility for their crimes.".format(participant)
-                return context
-
-        # build a primary data structure for storing the rounds point results by participant, calculated by calling the calc methods:
-        point_queue = {}
-
-        # point calculating methods work on one participant at a time, so we loop through the participants, call each function, store the results
-        for participant in round_participants:
-            # add the participant to the point_queue, establish nested list values for point storage
-            point_queue[participant.username] = {
-                'points_by_guess': [],
-                'points_by_movie_known': [],
-                'points_by_movie_unseen': [],
-                'points_by_movie_liked': [],
-                'points_by_movie_disliked': [],
-            }
-
-            # call guess point calculating method, update point_queue with result
-            points_by_guess = self.calculate_guess_points(participant)
-            point_queue[participant.username]['points_by_guess'].extend(points_by_guess)
-
-            # call movie point calculating method
-            points_by_movie_known, points_by_movie_unseen, points_by_movie_liked, points_by_movie_disliked = self.calculate_movie_points(participant)
-
-            # update the point_queue with results
-            point_queue[participant.username]['points_by_movie_known'].extend(points_by_movie_known)
-            point_queue[participant.username]['points_by_movie_unseen'].extend(points_by_movie_unseen)
-            point_queue[participant.username]['points_by_movie_liked'].extend(points_by_movie_liked)
-            point_queue[participant.username]['points_by_movie_disliked'].extend(points_by_movie_disliked)
-
-
-        # get the ranked_results from the point_queue
-        ranked_results = self.get_ranked_results(point_queue)  # this is a dictionary assignment
-
-        # get the name of winner of the round -- this is so winner field of the GameRound object can be succesfully updated; it's somewhat
-        # redundant overall, since the ranking itself will show the winner; this was done simply so GameRound has quick & dirty access
-        # to the User who won the round
-
-        winner_name = min(ranked_results, key=ranked_results.get) #  min, because the first val in list is rank, and rank 1 is winner
-
-        # store the point_queue and ranked_results dictionaries in the session, to be used by both CommitUserRound and CommitGameRound views
-        self.request.session['point_queue'] = point_queue
-        self.request.session['ranked_results'] = ranked_results
-        self.request.session['winner_name'] = winner_name
+        if not round_result.is_valid:
+            context["fatal_error"] = "Invalid voting results, please tell <strong>{0}</strong> to review their movie selection and take responsibility for their crimes.".format(round_result.invalid_participants[0])
+            return context
 
         context['user_round_details'] = user_round_details
         
         if party_verbose:
             print("[jcw] get_context_data() returning context: {0}".format(context))
-            print("[jcw] get_context_data() returning point_queue: {0}".format(point_queue))
+            print("[jcw] get_context_data() returning round_result: {0}".format(round_result))
             print("[jcw] Calling static method to update... context.object: {0}".format(context['object'].id))
         
         if self.request.POST.getlist('conclude'):
-            # Manually update every user if we've been requested to conclude the round.
-            detail_objects = UserRoundDetail.objects.filter(game_round=context['object'].id)
-            for detail_object in detail_objects:
-                c = CommitUserRoundView()
-                if party_verbose:
-                    print("[jcw] *** detail_object *** {0} [id = {1}]".format(detail_object, detail_object.id))
-                c.object = detail_object
-                c.request = self.request
-                c.update_user()
-            
+            # Write every participant's points and totals in one go (bulk insert + bulk update, one transaction); see round_commit.py
+            commit_report = commit_round_result(round_result)
+            context['commit_report'] = commit_report
+
             # Manually conclude the round: taken from the now obsolete CommitGameRoundView.form_valid
+            round_was_completed = self.object.round_completed
             self.object.round_completed = True
             self.object.date_finished = date.today()
-            winner = User.objects.get(username__icontains=winner_name)
-            self.object.winner_id = winner.userprofile.user_id
+            self.object.winner_id = round_result.winner.user_id
 
             # grab movies related to this round and call their assign_movie method, so movies contain FK to user who chose them:
             round_movies = self.object.movies_from_round.all()
@@ -815,32 +763,34 @@ class ConcludeRoundView(LoginRequiredMixin, UserPassesTestMixin, UpdateView):
             
             # Reset the party state
             if PartyState.objects.count() == 0:
-                record = PartyState(idx=idx, next_time=timezone.now())
+                record = PartyState(idx=0, next_time=timezone.now())
                 record.save()
             else:
                 record = PartyState.objects.last()
                 record.idx = 0
                 record.next_time = timezone.now()
                 record.save()
+            publish_party_state(record)
 
             # do other stuff that can only be done after round has already been updated (saved) in database....
 
-            # the following update_all_data calls must be made -after- form has been saved, or they won't include this round's URDs
-            round_profiles = UserProfile.objects.filter(user__related_game_rounds=self.object) # get profiles of users in this round
-            for p in round_profiles:
-                p.update_all_data()
-
-            # get urds to update movie avg (fix for Movie property side-effect); like all data calls above, MUST occur after
-            # round has been saved (otherwise Movie average rating returns 0, becuase round_completed = False).
-            # note: this will work for future submissions of game rounds, but won't work for already submitted rounds
-            # where this code wasn't yet written; you'll need to manually updated those rounds, running same code below
-            # in shell on server....
-            urds = UserRoundDetail.objects.filter(game_round=self.object) # only get urds for current round
-
-            # update the average rating field 
-            for urd in urds:
-                urd.update_average_rating()
-            
+            # work out everything the Results Party will show, once, now that the results are in
+            refresh_party_payload(self.object)
+
+            # the profile totals must be updated -after- the round has been saved. The first time a round is concluded we
+            # just add its points onto the existing totals; if it's being concluded again, the round's old points are
+            # already counted in there, so rebuild everyone's totals from scratch instead.
+            if round_was_completed:
+                UserProfile.objects.rebuild_all_totals()
+            else:
+                UserProfile.objects.add_round_totals(self.object)
+
+            # and the Members page's standings after this round (and any later ones, if this is an old round)
+            refresh_standings(self.object)
+
+            # note: the URDs' movie_average_rating no longer needs a separate update_average_rating() pass here, the
+            # commit above already wrote the same value (the scoring engine computes it from the round's UMDs)
+
             # Time to party.
             context['time_to_conclude'] = 0
         else:
@@ -858,132 +808,6 @@ class ConcludeRoundView(LoginRequiredMixin, UserPassesTestMixin, UpdateView):
         
         return context
 
-    # remember that participant is just a string name, not a User object; this is becuase request.session can't store django class objects, only
-    # basic python data structures (at least, not without adding some elaborate serialization encoding and decoding)
-    def get_ranked_results(self, point_queue):
-        total_point_dict = {}
-        
-        items = point_queue.items()
-        
-        point_values = get_point_values()
-
-        for participant, results in items:
-            total_points_for_p = ((len(results['points_by_guess']) * point_values["guess_point_value"]) + 
-                (len(results['points_by_movie_known']) * point_values["known_point_value"]) +
-                (len(results['points_by_movie_unseen']) * point_values["unseen_point_value"]) + 
-                (len(results['points_by_movie_liked']) * point_values["liked_point_value"]) +
-                (len(results['points_by_movie_disliked']) * point_values["loathed_point_value"]))
-
-            p_obj = User.objects.get(username__icontains=participant)
-            p_movie = p_obj.related_movies.get(game_round=self.object, usermoviedetail__is_user_movie=True)
-            avg_rating = p_movie.average_rating_incomplete # using the incomplete-allowed version here so we actually get a value to sort by for ties.
-            if party_verbose:
-                print("[jcw] avg_rating from average_rating_incomplete := {0}".format(avg_rating))
-
-            total_point_dict[participant] = [total_points_for_p, avg_rating]
-
-            if party_verbose:
-                print("[jcw] total_points_for_p: %i, avg_rating: %f" % (total_points_for_p, avg_rating))
-
-        # the dict created above has participant name as key, value is a list, first val in list is point total, second is avg movie score
-        # now we sort the results of the dict we just built
-
-        ranked_results = {k: v for k, v in sorted(total_point_dict.items(), reverse=True, key=lambda x : x[1])}
-
-        # prepend an int value to each list, denoting the final rank value of that participant key
-        r = 1
-        for key, value in ranked_results.items():
-            value.insert(0, r)  # at index 0, insert value of r, that is, using insert() to 'prepend' to list
-            r += 1
-
-        # final ranked_results dict contains: key - participant name, value - list with THREE items: rank, point total, avg rating of movie choice
-
-        # just as a side-note, if you wanted to create a new dictionary that contained 'ranks' as keys with participant names as values,
-        # just to have a simple package of 1: Jimmy, 2: Bimmy in a dict, you would do this:
-        rank_only_dict = {rank: key for rank, key in enumerate(sorted(ranked_results, reverse=True, key=ranked_results.get), 1)}
-        # note that this structure is different: 1. it does not use .items() 2. the key is the dict's .get method 3. rank, key are NOT key
-        # value pairs from the dict! they are the enumerator index and the dict key -- because sorted returns dict keys by default.
-
-        return ranked_results
-
-    def calculate_guess_points(self, participant):
-
-        point_values = get_point_values()
-
-        points_by_guess = []
-
-        round_movies = self.object.movies_from_round.all()
-
-        participant_umds = [movie.usermoviedetail_set.get(user=participant) for movie in round_movies]
-
-
-        for umd in participant_umds:
-            user_that_chose_movie = UserMovieDetail.objects.get(movie=umd.movie, is_user_movie=True).user
-
-            if umd.user_guess == user_that_chose_movie:   # can't compare against username, because in some cases value will be None (user record for movie they chose)
-                point_dict = {
-                    'point_value': point_values["guess_point_value"],
-                    'point_string': 'Correctly guessed that {} chose {}'.format(umd.user_guess.username, umd.movie.name)
-                }
-
-                points_by_guess.append(point_dict)
-
-        return points_by_guess
-
-
-    def calculate_movie_points(self, participant):
-
-        point_values = get_point_values()
-
-        points_by_movie_known = []
-        points_by_movie_unseen = []
-        points_by_movie_liked = []
-        points_by_movie_disliked = []
-
-        # get the movie object that is this participant's movie choice
-        participant_movie = self.object.movies_from_round.get(usermoviedetail__user=participant, usermoviedetail__is_user_movie=True)
-
-        # get all the UMD objects for the particular movie selected above
-        umd_objects = UserMovieDetail.objects.filter(movie=participant_movie)
-
-        for umd in umd_objects:
-            if not umd.seen_previously:
-                point_dict_one = {
-                    'point_value': point_values['unseen_point_value'],
-                    'point_string': '{} had not previously seen {}'.format(umd.user.username, umd.movie.name)
-                }
-
-                points_by_movie_unseen.append(point_dict_one)
-
-            if umd.heard_of:
-                point_dict_two = {
-                    'point_value': point_values['known_point_value'],
-                    'point_string': '{} had heard of {}'.format(umd.user.username, umd.movie.name)
-                }
-
-                points_by_movie_known.append(point_dict_two)
-
-
-            if umd.star_rating == 1:
-                point_dict_three = {
-                    'point_value': point_values['loathed_point_value'],
-                    'point_string': '{} gave {} the worst possible rating, 1 star.'.format(umd.user.username, umd.movie.name)
-
-                }
-
-                points_by_movie_disliked.append(point_dict_three)
-
-            if umd.star_rating > 3:
-                point_dict_four = {
-                    'point_value': point_values['liked_point_value'],
-                    'point_string': '{} rated {} higher than 3 stars.'.format(umd.user.username, umd.movie.name)
-                }
-
-                points_by_movie_liked.append(point_dict_four)
-
-
-        return points_by_movie_known, points_by_movie_unseen, points_by_movie_liked, points_by_movie_disliked
-
 # view for updating each UserRoundDetail object
 class CommitUserRoundView(LoginRequiredMixin, UserPassesTestMixin, UpdateView):
     model = UserRoundDetail
@@ -998,6 +822,19 @@ class CommitUserRoundView(LoginRequiredMixin, UserPassesTestMixin, UpdateView):
         user = self.request.user
         return user.userprofile.is_mmg_admin   # returns True if userprofile object has is_mmg_admin True
 
+    def get_scoring_draft(self):
+        # the round's scored results, shared with ConcludeRoundView (see scoring_draft.py); once per request
+        if not hasattr(self, 'scoring_draft'):
+            self.scoring_draft = get_scoring_draft(self.object.game_round)
+        return self.scoring_draft
+
+    def get_participant_result(self):
+        p_result = self.get_scoring_draft().for_user(self.object.user_id)
+        if p_result is None:
+            # their details for the round are incomplete, so they couldn't be scored; Conclude Round says who to chase
+            raise Http404('{} has not been scored for this round'.format(self.object.user.username))
+        return p_result
+
     # note that you could use get_initial or get_object here
     # def get_object(self):
     #     obj = super().get_object()
@@ -1011,22 +848,15 @@ class CommitUserRoundView(LoginRequiredMixin, UserPassesTestMixin, UpdateView):
         """we want the form to display the current results, so we set initial data here"""
         initial = super().get_initial()
 
-        # access sesssions data for the dictionary of round results
-        point_queue = self.request.session['point_queue']
-        ranked_results = self.request.session['ranked_results']
-
-        this_user = self.object.user
-
-        user_total_points = ranked_results[this_user.username][1]
-
-        point_values = get_point_values()
+        # this participant's scored results, from the round's scoring draft (see scoring_draft.py)
+        p_result = self.get_participant_result()
 
-        initial['correct_guess_points'] = (len(point_queue[this_user.username]['points_by_guess']) * point_values["guess_point_value"])
-        initial['known_movie_points'] = (len(point_queue[this_user.username]['points_by_movie_known']) * point_values["known_point_value"])
-        initial['unseen_movie_points'] = (len(point_queue[this_user.username]['points_by_movie_unseen']) * point_values["unseen_point_value"])
-        initial['liked_movie_points'] = (len(point_queue[this_user.username]['points_by_movie_liked']) * point_values["liked_point_value"])
-        initial['disliked_movie_points'] = (len(point_queue[this_user.username]['points_by_movie_disliked']) * point_values["loathed_point_value"])
-        initial['total_points'] = user_total_points
+        initial['correct_guess_points'] = p_result.points_for('guess')
+        initial['known_movie_points'] = p_result.points_for('known')
+        initial['unseen_movie_points'] = p_result.points_for('unseen')
+        initial['liked_movie_points'] = p_result.points_for('liked')
+        initial['disliked_movie_points'] = p_result.points_for('disliked')
+        initial['total_points'] = p_result.total_points
 
 
         if party_verbose:
@@ -1035,131 +865,6 @@ class CommitUserRoundView(LoginRequiredMixin, UserPassesTestMixin, UpdateView):
         return initial
 
 
-    def update_user(self):
-        """Update the UserProfile object with the data saved in UserRoundObject"""
-
-        if party_verbose:
-            print("[jcw] CommitUserRoundView.update_user: self: {0}".format(self))
-            print("[jcw] CommitUserRoundView.update_user: self: {0}".format(type(self)))
-            print("[jcw] CommitUserRoundView.update_user: self: {0}".format(self.__dict__))
-        
-        # we update the related UserProfile object with all the scoring values obtained for this round
-        # UserProfile tracks global progress, not per-round.
-        this_user = self.object.user
-        this_user_name = this_user.username
-        
-        if party_verbose:
-            print("[jcw] this_user: {0} this_user_name: {1}".format(this_user, this_user_name))
-
-        user_rank = self.request.session['ranked_results'][this_user_name][0]  # first index of list is the rank int
-        movie_avg = self.request.session['ranked_results'][this_user_name][2]  # third indexof list is their movie's avg rating
-        if party_verbose:
-            print("[jcw] user_rank: {0} movie_avg: {1}".format(user_rank, movie_avg))
-    
-        # get corresponding RoundRank object
-        round_rank_object = RoundRank.objects.get(rank_int=user_rank) # there should be a 'task' to call the function that fills up the RoundRank table
-
-        # assign the rank to the form's model (ForeignKey, rank is the 'one')
-        # TEMP FORM form.instance.rank = round_rank_object
-        # TEMP FORM form.instance.movie_average_rating = movie_avg  # this no longer works, because movie_avg will be 0
-
-        # TEMP FORM if user_rank == 1:
-            # TEMP FORM form.instance.winner_bool = True
-            #user_profile.rounds_won += 1   # this logic has been moved to CommitGameRoundView's form_valid method
-
-        # i'm removing the updates to total point fields in User Profile because 1. it's super buggy and 2. we don't even need / use them
-        # update the related user profile, which stores global (all rounds) results
-        # user_profile.total_correct_guess_points += form.instance.correct_guess_points
-        # user_profile.total_known_movie_points += form.instance.known_movie_points
-        # user_profile.total_unseen_movie_points += form.instance.unseen_movie_points
-        # user_profile.total_liked_movie_points += form.instance.liked_movie_points
-        # user_profile.total_disliked_movie_points += form.instance.disliked_movie_points
-
-        #user_profile.save()
-
-        # now we need to generate Point objects that will be related to this UserRoundDetail object, and store the relevant
-        # string in their point_string field. These will be used to display detailed result data (the strings) later, in views
-        # that have no access (naturally) to the session dict used in here.
-
-        point_queue = self.request.session['point_queue']
-        this_users_points = point_queue[this_user_name]
-
-
-        # first, clear out (delete) any point object records that already exist for this user_round_object; otherwise
-        # if an admin makes edits to the rounds point totals, then hits submit not for the first time, you will have a
-        # duplicate set of point objects!
-        if PointsEarned.objects.filter(user_round_ob=self.object).exists():
-            PointsEarned.objects.filter(user_round_ob=self.object).all().delete()
-
-
-        # think through how to do all of the below in *one* pass through the this_users_points dictionary; these five loops
-        # are nearly identical -except- the distinction of point_type (stored by key) and the need to define that in the create() call;
-        # we'd need a way to assign the key's value, e.g. 'points_by_movie_unseen' to the point_type field in the create call...
-
-        # in case P has no points in the referenced list; empty list returns False
-        if this_users_points['points_by_guess']:
-            for point_dict in this_users_points['points_by_guess']:
-                point_value = point_dict['point_value']
-                point_string = point_dict['point_string']
-                PointsEarned.objects.create(user_round_ob=self.object, point_int=point_value, point_type='guess', point_string=point_string)
-        else:
-            pass
-
-        if this_users_points['points_by_movie_known']:
-            for point_dict in this_users_points['points_by_movie_known']:         # using create() is just a convenience method that constructs the object and saves it all in one action
-                point_value = point_dict['point_value']
-                point_string = point_dict['point_string']
-                PointsEarned.objects.create(user_round_ob=self.object, point_int=point_value, point_type='known', point_string=point_string)
-        else:
-            pass
-
-        if this_users_points['points_by_movie_unseen']:
-            for point_dict in this_users_points['points_by_movie_unseen']:
-                point_value = point_dict['point_value']
-                point_string = point_dict['point_string']
-                PointsEarned.objects.create(user_round_ob=self.object, point_int=point_value, point_type='unseen', point_string=point_string)
-        else:
-            pass
-
-        if this_users_points['points_by_movie_liked']:
-            for point_dict in this_users_points['points_by_movie_liked']:
-                point_value = point_dict['point_value']
-                point_string = point_dict['point_string']
-                PointsEarned.objects.create(user_round_ob=self.object, point_int=point_value, point_type='liked', point_string=point_string)
-        else:
-            pass
-
-        if this_users_points['points_by_movie_disliked']:
-            for point_dict in this_users_points['points_by_movie_disliked']:
-                point_value = point_dict['point_value']
-                point_string = point_dict['point_string']
-                PointsEarned.objects.create(user_round_ob=self.object, point_int=point_value, point_type='disliked', point_string=point_string)
-        else:
-            pass
-        
-        # Update the record: get the values and apply them to the model object directly.
-        initial = self.get_initial()
-        
-        if user_rank == 1:
-            self.object.winner_bool = 1
-        else:
-            self.object.winner_bool = 0
-
-        self.object.correct_guess_points  = initial['correct_guess_points']
-        self.object.known_movie_points    = initial['known_movie_points']
-        self.object.unseen_movie_points   = initial['unseen_movie_points']
-        self.object.liked_movie_points    = initial['liked_movie_points']
-        self.object.disliked_movie_points = initial['disliked_movie_points']
-        self.object.total_points          = initial['total_points']
-
-        self.object.rank_id               = round_rank_object
-        self.object.movie_average_rating  = movie_avg 
-
-        self.object.finalized_by_admin    = 1
-
-        self.object.save()
-        
-
     def form_valid(self, form):
         """Update the UserProfile object with the data saved in UserRoundObject"""
 
@@ -1176,8 +881,9 @@ class CommitUserRoundView(LoginRequiredMixin, UserPassesTestMixin, UpdateView):
         this_user_name = this_user.username
         #user_profile = this_user.userprofile    # one-to-one connection, reverse access syntax
 
-        user_rank = self.request.session['ranked_results'][this_user_name][0]  # first index of list is the rank int
-        movie_avg = self.request.session['ranked_results'][this_user_name][2]  # third indexof list is their movie's avg rating
+        p_result = self.get_participant_result()
+        user_rank = p_result.rank
+        movie_avg = p_result.movie_average_rating
 
         # get corresponding RoundRank object
         round_rank_object = RoundRank.objects.get(rank_int=user_rank) # there should be a 'task' to call the function that fills up the RoundRank table
@@ -1202,10 +908,9 @@ class CommitUserRoundView(LoginRequiredMixin, UserPassesTestMixin, UpdateView):
 
         # now we need to generate Point objects that will be related to this UserRoundDetail object, and store the relevant
         # string in their point_string field. These will be used to display detailed result data (the strings) later, in views
-        # that have no access (naturally) to the session dict used in here.
+        # that have no access (naturally) to the scoring draft used in here.
 
-        point_queue = self.request.session['point_queue']
-        this_users_points = point_queue[this_user_name]
+        this_users_points = self.get_scoring_draft().points_by_key(this_user.id)
 
 
         # first, clear out (delete) any point object records that already exist for this user_round_object; otherwise
@@ -1272,17 +977,11 @@ class CommitUserRoundView(LoginRequiredMixin, UserPassesTestMixin, UpdateView):
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
 
-        point_queue = self.request.session['point_queue']
-        ranked_results = self.request.session['ranked_results']
-
-        this_user_name = self.object.user.username # huge previous bug: you did self.request.user here, which is NOT the user you want
-        this_user_total_points = ranked_results[this_user_name][1]  # this is just an int value, index 1 (point total) of the list value
+        this_user_id = self.object.user_id # huge previous bug: you did self.request.user here, which is NOT the user you want
+        this_user_total_points = self.get_participant_result().total_points
 
-        # can we remove the above total points variable, now that we are storing that data in the URD itself?
-        # just print it from there, if you need it; then this method won't even need to access ranked_results at all...
-
-        # extract this users points from the point_queue
-        user_point_results = point_queue[this_user_name]
+        # extract this users points from the scoring draft, grouped by type
+        user_point_results = self.get_scoring_draft().points_by_key(this_user_id)
 
         user_points_by_guess = user_point_results['points_by_guess'] # this is a list of point dicts
 
@@ -1322,11 +1021,8 @@ class CommitGameRoundView(LoginRequiredMixin, UserPassesTestMixin, UpdateView):
     def get_initial(self):
         initial = super().get_initial()
 
-        winner_name = self.request.session['winner_name']
-
-        winner = User.objects.get(username__icontains=winner_name)
-
-        initial['winner'] = winner
+        # the winner as scored in the round's scoring draft (by user id; see scoring_draft.py)
+        initial['winner'] = get_scoring_draft(self.object).winner_id
 
         return initial
 
@@ -1339,8 +1035,7 @@ class CommitGameRoundView(LoginRequiredMixin, UserPassesTestMixin, UpdateView):
         # I kept forgetting to input this manually on the form, so I'm making it automatic now:
         form.instance.round_completed = True    # we are committing the game round, so we set this to True automatically
 
-        winner_name = self.request.session['winner_name']
-        winner = User.objects.get(username__icontains=winner_name)
+        winner = User.objects.get(pk=get_scoring_draft(self.object).winner_id)
         winner_profile = winner.userprofile
         #update the profile to record the win
         winner_profile.rounds_won += 1
@@ -1362,19 +1057,12 @@ class CommitGameRoundView(LoginRequiredMixin, UserPassesTestMixin, UpdateView):
         # must occur -after- the form / object has been saved (profile update data method only uses URD objects 
         # connected to a *completed* round; before the save, this round isn't completed!)
 
+        round_was_completed = form.instance.round_completed
+
         # I kept forgetting to input this manually on the form, so I'm making it automatic now:
         form.instance.round_completed = True    # we are committing the game round, so we set this to True automatically
         form.instance.date_finished = date.today() # always forget to do this manually
 
-        # this whole chunk is redundant now, because updating user profiles will update the profile.round_won field, which is
-        # all this is doing -- you can therefore remove the next five lines of code (six including comment):
-        winner_name = self.request.session['winner_name']
-        winner = User.objects.get(username__icontains=winner_name)
-        winner_profile = winner.userprofile
-        #update the profile to record the win
-        winner_profile.rounds_won += 1
-        winner_profile.save()
-
         # grab movies related to this round and call their assign_movie method, so movies contain FK to user who chose them:
         round_movies = self.object.movies_from_round.all()
 
@@ -1385,10 +1073,17 @@ class CommitGameRoundView(LoginRequiredMixin, UserPassesTestMixin, UpdateView):
 
         # do other stuff that can only be done after round has already been updated (saved) in database....
 
-        # the following update_all_data calls must be made -after- form has been saved, or they won't include this round's URDs
-        round_profiles = UserProfile.objects.filter(user__related_game_rounds=self.object) # get profiles of users in this round
-        for p in round_profiles:
-            p.update_all_data()
+        # the winner / dates may have changed, so rebuild the Results Party data
+        refresh_party_payload(self.object)
+
+        # the profile totals must be updated -after- form has been saved, or they won't include this round's URDs
+        # (see ConcludeRoundView for why a round that was already completed gets a full rebuild)
+        if round_was_completed:
+            UserProfile.objects.rebuild_all_totals()
+        else:
+            UserProfile.objects.add_round_totals(self.object)
+
+        refresh_standings(self.object)
 
 
         # get urds to update movie avg (fix for Movie property side-effect); like all data calls above, MUST occur after
@@ -1439,13 +1134,19 @@ class CommitGameRoundView(LoginRequiredMixin, UserPassesTestMixin, UpdateView):
         return context
 
 
-class OldRoundView(LoginRequiredMixin, DetailView):
+class OldRoundView(LoginRequiredMixin, ConditionalGetMixin, DetailView):
     model = GameRound
     template_name = 'movies/old_round_results.html'
     context_object_name = 'game_round'
 
     login_url = 'login'
 
+    def get_validators(self):
+        game_round = GameRound.objects.filter(pk=self.kwargs['pk']).values('data_version', 'data_modified').first()
+        if game_round is None:
+            return None
+        return make_etag(self.request, 'round', self.kwargs['pk'], game_round['data_version']), game_round['data_modified']
+
     def dispatch(self, request, *args, **kwargs):
         if ShallWeParty(kwargs):
             return redirect('/resultsparty/')
@@ -1456,12 +1157,24 @@ class OldRoundView(LoginRequiredMixin, DetailView):
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
 
+        # the page's results are rendered into a fragment cached per round version (see render_cache.py), so they're
+        # only worked out when that fragment isn't cached
+        context['summary'] = lazy_context(self.build_summary)
+        context['round_cache_seconds'] = round_cache_seconds(self.object)
+
+        return context
+
+
+    def build_summary(self):
         #round_movies = self.object.movies_from_round.all()  # uses reverse manager defined in Movie model
-        round_movies = self.object.movies_from_round.order_by('-date_watched') # uses reverse manager defined in Movie model
+        round_movies = list(self.object.movies_from_round.order_by('-date_watched')) # uses reverse manager defined in Movie model
         #round_participants = self.object.participants.all() # not used now, since we loop through movies instead of participants to build user_movie_pairs
 
+        # (the movies' average_rating and get_absolute_url look at their round; it's this one, no need to load it again)
+        for movie in round_movies:
+            movie.game_round = self.object
 
-        user_round_details = UserRoundDetail.objects.filter(game_round=self.object).order_by('rank')
+        user_round_details = UserRoundDetail.objects.filter(game_round=self.object).select_related('user', 'rank').order_by('rank')
 
         avg_ratings_list = [(movie.average_rating, movie) for movie in round_movies]
 
@@ -1470,34 +1183,25 @@ class OldRoundView(LoginRequiredMixin, DetailView):
         most_hated_movie = sorted_avg_ratings_list[0][1]
         most_enjoyed_movie = sorted_avg_ratings_list[-1][1]
 
-        # need to package user objects with their chosen movie, to loop through to show who chose what
-
-        # user_movie_pairs = []
-        # for participant in round_participants:
-
-        #     p_movie = participant.related_movies.get(game_round=self.object, usermoviedetail__is_user_movie=True)
-
-        #     user_movie_pairs.append((participant, p_movie))
+        # need to package user objects with their chosen movie, to loop through to show who chose what; who chose each
+        # movie comes from one query for the whole round rather than a .get() per movie
+        choosers = {umd.movie_id: umd.user for umd in UserMovieDetail.objects.filter(movie__game_round=self.object, is_user_movie=True).select_related('user')}
 
         user_movie_pairs = []
         for movie in round_movies:
-            p_who_chose = UserMovieDetail.objects.get(movie=movie, is_user_movie=True).user # .user is critical! get user, not umd object
+            p_who_chose = choosers[movie.id] # .user is critical! get user, not umd object
 
             user_movie_pairs.append((p_who_chose, movie))
 
 
-        context['user_round_details'] = user_round_details
-
-        context['most_hated_score'] = sorted_avg_ratings_list[0][0]
-        context['most_enjoyed_score'] = sorted_avg_ratings_list[-1][0]
-
-        context['most_hated_movie'] = most_hated_movie
-        context['most_enjoyed_movie'] = most_enjoyed_movie
-
-        context['user_movie_pairs'] = user_movie_pairs
-
-
-        return context
+        return {
+            'user_round_details': user_round_details,
+            'most_hated_score': sorted_avg_ratings_list[0][0],
+            'most_enjoyed_score': sorted_avg_ratings_list[-1][0],
+            'most_hated_movie': most_hated_movie,
+            'most_enjoyed_movie': most_enjoyed_movie,
+            'user_movie_pairs': user_movie_pairs,
+        }
 
 
 class MovieDetail(LoginRequiredMixin, DetailView):
@@ -1509,6 +1213,9 @@ class MovieDetail(LoginRequiredMixin, DetailView):
     login_url = 'login' # only used by LoginRequiredMixin, if unauthorized access attempted
 
 
+    def get_queryset(self):
+        return super().get_queryset().select_related('game_round')
+
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         user = self.request.user
@@ -1518,10 +1225,7 @@ class MovieDetail(LoginRequiredMixin, DetailView):
         # put exception handling here, or use GetObjectOr404...
         user_profile = UserProfile.objects.get(user=user)  # you should probably just do user.userprofile, you have direct 1-to-1 access....
 
-        if UserMovieDetail.objects.filter(user=user, movie=movie).exists():
-            user_movie_details = UserMovieDetail.objects.get(user=user, movie=movie)
-        else:
-            user_movie_details = None
+        user_movie_details = UserMovieDetail.objects.filter(user=user, movie=movie).select_related('user', 'user_guess').first()
 
         # we simply build the form we want here, and pass it in the context; this works, even though this CBV is a
         # DetailView, not an edit view. When the form is processed, a different view will be called, process_details.
@@ -1532,93 +1236,20 @@ class MovieDetail(LoginRequiredMixin, DetailView):
 
         game_round = movie.game_round
 
-        # it's also worth noting that some of this stuff can be accessed in the template, through the base objects
-        # in the context; check for redundancy...
-
-        # movie object defines the M2M to users with field users - we can only access this after we KNOW all users have submitted details
-        # (that's how is_user_movie gets updated) so this can only show if game_round is completed
-        if game_round.round_completed:
-            user_that_chose_movie = self.object.users.get(usermoviedetail__is_user_movie=True) # only one person marked True for *this specific movie*
-            # same here for avg rating, only applies to a completed round:
-            movie_average_rating = self.object.average_rating
-
-            # get all UserMovieDetail objects for this movie so we can extract the Quotes and Ratings
-            # use this version if you want to exclude the logged in user from results:
-            #umds = UserMovieDetail.objects.filter(movie=self.object).exclude(user=user)
-            umds = UserMovieDetail.objects.filter(movie=self.object)
-            comments_for_movie = []
-            ratings_for_movie = []
-
-            guess_dicts = []
-            non_guess_dicts = []
-
-            for umd in umds:
-                username = umd.user.username
-                rating = umd.star_rating
-                rating_dict = {'username': username, 'rating': rating}
-                ratings_for_movie.append(rating_dict)
-
-                guess_pair_dict = {}
-
-                if umd.is_user_movie:
-                    pass
-
-                elif umd.user_guess == user_that_chose_movie:
-                    guess_pair_dict['username'] = username
-                    guess_pair_dict['guess'] = umd.user_guess
-                    guess_pair_dict['result'] = 'Nailed It!'
-                
-                elif umd.user_guess != user_that_chose_movie and umd.user_guess != None:
-                    guess_pair_dict['username'] = username
-                    guess_pair_dict['guess'] = umd.user_guess
-                    guess_pair_dict['result'] = 'Nope!'
-
-                elif umd.user_guess == None:
-                    non_guess_dict = {'username': username, 'guess': 'n/a', 'result': 'n/a'}
-                    non_guess_dicts.append(non_guess_dict)
-
-                if guess_pair_dict:    
-                    guess_dicts.append(guess_pair_dict)
-                # sort the guess_dicts by result so correct guess matches are listed first (this is just a dumb string-based
-                # sort where Nailed It! evals as greater than Nope!)
-
-                guess_dicts.sort(key=lambda x: x['result'])
-
-                if umd.comments:
-                    comment = umd.comments
-                    comment_dict = {'username': username, 'comment': comment}
-                    comments_for_movie.append(comment_dict)
-                else:
-                    pass
-
-        else:
-            user_that_chose_movie = None
-            movie_average_rating = None
-            comments_for_movie = None
-            ratings_for_movie = None
+        # the ratings, guesses and comments only show once the round is completed (is_user_movie is only filled in once
+        # everyone has submitted their details); see reveal.py
+        context.update(get_reveal(movie))
 
-            guess_dicts = None
-            non_guess_dicts = None
-
-            # Table-Level query to retreive same object above (user_that_chose_movie):
-            #user_that_chose_movie = UserMovieDetail.objects.get(movie=uself.object, is_user_movie=True).user
-
-        context['movie_comments'] = comments_for_movie
-        context['movie_ratings'] = ratings_for_movie
-        context['movie_avg_rating'] = movie_average_rating
-        context['user_that_chose_movie'] = user_that_chose_movie
         context['game_round'] = game_round
         context['user_profile'] = user_profile
         context['user_movie_details'] = user_movie_details
         context['form'] = form
         context['results_ready'] = results_ready
-        context['guess_dicts'] = guess_dicts
-        context['non_guess_dicts'] = non_guess_dicts
 
         return context
 
 
-class OldMovieDetail(LoginRequiredMixin, DetailView):
+class OldMovieDetail(LoginRequiredMixin, ConditionalGetMixin, DetailView):
     """Unlike the MovieDetail view, this one has no form / form rendering, because this view is only called for a movie in -completed- round"""
     model = Movie
     template_name = 'movies/old_movie.html'
@@ -1634,91 +1265,31 @@ class OldMovieDetail(LoginRequiredMixin, DetailView):
         # Otherwise dispatch as normal.
         return super().dispatch(request, *args, **kwargs)
 
+    def get_validators(self):
+        # a movie's page changes with its round's data (which includes the movie itself, see signals.py)
+        movie = Movie.objects.filter(pk=self.kwargs['pk']).values('game_round_id', 'game_round__data_version', 'game_round__data_modified').first()
+        if movie is None:
+            return None
+        etag = make_etag(self.request, 'movie', self.kwargs['pk'], movie['game_round_id'], movie['game_round__data_version'])
+        return etag, movie['game_round__data_modified']
+
+    def get_queryset(self):
+        return super().get_queryset().select_related('game_round')
+
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
 
         user = self.request.user
-        user_profile = user.userprofile
         movie = self.object
         game_round = movie.game_round
 
-        if UserMovieDetail.objects.filter(user=user, movie=movie).exists():
-            user_movie_details = UserMovieDetail.objects.get(user=user, movie=movie)
-        else:
-            user_movie_details = None
-
-        # technically this is unnecessary; this view is only called for movies in a completed round...
-        if game_round.round_completed:
-            user_that_chose_movie = self.object.users.get(usermoviedetail__is_user_movie=True)
-            movie_average_rating = self.object.average_rating
-
-            # get all UserMovieDetail objects for this movie so we can extract the Quotes
-            # use this version if you want to exclude logged in user
-            #umds = UserMovieDetail.objects.filter(movie=self.object).exclude(user=user) # could do a select_related on user here...
-            umds = UserMovieDetail.objects.filter(movie=self.object)
-            comments_for_movie = []
-            ratings_for_movie = []
-
-            guess_dicts = []
-            non_guess_dicts = []
-
-            for umd in umds:
-                username = umd.user.username
-                rating = umd.star_rating
-                rating_dict = {'username': username, 'rating': rating}
-                ratings_for_movie.append(rating_dict)
-
-                guess_pair_dict = {}
-
-                if umd.is_user_movie:
-                    pass
-
-                elif umd.user_guess == user_that_chose_movie:
-                    guess_pair_dict['username'] = username
-                    guess_pair_dict['guess'] = umd.user_guess
-                    guess_pair_dict['result'] = 'Nailed It!'
-                
-                elif umd.user_guess != user_that_chose_movie and umd.user_guess != None:
-                    guess_pair_dict['username'] = username
-                    guess_pair_dict['guess'] = umd.user_guess
-                    guess_pair_dict['result'] = 'Nope!'
-
-                elif umd.user_guess == None:
-                    non_guess_dict = {'username': username, 'guess': 'n/a', 'result': 'n/a'}
-                    non_guess_dicts.append(non_guess_dict)
-
-                if guess_pair_dict:    
-                    guess_dicts.append(guess_pair_dict)
-                # sort the guess_dicts by result so correct guess matches are listed first (this is just a dumb string-based
-                # sort where Nailed It! evals as greater than Nope!)
-
-                guess_dicts.sort(key=lambda x: x['result'])
-
-                if umd.comments:
-                    comment = umd.comments
-                    comment_dict = {'username': username, 'comment': comment}
-                    comments_for_movie.append(comment_dict)
-                else:
-                    pass
-        else:
-            user_that_chose_movie = None
-            movie_average_rating = None
-            comments_for_movie = None
-            ratings_for_movie = None
-
-            guess_dicts = None
-            non_guess_dicts = None
-
-        context['movie_comments'] = comments_for_movie
-        context['movie_ratings'] = ratings_for_movie
-        context['movie_avg_rating'] = movie_average_rating
-        context['user_that_chose_movie'] = user_that_chose_movie
+        # both parts of the page are rendered into fragments cached per round version (see render_cache.py): the
+        # movie's results, shared by everyone, and the member's own details. Each is only worked out on a cache miss.
+        context['reveal'] = lazy_context(lambda: get_reveal(movie))
+        context['user_movie_details'] = lazy_context(lambda: UserMovieDetail.objects.filter(user=user, movie=movie).select_related('user', 'user_guess').first())
+        context['round_cache_seconds'] = round_cache_seconds(game_round)
         context['game_round'] = game_round
-        context['user_profile'] = user_profile
-        context['user_movie_details'] = user_movie_details
-        context['guess_dicts'] = guess_dicts
-        context['non_guess_dicts'] = non_guess_dicts
-
+        context['user_profile'] = user.userprofile
 
         return context
 
@@ -1797,8 +1368,8 @@ def update_points(request):
     # this view will never be called by a GET request
     if request.method == 'POST':
 
-        for p in UserProfile.objects.all():
-            p.update_all_data()               # model method updates the instance fields for all-time points
+        UserProfile.objects.rebuild_all_totals()    # manager method recalculates the all-time point fields for every profile at once
+        rebuild_all_standings()     # the Members page's stored standings, from the same data
 
         return redirect('movies:members')
 
@@ -1842,7 +1413,7 @@ class MembersView(LoginRequiredMixin, ListView):
         return super().dispatch(request, *args, **kwargs)
 
     #queryset = User.objects.order_by('-userprofile__rounds_won').exclude(username__icontains='mmg_admin')
-    queryset = UserProfile.objects.exclude(user__username__icontains='admin')
+    queryset = UserProfile.objects.exclude(user__username__icontains='admin').select_related('user')
     template_name = 'movies/members.html'
     context_object_name = 'profiles'
 
@@ -1851,25 +1422,23 @@ class MembersView(LoginRequiredMixin, ListView):
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
 
-        profiles_by_round = self.queryset.order_by('-rounds_won')
-        # annotate the profiles_by_guesses with actual # correct guesses, rather than use (x2) point total
-        profiles_by_guesses = self.queryset.order_by('-total_correct_guess_points').annotate(correct_guesses=F('total_correct_guess_points') / 2)
-        profiles_by_liked = self.queryset.order_by('-total_liked_movie_points')
-        profiles_by_disliked = self.queryset.order_by('-total_disliked_movie_points')
-
-        profiles_by_known = self.queryset.order_by('-total_known_movie_points')
-        profiles_by_unseen = self.queryset.order_by('-total_unseen_movie_points')
-
-        completed_game_rounds = GameRound.objects.filter(round_completed=True).order_by('-date_started')
-
-        context['game_rounds'] = completed_game_rounds
-
-        context['profiles_by_round'] = profiles_by_round
-        context['profiles_by_guesses'] = profiles_by_guesses
-        context['profiles_by_liked'] = profiles_by_liked
-        context['profiles_by_disliked'] = profiles_by_disliked
-        context['profiles_by_known'] = profiles_by_known
-        context['profiles_by_unseen'] = profiles_by_unseen
+        # the rankings come from the standings stored when the latest round was concluded (or the round asked for, at
+        # members/after/<round number>/), instead of sorting the profiles six ways on every view; see standings.py
+        round_number = self.kwargs.get('round_number')
+        snapshot = get_standings(round_number)
+        if snapshot is None and round_number is not None:
+            raise Http404('No standings after round {}'.format(round_number))
+
+        # nothing stored yet (every round was concluded before the standings were): no rankings until manage.py
+        # rebuild_standings (or Update Points) works them out -- not here, a page view shouldn't be rewriting them
+        standings = snapshot.standings if snapshot else {}
+        context['standings_round'] = standings.get('round_number')
+        context['previous_standings_round'] = standings.get('previous_round_number')
+        context['historical'] = round_number is not None
+        context['completed_round_count'] = (standings['completed_rounds'] if snapshot
+                                            else GameRound.objects.filter(round_completed=True).count())
+        context['standings_missing'] = snapshot is None and context['completed_round_count'] > 0
+        context['leaderboards'] = leaderboards(standings) if standings else []
 
         return context
 
@@ -1889,12 +1458,7 @@ class AddMovieView(LoginRequiredMixin, CreateView):
 
         # this is checked against by the add_movie page, to tell user they must add an active Round
         # before they can add a movie.
-        if GameRound.objects.filter(active_round=True).exists():
-            active_round_exists = True
-        else:
-            active_round_exists = False
-
-        context['active_round_exists'] = active_round_exists
+        context['active_round_exists'] = get_round_state().active_round_exists
 
         return context
 
@@ -1916,13 +1480,7 @@ class CreateRoundView(LoginRequiredMixin, UserPassesTestMixin, CreateView):
     # the extra work:
     def form_valid(self, form):
 
-        # if applicable, get the most recent GameRound object and 'de-activate' it
-        if GameRound.objects.all().exists():
-            previous_round = GameRound.objects.last() # current round we are creating in this view hasnt' been saved yet, so last item in list should be previously created round
-            previous_round.active_round = False
-            previous_round.save()
-
-        # automatically set the new object to be the active round
+        # automatically set the new object to be the active round; GameRound.save() 'de-activates' the previous one
         form.instance.active_round = True
 
         return super().form_valid(form) # newly created round is saved
@@ -1958,16 +1516,16 @@ class EditRoundImagesView(LoginRequiredMixin, UserPassesTestMixin, UpdateView):
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
 
-        last_round = GameRound.objects.filter(active_round=True).last()
+        last_round_number = get_round_state().round_number
         
         current_round = GameRound.objects.filter(round_number=context['object'].round_number).last()
         
         if current_round.round_number > 1:
             context['prev_round'] = int(current_round.round_number) - 1
-        if current_round.round_number < last_round.round_number:
+        if current_round.round_number < last_round_number:
             context['next_round'] = current_round.round_number + 1
-        if current_round.round_number != last_round.round_number:
-            context['last_round'] = last_round.round_number
+        if current_round.round_number != last_round_number:
+            context['last_round'] = last_round_number
 
         # a round object exists that has active_round = True
         current_round_movies = []
@@ -1978,10 +1536,8 @@ class EditRoundImagesView(LoginRequiredMixin, UserPassesTestMixin, UpdateView):
             if len(round_movie.name) > 18:
                 round_movie.name = round_movie.name[0:15] + '...'
 
-            # (Fallback path to static movies)
-            round_movie.media_path = '/static/img/movie/'
-            if os.path.isfile(os.path.join(settings.MEDIA_ROOT, "movie", "{0}.jpg".format(round_movie.id))):
-                round_movie.media_path = '/media/movie/'
+            # resized variants if there are any, else the poster as uploaded (or the old static one)
+            round_movie.poster = poster_images(round_movie.id)
         
         context['current_round_movies'] = current_round_movies
 
@@ -2003,6 +1559,8 @@ class EditRoundImagesView(LoginRequiredMixin, UserPassesTestMixin, UpdateView):
                 for chunk in self.request.FILES[uploaded_file].chunks():
                     file.write(chunk)
                 file.close()
+                record_asset("movie/{0}.jpg".format(id))
+                make_poster_variants(id)    # the resized copies the pages actually show
         
         self.success_url = '/edit_round_images/' + form.data['round_number'] + '/'
 